@@ -1,663 +1,79 @@
-import json
-import time
-import random
+import os
+import html
+from collections import Counter
 import streamlit as st
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException, NoSuchElementException, StaleElementReferenceException
-from webdriver_manager.chrome import ChromeDriverManager
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 import pandas as pd
+from progress import ProgressBus, ThrottledSubscriber
+import sentiment
+from sentiment import stream_analyzed_posts
+from batching import MicroBatcher
+from schema import ResultBatch, SENTIMENTS
+from store import ResultStore, DEFAULT_DB_PATH
+import export
+import tracing
+import profiling
+from export import EXPORT_FORMATS
+from functools import partial
+from scrapers import iter_twitter_posts, iter_linkedin_posts, iter_instagram_posts, iter_facebook_posts
+from scrapers import NETWORK_BACKEND_PLATFORMS, HTTP_BACKEND_PLATFORMS, iter_resumable_posts
+from deadline import Deadline
+from neardup import NearDuplicateIndex, DEFAULT_THRESHOLD
+from jobqueue import open_broker, DEFAULT_QUEUE_PATH, DONE
+from browser_watchdog import watchdog
 
-# Try to import pipeline from transformers
-try:
-    from transformers import pipeline
-    transformers_available = True
-except ImportError as e:
-    st.error(f"Failed to import 'pipeline' from transformers: {e}. Using TextBlob as fallback.")
-    transformers_available = False
+if not sentiment.transformers_available:
+    st.error("Failed to import 'pipeline' from transformers. Using TextBlob as fallback.")
+if not sentiment.textblob_available:
+    st.error("Failed to import TextBlob. Install with 'pip install textblob'.")
 
-# Fallback to TextBlob
-try:
-    from textblob import TextBlob
-    textblob_available = True
-except ImportError as e:
-    st.error(f"Failed to import TextBlob: {e}. Install with 'pip install textblob'.")
-    textblob_available = False
+# Initialize sentiment analysis pipelines, one per language route
+@st.cache_resource
+def load_sentiment_pipelines():
+    pipelines = sentiment.load_sentiment_pipelines()
+    if sentiment.transformers_available:
+        if not pipelines:
+            st.error("No transformer model could be loaded. Using TextBlob.")
+        elif len(pipelines) == 1:
+            st.warning(f"Only the '{next(iter(pipelines))}' sentiment model loaded; all posts will use it.")
+    return pipelines
 
-# Initialize sentiment analysis pipeline
+# One scheduler per server process owns the models; every session submits to it,
+# so concurrent analysts share batches instead of contending for the CPU
 @st.cache_resource
-def load_sentiment_pipeline():
-    if transformers_available:
-        try:
-            return pipeline("sentiment-analysis", model="nlptown/bert-base-multilingual-uncased-sentiment")
-        except Exception as e:
-            st.warning(f"Failed to load multilingual model: {e}. Falling back to English model.")
-            try:
-                return pipeline("sentiment-analysis", model="finiteautomata/bertweet-base-sentiment-analysis")
-            except Exception as fallback_e:
-                st.error(f"Fallback model load failed: {fallback_e}. Using TextBlob.")
-                return None
-    elif textblob_available:
-        st.warning("Using TextBlob for sentiment analysis.")
-        return None
-    else:
-        st.error("No sentiment analysis available.")
-        return None
+def get_inference_scheduler():
+    return MicroBatcher(load_sentiment_pipelines(), max_batch_size=sentiment.INFERENCE_BATCH_SIZE,
+                        max_wait=0.02, max_workers=1)
 
-def create_driver(headless=True):
-    """Create a Chrome driver with improved options"""
-    chrome_options = Options()
-    if headless:
-        chrome_options.add_argument("--headless=new")
-    chrome_options.add_argument("--no-sandbox")
-    chrome_options.add_argument("--disable-dev-shm-usage")
-    chrome_options.add_argument("--disable-blink-features=AutomationControlled")
-    chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
-    chrome_options.add_experimental_option('useAutomationExtension', False)
-    chrome_options.add_argument("--disable-gpu")
-    chrome_options.add_argument("--window-size=1920,1080")
-    chrome_options.add_argument("--disable-notifications")
-    chrome_options.add_argument("--disable-popup-blocking")
-    chrome_options.add_argument(f"--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36")
-    
-    service = Service(ChromeDriverManager().install())
-    driver = webdriver.Chrome(service=service, options=chrome_options)
-    driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
-    return driver
+@st.cache_resource
+def get_result_store():
+    return ResultStore(DEFAULT_DB_PATH)
 
-# Function to fetch posts from Twitter
-@st.cache_data(ttl=300)
-def fetch_twitter_posts(username, max_posts=100):
-    driver = create_driver(headless=True)
-    
-    try:
-        with open('cookies.json', 'r') as f:
-            cookies = json.load(f)
-        
-        profile_url = f"https://x.com/{username}"
-        driver.get(profile_url)
-        time.sleep(random.uniform(3, 5))
-        
-        for cookie in cookies:
-            try:
-                driver.add_cookie(cookie)
-            except Exception:
-                pass
-        
-        driver.refresh()
-        time.sleep(random.uniform(5, 7))
-        
-        max_retries = 3
-        for attempt in range(max_retries):
-            try:
-                WebDriverWait(driver, 30).until(
-                    EC.presence_of_element_located((By.CSS_SELECTOR, 'article[data-testid="tweet"]'))
-                )
-                break
-            except Exception as e:
-                st.warning(f"Twitter fetch attempt {attempt + 1} failed: {e}")
-                if attempt < max_retries - 1:
-                    time.sleep(random.uniform(5, 10))
-                    driver.refresh()
-                    continue
-                raise
-        
-        posts = []
-        last_height = driver.execute_script("return document.body.scrollHeight")
-        
-        while len(posts) < max_posts:
-            articles = driver.find_elements(By.CSS_SELECTOR, 'article[data-testid="tweet"]')
-            for article in articles[len(posts):]:
-                try:
-                    text_element = article.find_element(By.CSS_SELECTOR, 'div[data-testid="tweetText"]')
-                    post_text = text_element.text.strip()
-                    time_element = article.find_element(By.CSS_SELECTOR, 'time')
-                    timestamp = time_element.get_attribute('datetime') if time_element else "Unknown"
-                    if post_text:
-                        posts.append({'text': post_text, 'timestamp': timestamp})
-                    if len(posts) >= max_posts:
-                        break
-                except Exception:
-                    continue
-            driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-            time.sleep(random.uniform(2, 4))
-            new_height = driver.execute_script("return document.body.scrollHeight")
-            if new_height == last_height:
-                break
-            last_height = new_height
-        
-        return posts[:max_posts]
-    finally:
-        driver.quit()
+# Jobs sent to the queue are run by `cli.py worker` processes, which write to the same result store
+@st.cache_resource
+def get_job_broker():
+    return open_broker(os.environ.get('SENTIMENT_JOB_QUEUE', DEFAULT_QUEUE_PATH))
 
-# Function to fetch posts from LinkedIn - IMPROVED
-@st.cache_data(ttl=300)
-def fetch_linkedin_posts(url, max_posts=100):
-    driver = create_driver(headless=True)
-    
-    try:
-        try:
-            with open('linkedin_cookies.json', 'r') as f:
-                cookies = json.load(f)
-                st.info(f"Loaded {len(cookies)} LinkedIn cookies")
-        except FileNotFoundError:
-            st.error("linkedin_cookies.json not found. Generate it using Cookie-Editor.")
-            return []
-        
-        # First navigate to linkedin.com to set cookies
-        driver.get("https://www.linkedin.com")
-        time.sleep(3)
-        
-        # Add cookies
-        for cookie in cookies:
-            try:
-                if 'sameSite' in cookie:
-                    if cookie['sameSite'] not in ['Strict', 'Lax', 'None']:
-                        cookie['sameSite'] = 'None'
-                driver.add_cookie(cookie)
-            except Exception as e:
-                pass
-        
-        # Navigate to the profile/company page
-        driver.get(url)
-        time.sleep(random.uniform(5, 8))
-        
-        # Check if we're logged in
-        if "authwall" in driver.current_url or "login" in driver.current_url:
-            st.error("LinkedIn cookies expired or invalid. Please regenerate linkedin_cookies.json")
-            st.info("Steps: 1. Login to LinkedIn 2. Use Cookie-Editor to export cookies 3. Save as linkedin_cookies.json")
-            return []
-        
-        # Navigate to posts section
-        posts_url = url.rstrip('/') + '/posts/'
-        driver.get(posts_url)
-        time.sleep(random.uniform(5, 8))
-        
-        # Wait for posts to load
-        try:
-            WebDriverWait(driver, 30).until(
-                lambda d: len(d.find_elements(By.CSS_SELECTOR, 'div.feed-shared-update-v2, div[data-urn]')) > 0
-            )
-        except TimeoutException:
-            st.error("Timeout loading LinkedIn posts. The page structure may have changed or cookies are invalid.")
-            return []
-        
-        posts = []
-        last_height = driver.execute_script("return document.body.scrollHeight")
-        no_new_posts_count = 0
-        
-        while len(posts) < max_posts and no_new_posts_count < 3:
-            # Multiple selectors for LinkedIn posts
-            articles = driver.find_elements(By.CSS_SELECTOR, 'div.feed-shared-update-v2')
-            if not articles:
-                articles = driver.find_elements(By.CSS_SELECTOR, 'div[data-urn*="activity"]')
-            
-            initial_count = len(posts)
-            
-            for article in articles:
-                if len(posts) >= max_posts:
-                    break
-                    
-                try:
-                    # Scroll element into view
-                    driver.execute_script("arguments[0].scrollIntoView(true);", article)
-                    time.sleep(0.5)
-                    
-                    # Try to click "see more" button
-                    try:
-                        see_more_buttons = article.find_elements(By.CSS_SELECTOR, 'button.feed-shared-inline-show-more-text__see-more-less-toggle, button[aria-label*="see more"]')
-                        for btn in see_more_buttons:
-                            try:
-                                driver.execute_script("arguments[0].click();", btn)
-                                time.sleep(0.5)
-                            except:
-                                pass
-                    except:
-                        pass
-                    
-                    # Extract post text with multiple methods
-                    post_text = ""
-                    
-                    # Method 1: Look for specific text containers
-                    text_selectors = [
-                        'div.feed-shared-update-v2__description span[dir="ltr"]',
-                        'div.feed-shared-text span[dir="ltr"]',
-                        'div.update-components-text span',
-                        'span.break-words'
-                    ]
-                    
-                    for selector in text_selectors:
-                        try:
-                            elements = article.find_elements(By.CSS_SELECTOR, selector)
-                            for elem in elements:
-                                text = elem.text.strip()
-                                if text and text not in post_text:
-                                    post_text += text + " "
-                        except:
-                            continue
-                    
-                    # Clean up the text
-                    post_text = post_text.strip()
-                    
-                    # Extract timestamp
-                    timestamp = "Unknown"
-                    try:
-                        time_selectors = ['time', 'span.feed-shared-actor__sub-description']
-                        for selector in time_selectors:
-                            try:
-                                time_elem = article.find_element(By.CSS_SELECTOR, selector)
-                                timestamp = time_elem.get_attribute('datetime') or time_elem.text.strip()
-                                if timestamp:
-                                    break
-                            except:
-                                continue
-                    except:
-                        pass
-                    
-                    # Only add if we got meaningful text
-                    if post_text and len(post_text) > 20:
-                        # Check for duplicates
-                        if not any(p['text'] == post_text for p in posts):
-                            posts.append({'text': post_text, 'timestamp': timestamp})
-                            st.success(f"✓ Fetched post {len(posts)}/{max_posts}")
-                
-                except StaleElementReferenceException:
-                    continue
-                except Exception as e:
-                    continue
-            
-            # Check if we got new posts
-            if len(posts) == initial_count:
-                no_new_posts_count += 1
-            else:
-                no_new_posts_count = 0
-            
-            # Scroll down
-            driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-            time.sleep(random.uniform(3, 5))
-            new_height = driver.execute_script("return document.body.scrollHeight")
-            
-            if new_height == last_height:
-                no_new_posts_count += 1
-            last_height = new_height
-        
-        st.success(f"Successfully fetched {len(posts)} LinkedIn posts")
-        return posts[:max_posts]
-    
-    except Exception as e:
-        st.error(f"Error fetching LinkedIn posts: {str(e)}")
-        return []
-    finally:
-        driver.quit()
+# One index per threshold, seeded from stored posts, so cross-posts fetched by any
+# session reuse labels that were already scored
+@st.cache_resource
+def get_near_duplicate_index(threshold):
+    index = NearDuplicateIndex(threshold)
+    index.seed(get_result_store().labeled_signatures())
+    return index
 
-# Function to fetch posts from Instagram - IMPROVED
-@st.cache_data(ttl=300)
-def fetch_instagram_posts(username, max_posts=100):
-    driver = create_driver(headless=False)  # Non-headless for better compatibility
-    
-    try:
-        try:
-            with open('instagram_cookies.json', 'r') as f:
-                cookies = json.load(f)
-                st.success(f"Loaded {len(cookies)} Instagram cookies")
-        except FileNotFoundError:
-            st.error("instagram_cookies.json not found. Generate it using Cookie-Editor on Instagram.")
-            return []
-        
-        # Navigate to Instagram
-        driver.get("https://www.instagram.com")
-        time.sleep(3)
-        
-        # Add cookies
-        for cookie in cookies:
-            try:
-                if 'sameSite' in cookie:
-                    if cookie['sameSite'] not in ['Strict', 'Lax', 'None']:
-                        cookie['sameSite'] = 'None'
-                driver.add_cookie(cookie)
-            except Exception:
-                pass
-        
-        # Refresh to apply cookies
-        driver.refresh()
-        time.sleep(5)
-        
-        # Navigate to profile
-        profile_url = f"https://www.instagram.com/{username}/"
-        st.info(f"Navigating to {profile_url}")
-        driver.get(profile_url)
-        time.sleep(7)
-        
-        # Check if logged in
-        if "login" in driver.current_url.lower():
-            st.error("Instagram login required. Cookies expired. Please regenerate instagram_cookies.json")
-            return []
-        
-        # Close any popups
-        try:
-            not_now_buttons = driver.find_elements(By.XPATH, "//button[contains(text(), 'Not Now')] | //button[contains(text(), 'Not now')]")
-            for btn in not_now_buttons:
-                try:
-                    btn.click()
-                    time.sleep(1)
-                except:
-                    pass
-        except:
-            pass
-        
-        # Wait for posts
-        try:
-            WebDriverWait(driver, 20).until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, 'a[href*="/p/"], a[href*="/reel/"]'))
-            )
-        except TimeoutException:
-            st.error("Could not load Instagram posts. Profile may be private or cookies expired.")
-            return []
-        
-        posts = []
-        post_links = set()
-        
-        # Scroll to collect post links
-        last_height = driver.execute_script("return document.body.scrollHeight")
-        scroll_attempts = 0
-        max_scroll_attempts = 15
-        
-        while len(post_links) < max_posts and scroll_attempts < max_scroll_attempts:
-            links = driver.find_elements(By.CSS_SELECTOR, 'a[href*="/p/"], a[href*="/reel/"]')
-            for link in links:
-                href = link.get_attribute('href')
-                if href and ('/p/' in href or '/reel/' in href):
-                    post_links.add(href)
-                if len(post_links) >= max_posts:
-                    break
-            
-            driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-            time.sleep(random.uniform(2, 4))
-            new_height = driver.execute_script("return document.body.scrollHeight")
-            if new_height == last_height:
-                break
-            last_height = new_height
-            scroll_attempts += 1
-        
-        post_links = list(post_links)[:max_posts]
-        st.info(f"Found {len(post_links)} post links. Extracting captions...")
-        
-        # Visit each post
-        for idx, post_link in enumerate(post_links):
-            try:
-                driver.get(post_link)
-                time.sleep(random.uniform(3, 5))
-                
-                # Wait for page load
-                try:
-                    WebDriverWait(driver, 10).until(
-                        EC.presence_of_element_located((By.TAG_NAME, 'article'))
-                    )
-                except:
-                    pass
-                
-                post_text = ""
-                
-                # Method 1: Look for h1 tags (username and caption)
-                try:
-                    h1_elements = driver.find_elements(By.TAG_NAME, 'h1')
-                    for h1 in h1_elements:
-                        text = h1.text.strip()
-                        # Skip if it's just the username
-                        if text and text.lower() != username.lower() and len(text) > len(username) + 2:
-                            # Remove username from beginning if present
-                            if text.lower().startswith(username.lower()):
-                                text = text[len(username):].strip()
-                            post_text = text
-                            break
-                except:
-                    pass
-                
-                # Method 2: Look for span elements with specific classes
-                if not post_text:
-                    try:
-                        span_selectors = [
-                            'span._ap3a._aaco._aacu._aacx._aad7._aade',
-                            'span.x1lliihq',
-                            'span[style*="line-height"]',
-                            'div.x1lliihq span'
-                        ]
-                        for selector in span_selectors:
-                            try:
-                                spans = driver.find_elements(By.CSS_SELECTOR, selector)
-                                for span in spans:
-                                    text = span.text.strip()
-                                    if text and len(text) > 10 and text.lower() != username.lower():
-                                        post_text = text
-                                        break
-                                if post_text:
-                                    break
-                            except:
-                                continue
-                    except:
-                        pass
-                
-                # Method 3: Get all text from article and extract meaningful parts
-                if not post_text:
-                    try:
-                        article = driver.find_element(By.TAG_NAME, 'article')
-                        full_text = article.text
-                        lines = [line.strip() for line in full_text.split('\n')]
-                        # Filter out common Instagram UI elements
-                        meaningful_lines = []
-                        skip_words = ['like', 'likes', 'comment', 'comments', 'share', 'save', 'follow', 'following', 'followers']
-                        for line in lines:
-                            if len(line) > 15 and not any(word in line.lower() for word in skip_words):
-                                if line.lower() != username.lower():
-                                    meaningful_lines.append(line)
-                        if meaningful_lines:
-                            post_text = ' '.join(meaningful_lines[:2])  # Take first 2 meaningful lines
-                    except:
-                        pass
-                
-                # Get timestamp
-                timestamp = "Unknown"
-                try:
-                    time_element = driver.find_element(By.CSS_SELECTOR, 'time[datetime]')
-                    timestamp = time_element.get_attribute('datetime')
-                except:
-                    try:
-                        time_element = driver.find_element(By.XPATH, "//time")
-                        timestamp = time_element.get_attribute('title') or time_element.get_attribute('datetime') or time_element.text
-                    except:
-                        pass
-                
-                post_text = post_text.strip()
-                if post_text:
-                    posts.append({'text': post_text, 'timestamp': timestamp})
-                    st.success(f"✓ Post {idx+1}/{len(post_links)}: {len(post_text)} chars")
-                else:
-                    posts.append({'text': '[Image/Video post - No caption available]', 'timestamp': timestamp})
-                    st.info(f"ℹ Post {idx+1}/{len(post_links)}: No caption")
-                
-            except Exception as e:
-                st.warning(f"⚠ Error on post {idx+1}: {str(e)[:100]}")
-                continue
-        
-        st.success(f"Extracted {len(posts)} Instagram posts")
-        return posts
-    
-    except Exception as e:
-        st.error(f"Instagram error: {str(e)}")
-        return []
-    finally:
-        driver.quit()
+def current_session_id():
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx else None
 
-# Function to fetch posts from Facebook - IMPROVED
-@st.cache_data(ttl=300)
-def fetch_facebook_posts(page_url, max_posts=100):
-    driver = create_driver(headless=True)
-    
-    try:
-        try:
-            with open('facebook_cookies.json', 'r') as f:
-                cookies = json.load(f)
-                st.info(f"Loaded {len(cookies)} Facebook cookies")
-        except FileNotFoundError:
-            st.error("facebook_cookies.json not found. Generate it using Cookie-Editor on Facebook.")
-            return []
-        
-        driver.get("https://www.facebook.com")
-        time.sleep(3)
-        
-        for cookie in cookies:
-            try:
-                if 'sameSite' in cookie:
-                    if cookie['sameSite'] not in ['Strict', 'Lax', 'None']:
-                        cookie['sameSite'] = 'None'
-                driver.add_cookie(cookie)
-            except:
-                pass
-        
-        driver.refresh()
-        time.sleep(5)
-        
-        driver.get(page_url)
-        time.sleep(random.uniform(5, 8))
-        
-        # Check login
-        if "login" in driver.current_url.lower():
-            st.error("Facebook login required. Cookies expired. Refresh facebook_cookies.json.")
-            return []
-        
-        posts = []
-        last_height = driver.execute_script("return document.body.scrollHeight")
-        scroll_attempts = 0
-        max_scroll_attempts = 25
-        
-        while len(posts) < max_posts and scroll_attempts < max_scroll_attempts:
-            # Multiple selectors for Facebook posts
-            post_selectors = [
-                'div[data-ad-preview="message"]',
-                'div.userContent',
-                'div[data-ad-comet-preview="message"]',
-                'div[dir="auto"][style*="text-align"]'
-            ]
-            
-            post_elements = []
-            for selector in post_selectors:
-                elements = driver.find_elements(By.CSS_SELECTOR, selector)
-                post_elements.extend(elements)
-            
-            for post_elem in post_elements:
-                if len(posts) >= max_posts:
-                    break
-                
-                try:
-                    # Try to expand "See More"
-                    try:
-                        see_more_selectors = [
-                            'div[role="button"]',
-                            'div.see_more_link',
-                            '[aria-label*="See more"]',
-                            '[aria-label*="See More"]'
-                        ]
-                        for selector in see_more_selectors:
-                            try:
-                                see_more = post_elem.find_element(By.CSS_SELECTOR, selector)
-                                if "see more" in see_more.text.lower():
-                                    driver.execute_script("arguments[0].click();", see_more)
-                                    time.sleep(1)
-                                    break
-                            except:
-                                continue
-                    except:
-                        pass
-                    
-                    post_text = post_elem.text.strip()
-                    
-                    # Get timestamp
-                    timestamp = "Unknown"
-                    try:
-                        time_selectors = ['abbr', 'span[id*="date"]', 'a[href*="posts"]']
-                        for selector in time_selectors:
-                            try:
-                                time_elem = post_elem.find_element(By.CSS_SELECTOR, selector)
-                                timestamp = time_elem.get_attribute('data-utime') or time_elem.get_attribute('title') or time_elem.text
-                                if timestamp:
-                                    break
-                            except:
-                                continue
-                    except:
-                        pass
-                    
-                    if post_text and len(post_text) > 20:
-                        # Check for duplicates
-                        if not any(p['text'] == post_text for p in posts):
-                            posts.append({'text': post_text, 'timestamp': timestamp})
-                            st.success(f"✓ Fetched Facebook post {len(posts)}/{max_posts}")
-                
-                except:
-                    continue
-            
-            driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-            time.sleep(random.uniform(3, 6))
-            new_height = driver.execute_script("return document.body.scrollHeight")
-            if new_height == last_height:
-                scroll_attempts += 1
-            else:
-                scroll_attempts = 0
-            last_height = new_height
-        
-        st.success(f"Fetched {len(posts)} Facebook posts")
-        return posts
-    
-    except Exception as e:
-        st.error(f"Facebook error: {str(e)}")
-        return []
-    finally:
-        driver.quit()
+def attach_script_context(thread, ctx=None):
+    """Let a worker thread emit Streamlit elements for the current session"""
+    ctx = ctx or get_script_run_ctx()
+    if ctx:
+        add_script_run_ctx(thread, ctx)
 
-# Analyze sentiment
-def analyze_sentiment(text, sentiment_pipeline):
-    sentiment = "Unknown"
-    confidence = "0.00"
-    
-    try:
-        if sentiment_pipeline:
-            if transformers_available:
-                result = sentiment_pipeline(text[:512])[0]
-                label = result['label'].lower()
-                score = result['score']
-                
-                if 'star' in label:
-                    if label in ['1 star', '2 stars']:
-                        sentiment = 'Negative'
-                    elif label == '3 stars':
-                        sentiment = 'Neutral'
-                    elif label in ['4 stars', '5 stars']:
-                        sentiment = 'Positive'
-                else:
-                    if label in ['neg', 'negative']:
-                        sentiment = 'Negative'
-                    elif label in ['neu', 'neutral']:
-                        sentiment = 'Neutral'
-                    elif label in ['pos', 'positive']:
-                        sentiment = 'Positive'
-                confidence = f"{score:.2f}"
-            elif textblob_available:
-                blob = TextBlob(text)
-                polarity = blob.sentiment.polarity
-                if polarity > 0.1:
-                    sentiment = 'Positive'
-                elif polarity < -0.1:
-                    sentiment = 'Negative'
-                else:
-                    sentiment = 'Neutral'
-                confidence = f"{abs(polarity):.2f}"
-    except Exception as e:
-        st.warning(f"Error analyzing text: {e}")
-    
-    return sentiment, confidence
+# Reap browsers left behind by a killed server; only the first run in a process does anything
+watchdog.startup()
 
 # Streamlit App
 st.title("🔍 Social Media Sentiment Analyzer")
@@ -667,68 +83,293 @@ platform = st.selectbox("Select Platform", ["Twitter", "LinkedIn", "Instagram",
 
 if platform == "Twitter":
     identifier = st.text_input("Enter Twitter Username (without @)", value="")
-    fetch_func = fetch_twitter_posts
+    fetch_func = iter_twitter_posts
 elif platform == "LinkedIn":
     identifier = st.text_input("Enter LinkedIn Company/Profile URL", 
                                value="",
                                help="e.g., https://www.linkedin.com/company/microsoft/")
-    fetch_func = fetch_linkedin_posts
+    fetch_func = iter_linkedin_posts
 elif platform == "Instagram":
     identifier = st.text_input("Enter Instagram Username (without @)", value="")
-    fetch_func = fetch_instagram_posts
+    fetch_func = iter_instagram_posts
 elif platform == "Facebook":
     identifier = st.text_input("Enter Facebook Page URL", 
                                value="",
                                help="e.g., https://www.facebook.com/microsoft")
-    fetch_func = fetch_facebook_posts
+    fetch_func = iter_facebook_posts
+
+backend = "dom"
+backends = ["dom"]
+if platform.lower() in NETWORK_BACKEND_PLATFORMS:
+    backends.append("network")
+if platform.lower() in HTTP_BACKEND_PLATFORMS:
+    backends.append("http")
+if len(backends) > 1:
+    backend = st.radio("Capture backend", backends, horizontal=True,
+                       format_func=lambda name: {"dom": "Page (DOM)", "network": "Feed responses (network)",
+                                                 "http": "Without browser (HTTP)"}[name],
+                       help="Network capture reads posts from the feed's JSON with exact timestamps and stable IDs. "
+                            "HTTP reads them without starting Chrome and falls back to the page if that fails.")
+    if backend != "dom":
+        fetch_func = partial(fetch_func, backend=backend)
+
+if st.checkbox("Resume interrupted fetches", value=True,
+               help="Keep extracted posts in a checkpoint while fetching and continue from it if a fetch fails"):
+    fetch_func = partial(iter_resumable_posts, fetch_func, platform.lower())
 
 max_posts = st.slider("Max number of posts to fetch", min_value=1, max_value=200, value=20)
+time_budget = st.number_input("Time budget (seconds, 0 = none)", min_value=0, max_value=3600, value=0, step=30,
+                              help="Stop fetching when the budget runs out and analyze the posts fetched so far")
+dedup_enabled = st.checkbox("Score near-duplicate posts once", value=True,
+                            help="Cross-posted announcements with small edits are clustered; one post per cluster "
+                                 "is scored and its label copied to the rest")
+dedup_threshold = st.slider("Near-duplicate similarity threshold", min_value=0.5, max_value=1.0,
+                            value=DEFAULT_THRESHOLD, step=0.05, disabled=not dedup_enabled)
+queue_enabled = st.checkbox("Send to the worker queue",
+                            help="Queue the fetch for the scrape workers instead of running Chrome on this server; "
+                                 "load the results from the job list once it is done")
+profile_enabled = st.checkbox("Profile this run", disabled=queue_enabled,
+                              help=f"Sample Python stacks during the fetch and save a flamegraph-ready profile to {profiling.DEFAULT_PROFILE_DIR}/")
+
+class StreamlitProgress(ThrottledSubscriber):
+    """One status line and progress bar, redrawn a few times per second at most.
+
+    Warnings and errors go to `alerts`, which should live outside any placeholder
+    that is cleared when the fetch ends.
+    """
 
-if st.button("Fetch Posts") and identifier:
+    def __init__(self, interval=0.25, alerts=None):
+        super().__init__(interval)
+        self.status_line = st.empty()
+        self.progress_bar = st.progress(0)
+        self.alerts = alerts or st.container()
+
+    def render(self, event):
+        self.status_line.write(event.message)
+        if event.current is not None and event.total:
+            self.progress_bar.progress(min(event.current / event.total, 1.0))
+
+    def render_alert(self, event):
+        if event.level == 'error':
+            self.alerts.error(event.message)
+        else:
+            self.alerts.warning(event.message)
+
+CARDS_PER_PAGE = 25
+COMPARISON_PERIODS = {"Day": 86400, "Week": 7 * 86400, "30 days": 30 * 86400}
+SENTIMENT_COLORS = {"Positive": "green", "Negative": "red"}
+
+def render_cards(rows):
+    """Render a page of colored post cards as a single HTML block"""
+    cards = []
+    for row in rows:
+        color = SENTIMENT_COLORS.get(row['sentiment'], "blue")
+        text = html.escape(row['text'][:200]) + ('...' if len(row['text']) > 200 else '')
+        cards.append(f"<div style='color: white; background-color: {color}; padding: 10px; margin-bottom: 10px; border-radius: 5px;'>"
+                     f"<strong>Text:</strong> {text} <br>"
+                     f"<strong>Timestamp:</strong> {html.escape(str(row['timestamp']))} <br>"
+                     f"<strong>Sentiment:</strong> {row['sentiment']} (Confidence: {row['confidence']:.2f})</div>")
+    st.markdown("".join(cards), unsafe_allow_html=True)
+
+PLATFORM_NAMES = {name.lower(): name for name in ["Twitter", "LinkedIn", "Instagram", "Facebook"]}
+
+def show_job_queue(broker):
+    """Recent jobs, and the results of a finished one loaded from the store"""
+    st.subheader("🗂 Worker Queue")
+    counts = broker.counts()
+    st.caption(", ".join(f"{count} {status}" for status, count in counts.items()))
+    jobs = broker.jobs(limit=20)
+    if not jobs:
+        st.write("No jobs yet.")
+        return
+    st.dataframe(pd.DataFrame([{
+        'job': job.id, 'platform': job.platform, 'identifier': job.identifier, 'status': job.status,
+        'attempts': job.attempts, 'worker': job.worker,
+        'posts': (job.result or {}).get('posts'), 'error': job.error,
+    } for job in jobs]), use_container_width=True, hide_index=True)
+    finished = [job for job in jobs if job.status == DONE]
+    if not finished:
+        return
+    job = st.selectbox("Finished job", finished,
+                       format_func=lambda job: f"#{job.id} {job.platform} {job.identifier}")
+    if st.button("Load results"):
+        batch = get_result_store().job_batch(job.id)
+        st.session_state['results'] = {
+            'platform': PLATFORM_NAMES[job.platform],
+            'identifier': job.identifier,
+            'batch': batch,
+            'timings': [],
+            'counters': {},
+            'partial_reason': (job.result or {}).get('partial_reason'),
+        }
+
+if queue_enabled:
+    broker = get_job_broker()
+    if st.button("Queue Fetch") and identifier:
+        job_id = broker.submit(platform.lower(), identifier, max_posts, backend=backend,
+                               time_budget=time_budget or None,
+                               near_dup_threshold=dedup_threshold if dedup_enabled else 0)
+        st.success(f"Queued job #{job_id}; a worker will pick it up")
+    # Clicking reruns the script, which reads the job list again
+    st.button("Refresh job list")
+    show_job_queue(broker)
+elif st.button("Fetch Posts") and identifier:
+    st.session_state.pop('results', None)
     with st.spinner(f"Fetching and analyzing posts from {platform}..."):
-        posts = fetch_func(identifier, max_posts)
-        
-        if not posts:
-            st.error("No posts fetched. Check identifier or cookies.")
+        # Load the models before scraping starts so the first batch isn't delayed
+        scheduler = get_inference_scheduler()
+        result_store = get_result_store()
+        dedup = get_near_duplicate_index(dedup_threshold) if dedup_enabled else None
+        session_id = current_session_id()
+        batches = []
+        analyzed_count = 0
+        sentiment_counts = Counter()
+        fetch_error = None
+        
+        # Alerts stay on the page; the live view below is replaced by the full results
+        alerts = st.container()
+        live = st.empty()
+        with live.container():
+            progress = ProgressBus(platform=platform.lower())
+            ui_progress = StreamlitProgress(alerts=alerts)
+            progress.subscribe(ui_progress)
+            analyzed_line = st.empty()
+            chart_slot = st.empty()
+            table = None
+            deadline = Deadline(time_budget)
+            stream = stream_analyzed_posts(fetch_func(identifier, max_posts, progress, deadline=deadline),
+                                           scheduler.pipelines,
+                                           on_thread_start=attach_script_context,
+                                           scorer=lambda texts: scheduler.analyze(texts, session=session_id),
+                                           dedup=dedup)
+            profiler = profiling.SamplingProfiler(platform=platform.lower()).start() if profile_enabled else None
+            with tracing.run_trace(platform=platform.lower(), identifier=identifier) as run:
+                try:
+                    for batch in stream:
+                        batches.append(batch)
+                        result_store.add_batch(batch)
+                        analyzed_count += len(batch)
+                        sentiment_counts.update(batch.sentiment_counts())
+                        completed, submitted = scheduler.session_progress(session_id)
+                        analyzed_line.write(f"Analyzed {analyzed_count} posts so far "
+                                            f"({completed}/{submitted} scored by the shared model this session)")
+                        chart_slot.bar_chart(pd.Series(sentiment_counts, name="count"))
+                        batch_df = batch.to_frame()[['sentiment', 'confidence', 'timestamp_raw', 'text']]
+                        if table is None:
+                            table = st.dataframe(batch_df, use_container_width=True)
+                        else:
+                            table.add_rows(batch_df)
+                except Exception as e:
+                    fetch_error = e
+                finally:
+                    scheduler.forget_session(session_id)
+                    if profiler:
+                        profiler.stop()
+                        profiler.tag(posts=analyzed_count)
+            ui_progress.flush()
+        live.empty()
+        
+        if fetch_error is not None:
+            alerts.error(f"Fetch failed: {fetch_error}")
+        if not analyzed_count:
+            if fetch_error is None:
+                alerts.error("No posts fetched. Check identifier or cookies.")
         else:
-            sentiment_pipeline = load_sentiment_pipeline()
-            analyzed_posts = []
-            
-            progress_bar = st.progress(0)
-            for idx, post in enumerate(posts):
-                sentiment, confidence = analyze_sentiment(post['text'], sentiment_pipeline)
-                analyzed_posts.append({
-                    **post,
-                    'sentiment': sentiment,
-                    'confidence': confidence
-                })
-                progress_bar.progress((idx + 1) / len(posts))
-            
-            st.subheader(f"📊 Fetched {len(analyzed_posts)} Posts from {identifier}")
-            df = pd.DataFrame(analyzed_posts)
-            
-            # Display table with colored sentiment
-            for index, row in df.iterrows():
-                sentiment = row['sentiment']
-                color = "green" if sentiment == "Positive" else "red" if sentiment == "Negative" else "blue"
-                st.markdown(f"<div style='color: white; background-color: {color}; padding: 10px; margin-bottom: 10px; border-radius: 5px;'>"
-                            f"<strong>Text:</strong> {row['text'][:200]}{'...' if len(row['text']) > 200 else ''} <br>"
-                            f"<strong>Timestamp:</strong> {row['timestamp']} <br>"
-                            f"<strong>Sentiment:</strong> {sentiment} (Confidence: {row['confidence']})</div>", unsafe_allow_html=True)
-            
-            # Sentiment summary
-            sentiment_counts = df['sentiment'].value_counts()
-            st.subheader("📈 Sentiment Summary")
-            st.bar_chart(sentiment_counts)
-            
-            # Download CSV
-            csv = df.to_csv(index=False)
-            st.download_button(
-                label="⬇️ Download Results as CSV",
-                data=csv,
-                file_name=f"{platform.lower()}_sentiment_analysis.csv",
-                mime="text/csv"
-            )
+            st.session_state['results'] = {
+                'platform': platform,
+                'identifier': identifier,
+                'batch': ResultBatch.concat(batches),
+                'timings': run.breakdown(),
+                'counters': dict(run.counters),
+                'partial_reason': deadline.reason,
+            }
+            if profiler:
+                try:
+                    profiler.save()
+                except OSError as e:
+                    st.warning(f"Could not save profile: {e}")
+                st.session_state['results']['profile'] = {
+                    'name': profiler.base_name(),
+                    'summary': profiler.summary_text(),
+                    'folded': profiler.collapsed(),
+                }
+
+# Results are kept in session state so paging through them doesn't refetch
+results = st.session_state.get('results')
+if results:
+    result_batch = results['batch']
+    st.subheader(f"📊 Fetched {len(result_batch)} Posts from {results['identifier']}")
+    if results.get('partial_reason'):
+        st.warning(f"Partial results: {results['partial_reason']}")
+    report = result_batch.timestamp_report
+    if report.failures or report.missing:
+        st.caption(f"Timestamps: {report.parsed} parsed, {report.missing} missing, "
+                   f"{report.failures} unparseable ({report.failure_rate:.0%} failure rate)")
+    
+    # Display colored sentiment cards one page at a time
+    n_pages = max(1, -(-len(result_batch) // CARDS_PER_PAGE))
+    page = st.number_input(f"Page (of {n_pages})", min_value=1, max_value=n_pages, value=1) if n_pages > 1 else 1
+    render_cards(result_batch.slice((page - 1) * CARDS_PER_PAGE, page * CARDS_PER_PAGE).rows())
+    
+    # Sentiment summary
+    st.subheader("📈 Sentiment Summary")
+    distinct = result_batch.distinct_count()
+    if distinct < len(result_batch):
+        st.caption(f"{len(result_batch)} posts in {distinct} distinct clusters; near-duplicates are counted once")
+    st.bar_chart(pd.Series(result_batch.sentiment_counts(distinct=True), name="count"))
+    
+    # Trend and period comparison, served from the stored rollups
+    st.subheader("📉 Sentiment Trend")
+    result_store = get_result_store()
+    store_platform = results['platform'].lower()
+    granularity = st.radio("Bucket size", ["day", "hour"], horizontal=True)
+    trend = result_store.trend(store_platform, results['identifier'], granularity)
+    if trend.empty:
+        st.write("No stored history yet.")
+    else:
+        st.line_chart(trend[[name for name in SENTIMENTS if name in trend.columns]])
+        period_label = st.selectbox("Compare the last period with the one before", list(COMPARISON_PERIODS))
+        comparison = result_store.compare_periods(store_platform, results['identifier'], COMPARISON_PERIODS[period_label])
+        columns = st.columns(3)
+        for column, name in zip(columns, ['Positive', 'Neutral', 'Negative']):
+            column.metric(f"{name} share", f"{comparison.loc[name, 'current_share']:.0%}",
+                          f"{comparison.loc[name, 'share_change'] * 100:+.1f} pts")
+        st.dataframe(comparison, use_container_width=True)
+    
+    # Where the time went during the fetch
+    with st.expander("⏱ Timing breakdown"):
+        timings = pd.DataFrame(results.get('timings', []))
+        if timings.empty:
+            st.write("No timings recorded.")
+        else:
+            st.dataframe(timings[['stage', 'calls', 'total_s', 'mean_s', 'max_s']].round(3),
+                         use_container_width=True, hide_index=True)
+        if results.get('counters'):
+            st.write(", ".join(f"{name.replace('_', ' ')}: {value}" for name, value in sorted(results['counters'].items())))
+    
+    if results.get('profile'):
+        run_profile = results['profile']
+        with st.expander("🔬 Profile"):
+            st.code(run_profile['summary'])
+            st.download_button("⬇️ Download collapsed stacks (flamegraph)", data=run_profile['folded'],
+                               file_name=f"{run_profile['name']}.folded", mime="text/plain")
+    
+    # Downloads are only built when asked for, then kept until the next fetch
+    formats = list(EXPORT_FORMATS) if export.pyarrow_available else ['CSV']
+    export_format = st.selectbox("Download format", formats)
+    extension, mime = EXPORT_FORMATS[export_format]
+    exports = results.setdefault('exports', {})
+    if export_format not in exports:
+        if st.button(f"Prepare {export_format} download"):
+            with st.spinner(f"Building {export_format} file..."):
+                exports[export_format] = export.export_bytes(result_batch, export_format)
+    if export_format in exports:
+        st.download_button(
+            label=f"⬇️ Download Results as {export_format}",
+            data=exports[export_format],
+            file_name=f"{results['platform'].lower()}_sentiment_analysis.{extension}",
+            mime=mime
+        )
 
 st.write("---")
 st.info("💡 **Important Cookie Setup Instructions:**\n\n"
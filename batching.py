@@ -0,0 +1,196 @@
+"""Dynamic micro-batching in front of the sentiment models.
+
+Callers submit texts from any thread and get futures back. A worker thread
+gathers whatever has been submitted, up to `max_batch_size` texts or until
+`max_wait` seconds have passed since the first one arrived, and scores them with
+one analyze_sentiments call. The same scheduler serves the HTTP service and all
+Streamlit sessions in a server process.
+"""
+import time
+import bisect
+import threading
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import Future
+
+import numpy as np
+
+from sentiment import analyze_sentiments
+
+DEFAULT_MAX_BATCH_SIZE = 32
+DEFAULT_MAX_WAIT = 0.005
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+
+class LatencyStats:
+    """Rolling request latencies and a histogram of model batch sizes"""
+
+    def __init__(self, window=10000):
+        self.latencies = deque(maxlen=window)
+        self.batch_sizes = Counter()
+        self.requests = 0
+        self.batches = 0
+        self._lock = threading.Lock()
+
+    def record_latency(self, seconds):
+        with self._lock:
+            self.latencies.append(seconds)
+            self.requests += 1
+
+    def record_batch(self, size):
+        bucket = BATCH_SIZE_BUCKETS[min(bisect.bisect_left(BATCH_SIZE_BUCKETS, size), len(BATCH_SIZE_BUCKETS) - 1)]
+        with self._lock:
+            self.batch_sizes[bucket] += 1
+            self.batches += 1
+
+    def snapshot(self):
+        with self._lock:
+            latencies = sorted(self.latencies)
+            batch_sizes = dict(self.batch_sizes)
+            requests, batches = self.requests, self.batches
+
+        def percentile(p):
+            if not latencies:
+                return None
+            return round(latencies[min(int(p / 100 * len(latencies)), len(latencies) - 1)] * 1000, 3)
+
+        return {
+            'requests': requests,
+            'batches': batches,
+            'latency_ms': {'p50': percentile(50), 'p90': percentile(90), 'p99': percentile(99)},
+            'batch_size_histogram': {f"<={size}": batch_sizes.get(size, 0) for size in BATCH_SIZE_BUCKETS},
+        }
+
+
+class MicroBatcher:
+    """Shared inference scheduler that owns the models.
+
+    Texts are queued per session (a Streamlit session, an HTTP client, ...) and
+    batches are filled round-robin across sessions, so one large fetch can't
+    starve everyone else. `max_workers` caps how many model calls run at once.
+    """
+
+    def __init__(self, pipelines, max_batch_size=DEFAULT_MAX_BATCH_SIZE, max_wait=DEFAULT_MAX_WAIT, max_workers=1):
+        self.pipelines = pipelines
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.stats = LatencyStats()
+        self._sessions = OrderedDict()      # session -> deque of (text, future)
+        self._progress = {}                 # session -> [completed, submitted]
+        self._pending = 0
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._workers = [
+            threading.Thread(target=self._run, name=f"inference-worker-{i}", daemon=True)
+            for i in range(max_workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, text, session=None):
+        future = Future()
+        with self._cond:
+            if self._stopped:
+                future.set_exception(RuntimeError("MicroBatcher is closed"))
+                return future
+            self._sessions.setdefault(session, deque()).append((text, future))
+            self._progress.setdefault(session, [0, 0])[1] += 1
+            self._pending += 1
+            self._cond.notify()
+        return future
+
+    def analyze(self, texts, session=None, timeout=None):
+        """Score texts through the shared batches; blocks until all are done.
+
+        Returns (sentiment codes, confidences) arrays like analyze_sentiments.
+        """
+        start = time.perf_counter()
+        futures = [self.submit(text, session) for text in texts]
+        sentiments = np.empty(len(futures), dtype=np.int8)
+        confidences = np.empty(len(futures), dtype=np.float32)
+        for idx, future in enumerate(futures):
+            sentiments[idx], confidences[idx] = future.result(timeout)
+        self.stats.record_latency(time.perf_counter() - start)
+        return sentiments, confidences
+
+    def session_progress(self, session=None):
+        """Return (completed, submitted) counts for a session"""
+        with self._cond:
+            completed, submitted = self._progress.get(session, (0, 0))
+        return completed, submitted
+
+    def forget_session(self, session):
+        with self._cond:
+            if not self._sessions.get(session):
+                self._sessions.pop(session, None)
+                self._progress.pop(session, None)
+
+    def close(self):
+        """Stop the workers; texts still queued fail with RuntimeError so no caller waits forever"""
+        with self._cond:
+            self._stopped = True
+            queued = [future for items in self._sessions.values() for _, future in items]
+            self._sessions.clear()
+            self._pending = 0
+            self._cond.notify_all()
+        for future in queued:
+            future.set_exception(RuntimeError("MicroBatcher closed before the text was scored"))
+        for worker in self._workers:
+            worker.join(timeout=1)
+
+    def _take_round_robin(self, limit):
+        # Caller holds the lock. Take one item from each session in turn, then
+        # rotate so the next batch starts with a different session.
+        batch = []
+        while len(batch) < limit and self._pending:
+            for session in list(self._sessions):
+                items = self._sessions[session]
+                if items:
+                    batch.append((session, *items.popleft()))
+                    self._pending -= 1
+                if not items:
+                    # Sessions that never call forget_session don't keep an empty queue around
+                    del self._sessions[session]
+                if len(batch) >= limit:
+                    break
+            if self._sessions:
+                self._sessions.move_to_end(next(iter(self._sessions)))
+        return batch
+
+    def _collect(self):
+        with self._cond:
+            while not self._pending and not self._stopped:
+                self._cond.wait(0.1)
+            if self._stopped:
+                return []
+            # Give concurrent submitters max_wait to fill the batch up
+            deadline = time.monotonic() + self.max_wait
+            while self._pending < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            return self._take_round_robin(self.max_batch_size)
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if not batch:
+                with self._cond:
+                    if self._stopped:
+                        return
+                continue
+            self.stats.record_batch(len(batch))
+            try:
+                sentiments, confidences = analyze_sentiments([text for _, text, _ in batch], self.pipelines, self.max_batch_size)
+                error = None
+            except Exception as e:
+                error = e
+            with self._cond:
+                for session, _, _ in batch:
+                    if session in self._progress:
+                        self._progress[session][0] += 1
+            for idx, (_, _, future) in enumerate(batch):
+                if error is not None:
+                    future.set_exception(error)
+                else:
+                    future.set_result((int(sentiments[idx]), float(confidences[idx])))
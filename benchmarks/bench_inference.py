@@ -0,0 +1,60 @@
+"""Inference throughput and latency at several batch sizes and text lengths."""
+import os
+import sys
+import time
+import random
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sentiment import analyze_sentiments, load_sentiment_pipelines
+from benchmarks.fixture_server import WORDS
+
+BATCH_SIZES = (1, 8, 32, 64)
+TEXT_LENGTHS = {'short': 12, 'tweet': 50, 'long': 250}   # words per text
+
+
+def make_texts(count, words, seed=0):
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(WORDS) for _ in range(words)) for _ in range(count)]
+
+
+def bench_case(pipelines, batch_size, words, n_texts=256, warmup=1):
+    texts = make_texts(n_texts, words)
+    for _ in range(warmup):
+        analyze_sentiments(texts[:batch_size], pipelines, batch_size, cache=None)
+
+    latencies = []
+    start = time.perf_counter()
+    for offset in range(0, n_texts, batch_size):
+        chunk = texts[offset:offset + batch_size]
+        t0 = time.perf_counter()
+        # Without the cache: every batch size reuses the same texts
+        analyze_sentiments(chunk, pipelines, batch_size, cache=None)
+        latencies.append(time.perf_counter() - t0)
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        'batch_size': batch_size,
+        'words_per_text': words,
+        'texts': n_texts,
+        'texts_per_sec': round(n_texts / elapsed, 2),
+        'batch_latency_ms': {
+            'mean': round(statistics.mean(latencies) * 1000, 2),
+            'p50': round(latencies[len(latencies) // 2] * 1000, 2),
+            'p95': round(latencies[min(int(len(latencies) * 0.95), len(latencies) - 1)] * 1000, 2),
+        },
+    }
+
+
+def run(batch_sizes=BATCH_SIZES, text_lengths=None, n_texts=256):
+    pipelines = load_sentiment_pipelines()
+    results = []
+    for name, words in (text_lengths or TEXT_LENGTHS).items():
+        for batch_size in batch_sizes:
+            case = bench_case(pipelines, batch_size, words, n_texts)
+            case['text_length'] = name
+            case['models'] = sorted(pipelines) or ['textblob']
+            results.append(case)
+    return results
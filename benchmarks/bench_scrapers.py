@@ -0,0 +1,149 @@
+"""Run the real scrapers against the local fixture server and measure them.
+
+Reports posts/sec, WebDriver round trips per post and peak RSS (this process
+plus the Chrome/chromedriver processes it launched; needs psutil, otherwise only
+ru_maxrss of this process and its reaped children is available).
+"""
+import os
+import sys
+import time
+import resource
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from selenium.webdriver.remote.webdriver import WebDriver
+
+import scrapers
+import http_fetch
+from benchmarks.fixture_server import FixtureServer
+
+try:
+    import psutil
+    psutil_available = True
+except ImportError:
+    psutil_available = False
+
+# How each platform's fetcher is pointed at the fixture site
+FIXTURE_IDENTIFIERS = {
+    'twitter': lambda base: 'fixture',
+    'linkedin': lambda base: f"{base}/company/fixture",
+    'instagram': lambda base: 'fixture',
+    'facebook': lambda base: f"{base}/fixture",
+}
+
+
+class CommandCounter:
+    """Count WebDriver commands (each one is an HTTP round trip to chromedriver)"""
+
+    def __init__(self):
+        self.count = 0
+        self._original = WebDriver.execute
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        counter = self
+        original = self._original
+
+        def execute(driver, driver_command, params=None):
+            with counter._lock:
+                counter.count += 1
+            return original(driver, driver_command, params)
+
+        WebDriver.execute = execute
+        return self
+
+    def __exit__(self, *exc):
+        WebDriver.execute = self._original
+
+
+class PeakRss:
+    """Sample RSS of this process and its descendants until stopped"""
+
+    def __init__(self, interval=0.2):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _sample(self):
+        proc = psutil.Process()
+        total = proc.memory_info().rss
+        for child in proc.children(recursive=True):
+            try:
+                total += child.memory_info().rss
+            except psutil.Error:
+                continue
+        return total
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.peak = max(self.peak, self._sample())
+            except Exception:
+                pass
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        if psutil_available:
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        if psutil_available:
+            self._thread.join()
+        else:
+            # ru_maxrss is in KiB on Linux
+            usage = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+            self.peak = usage * 1024
+
+
+def bench_platform(platform, max_posts=50, total_posts=200, lazy_delay_ms=300, backend='dom'):
+    server = FixtureServer(platform, total_posts=total_posts, lazy_delay_ms=lazy_delay_ms).start()
+    original_base = scrapers.BASE_URLS[platform]
+    original_http_base = http_fetch.HTTP_BASE_URLS.get(platform)
+    scrapers.BASE_URLS[platform] = server.base_url
+    if original_http_base is not None:
+        http_fetch.HTTP_BASE_URLS[platform] = server.base_url
+    fetch = scrapers.FETCHERS[platform]
+    kwargs = {'headless': True} if platform == 'instagram' else {}
+    if backend != 'dom':
+        kwargs['backend'] = backend
+    try:
+        with CommandCounter() as commands, PeakRss() as rss:
+            start = time.perf_counter()
+            posts = list(fetch(FIXTURE_IDENTIFIERS[platform](server.base_url), max_posts, **kwargs))
+            elapsed = time.perf_counter() - start
+    finally:
+        scrapers.BASE_URLS[platform] = original_base
+        if original_http_base is not None:
+            http_fetch.HTTP_BASE_URLS[platform] = original_http_base
+        server.shutdown()
+        server.server_close()
+
+    return {
+        'platform': platform,
+        'backend': backend,
+        'max_posts': max_posts,
+        'posts': len(posts),
+        'seconds': round(elapsed, 3),
+        'posts_per_sec': round(len(posts) / elapsed, 3) if elapsed else None,
+        'webdriver_commands': commands.count,
+        'round_trips_per_post': round(commands.count / len(posts), 2) if posts else None,
+        'peak_rss_mb': round(rss.peak / 2**20, 1),
+        'rss_includes_browser': psutil_available,
+    }
+
+
+def run(platforms=None, max_posts=50, backends=('dom',)):
+    cases = []
+    for platform in platforms or sorted(scrapers.FETCHERS):
+        for backend in backends:
+            if backend == 'network' and platform not in scrapers.NETWORK_BACKEND_PLATFORMS:
+                continue
+            if backend == 'http' and platform not in scrapers.HTTP_BACKEND_PLATFORMS:
+                continue
+            cases.append(bench_platform(platform, max_posts, backend=backend))
+    return cases
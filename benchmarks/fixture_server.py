@@ -0,0 +1,303 @@
+"""Local stand-in for X, LinkedIn, Instagram and Facebook used by the benchmarks.
+
+Pages are synthetic but use the markup the scrapers select on. Feeds render a
+first page of posts and append more through an XHR when the window is scrolled
+to the bottom, after a configurable delay, so the scroll loops behave like they
+do against the real sites.
+
+Each page of the feed is also requested as JSON from a GraphQL-style endpoint,
+shaped like the real responses, for the network capture backend. Recorded
+responses can be served instead with --payload-dir DIR, which maps page n of a
+platform to DIR/<platform>/<n>.json.
+
+The browserless HTTP backend (http_fetch.py) reads the same posts from stand-ins
+for its sources: X's syndication timeline, Instagram's v1 feed API and the JSON
+embedded in the Facebook page.
+
+    python benchmarks/fixture_server.py --port 8800 --posts 200
+"""
+import os
+import html
+import json
+import random
+import argparse
+import time
+import calendar
+import threading
+from urllib.parse import urlparse, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+WORDS = (
+    "great new launch team customers love product update today thanks amazing proud "
+    "disappointed slow support issue broken waiting refund excited future partners "
+    "announce event join us week results growth community feedback release"
+).split()
+
+PAGE_SIZE = 10
+# Posts on the syndication timeline, which doesn't paginate
+SYNDICATION_SIZE = 20
+INSTAGRAM_USER_ID = '1000'
+
+
+def post_text(platform, idx, min_words=8, max_words=40):
+    rng = random.Random(f"{platform}-{idx}")
+    words = [rng.choice(WORDS) for _ in range(rng.randint(min_words, max_words))]
+    return f"Post {idx}: " + " ".join(words).capitalize() + "."
+
+
+def iso_time(idx):
+    return f"2024-03-{1 + idx % 28:02d}T{idx % 24:02d}:00:00.000Z"
+
+
+def epoch_time(idx):
+    return calendar.timegm((2024, 3, 1 + idx % 28, idx % 24, 0, 0))
+
+
+def render_twitter_item(idx):
+    return (f'<article data-testid="tweet" style="min-height:220px">'
+            f'<div data-testid="tweetText">{html.escape(post_text("twitter", idx))}</div>'
+            f'<time datetime="{iso_time(idx)}">{idx}h</time></article>')
+
+
+def render_linkedin_item(idx):
+    text = html.escape(post_text("linkedin", idx, 20, 60))
+    return (f'<div class="feed-shared-update-v2" data-urn="urn:li:activity:{idx}" style="min-height:260px">'
+            f'<span class="feed-shared-actor__sub-description">{1 + idx % 6}d •</span>'
+            f'<div class="feed-shared-update-v2__description"><span dir="ltr">{text[:80]}</span>'
+            f'<span dir="ltr" class="collapsed" style="display:none">{text[80:]}</span></div>'
+            f'<button class="feed-shared-inline-show-more-text__see-more-less-toggle" '
+            f'onclick="this.previousSibling.querySelector(\'.collapsed\').style.display=\'inline\'">…see more</button>'
+            f'</div>')
+
+
+def render_instagram_item(idx):
+    return f'<a href="/p/FIXTURE{idx:05d}/" style="display:block;min-height:240px">post {idx}</a>'
+
+
+def render_facebook_item(idx):
+    text = html.escape(post_text("facebook", idx, 20, 60))
+    return (f'<div style="min-height:260px"><div data-ad-preview="message">{text}'
+            f'<abbr data-utime="{1709251200 + idx * 3600}" title="">{idx}h</abbr></div></div>')
+
+
+RENDERERS = {
+    'twitter': render_twitter_item,
+    'linkedin': render_linkedin_item,
+    'instagram': render_instagram_item,
+    'facebook': render_facebook_item,
+}
+
+
+def twitter_payload(start, end):
+    entries = [{
+        'entryId': f"tweet-{1700000000000000000 + idx}",
+        'content': {'itemContent': {'tweet_results': {'result': {
+            '__typename': 'Tweet',
+            'rest_id': str(1700000000000000000 + idx),
+            'legacy': {
+                'id_str': str(1700000000000000000 + idx),
+                'full_text': post_text('twitter', idx),
+                'created_at': time.strftime('%a %b %d %H:%M:%S +0000 %Y', time.gmtime(epoch_time(idx))),
+            },
+        }}}},
+    } for idx in range(start, end)]
+    return json.dumps({'data': {'user': {'result': {'timeline_v2': {'timeline': {
+        'instructions': [{'type': 'TimelineAddEntries', 'entries': entries}]}}}}}})
+
+
+def instagram_payload(start, end):
+    edges = [{'node': {
+        'code': f"FIXTURE{idx:05d}",
+        'taken_at': epoch_time(idx),
+        'caption': {'text': post_text('instagram', idx), 'created_at': epoch_time(idx)},
+    }} for idx in range(start, end)]
+    return json.dumps({'data': {'xdt_api__v1__feed__user_timeline_graphql_connection': {
+        'edges': edges, 'page_info': {'end_cursor': str(end)}}}})
+
+
+def facebook_payload(start, end):
+    # One JSON document per line, like the streamed Comet responses
+    return "\n".join(json.dumps({'data': {'node': {
+        'post_id': str(10000 + idx),
+        'comet_sections': {
+            'content': {'story': {'message': {'text': post_text('facebook', idx, 20, 60)}}},
+            'context_layout': {'story': {'creation_time': 1709251200 + idx * 3600}},
+        },
+    }}}) for idx in range(start, end))
+
+
+def twitter_syndication_payload(start, end):
+    entries = [{'type': 'tweet', 'entry_id': f"tweet-{1700000000000000000 + idx}", 'content': {'tweet': {
+        'id_str': str(1700000000000000000 + idx),
+        'full_text': post_text('twitter', idx),
+        'created_at': time.strftime('%a %b %d %H:%M:%S +0000 %Y', time.gmtime(epoch_time(idx))),
+    }}} for idx in range(start, end)]
+    return json.dumps({'props': {'pageProps': {'timeline': {'entries': entries}}}})
+
+
+def instagram_feed_payload(start, end, total):
+    items = [{
+        'pk': str(3000000 + idx),
+        'code': f"FIXTURE{idx:05d}",
+        'taken_at': epoch_time(idx),
+        'caption': {'text': post_text('instagram', idx)},
+    } for idx in range(start, end)]
+    return json.dumps({'items': items, 'num_results': len(items), 'more_available': end < total,
+                       'next_max_id': str(end), 'status': 'ok'})
+
+
+def embedded_json(body):
+    """<script> tags holding JSON documents, like server-rendered pages embed their data"""
+    return "".join(f'<script type="application/json" data-sjs>{line}</script>'
+                   for line in body.splitlines() if line)
+
+
+PAYLOADS = {
+    'twitter': ('/i/api/graphql/fixture/UserTweets', twitter_payload),
+    'instagram': ('/graphql/query', instagram_payload),
+    'facebook': ('/api/graphql/', facebook_payload),
+}
+
+FEED_PAGE = """<!doctype html>
+<html><head><title>{platform} fixture</title></head>
+<body>
+<div id="feed">{items}</div>
+{embedded}
+<script>
+  let next = {page_size};
+  let loading = false;
+  const total = {total};
+  const payloadPath = '{payload_path}';
+  function loadPayload(start) {{
+    if (payloadPath) fetch(payloadPath + '?start=' + start + '&count={page_size}');
+  }}
+  loadPayload(0);
+  window.addEventListener('scroll', () => {{
+    if (loading || next >= total) return;
+    if (window.innerHeight + window.scrollY < document.body.scrollHeight - 200) return;
+    loading = true;
+    loadPayload(next);
+    fetch('/api/{platform}/items?start=' + next + '&count={page_size}')
+      .then(r => r.text())
+      .then(chunk => setTimeout(() => {{
+        document.getElementById('feed').insertAdjacentHTML('beforeend', chunk);
+        next += {page_size};
+        loading = false;
+      }}, {lazy_delay_ms}));
+  }});
+</script>
+</body></html>"""
+
+INSTAGRAM_POST_PAGE = """<!doctype html>
+<html><head><title>Instagram post</title></head>
+<body><article>
+<h1>{username} {caption}</h1>
+<time datetime="{timestamp}" title="{timestamp}">{timestamp}</time>
+</article></body></html>"""
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    total_posts = 200
+    lazy_delay_ms = 300
+    payload_dir = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_body(self, body, content_type='text/html; charset=utf-8', status=200):
+        data = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def feed(self, platform):
+        items = "".join(RENDERERS[platform](i) for i in range(min(PAGE_SIZE, self.total_posts)))
+        payload_path = PAYLOADS[platform][0] if platform in PAYLOADS else ""
+        # Facebook renders its first stories into the page as JSON too
+        embedded = embedded_json(facebook_payload(0, min(PAGE_SIZE, self.total_posts))) if platform == 'facebook' else ""
+        self.send_body(FEED_PAGE.format(platform=platform, items=items, embedded=embedded, page_size=PAGE_SIZE,
+                                        total=self.total_posts, lazy_delay_ms=self.lazy_delay_ms,
+                                        payload_path=payload_path))
+
+    def payload(self, platform, start, count):
+        if self.payload_dir:
+            recorded = os.path.join(self.payload_dir, platform, f"{start // PAGE_SIZE}.json")
+            body = ""
+            if os.path.exists(recorded):
+                with open(recorded, encoding='utf-8') as f:
+                    body = f.read()
+        else:
+            body = PAYLOADS[platform][1](start, min(start + count, self.total_posts))
+        self.send_body(body, content_type='application/json')
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        path = url.path
+        platform = self.server.platform
+        query = parse_qs(url.query)
+        start = int(query.get('start', ['0'])[0])
+        count = int(query.get('count', [str(PAGE_SIZE)])[0])
+        if platform in PAYLOADS and path == PAYLOADS[platform][0]:
+            self.payload(platform, start, count)
+        elif platform == 'twitter' and path.startswith('/srv/timeline-profile/'):
+            payload = twitter_syndication_payload(0, min(SYNDICATION_SIZE, self.total_posts))
+            self.send_body(f'<!doctype html><html><body>'
+                           f'<script id="__NEXT_DATA__" type="application/json">{payload}</script></body></html>')
+        elif platform == 'instagram' and path == '/api/v1/users/web_profile_info/':
+            username = query.get('username', ['fixture'])[0]
+            self.send_body(json.dumps({'data': {'user': {'id': INSTAGRAM_USER_ID, 'username': username}}}),
+                           content_type='application/json')
+        elif platform == 'instagram' and path == f'/api/v1/feed/user/{INSTAGRAM_USER_ID}/':
+            start = int(query.get('max_id', ['0'])[0])
+            end = min(start + count, self.total_posts)
+            self.send_body(instagram_feed_payload(start, end, self.total_posts), content_type='application/json')
+        elif path.startswith('/api/'):
+            _, _, api_platform, _ = path.split('/', 3)
+            end = min(start + count, self.total_posts)
+            self.send_body("".join(RENDERERS[api_platform](i) for i in range(start, end)))
+        elif path in ('', '/', '/favicon.ico'):
+            self.send_body("<!doctype html><html><body>home</body></html>")
+        elif platform == 'instagram' and path.startswith('/p/'):
+            idx = int(path.strip('/').split('/')[-1].replace('FIXTURE', ''))
+            self.send_body(INSTAGRAM_POST_PAGE.format(username='fixture', caption=html.escape(post_text('instagram', idx)),
+                                                      timestamp=iso_time(idx)))
+        else:
+            self.feed(platform)
+
+
+class FixtureServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, platform, port=0, total_posts=200, lazy_delay_ms=300, payload_dir=None):
+        handler = type('BoundFixtureHandler', (FixtureHandler,),
+                       {'total_posts': total_posts, 'lazy_delay_ms': lazy_delay_ms, 'payload_dir': payload_dir})
+        super().__init__(('127.0.0.1', port), handler)
+        self.platform = platform
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def start(self):
+        thread = threading.Thread(target=self.serve_forever, name=f"fixture-{self.platform}", daemon=True)
+        thread.start()
+        return self
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve synthetic social media pages for benchmarking")
+    parser.add_argument('--platform', choices=sorted(RENDERERS), default='twitter')
+    parser.add_argument('--port', type=int, default=8800)
+    parser.add_argument('--posts', type=int, default=200)
+    parser.add_argument('--lazy-delay-ms', type=int, default=300)
+    parser.add_argument('--payload-dir', help="Serve recorded feed payloads from DIR/<platform>/<page>.json")
+    args = parser.parse_args()
+    server = FixtureServer(args.platform, args.port, args.posts, args.lazy_delay_ms, args.payload_dir)
+    print(json.dumps({'platform': args.platform, 'base_url': server.base_url}))
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
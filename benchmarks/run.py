@@ -0,0 +1,106 @@
+"""Run the benchmark suite and save results as JSON for comparison between commits.
+
+    python benchmarks/run.py                       # everything
+    python benchmarks/run.py --only inference
+    python benchmarks/run.py --platforms twitter facebook --max-posts 30
+    python benchmarks/run.py --compare benchmarks/results/<old>.json benchmarks/results/<new>.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+REGRESSION_THRESHOLD = 0.10
+
+# Metric -> True when higher is better
+COMPARED_METRICS = {
+    'posts_per_sec': True,
+    'round_trips_per_post': False,
+    'peak_rss_mb': False,
+    'texts_per_sec': True,
+}
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def case_key(case):
+    if 'platform' in case:
+        backend = case.get('backend', 'dom')
+        return f"scraper:{case['platform']}" + (f":{backend}" if backend != 'dom' else "")
+    return f"inference:{case['text_length']}:bs{case['batch_size']}"
+
+
+def compare(old_path, new_path, threshold=REGRESSION_THRESHOLD):
+    with open(old_path) as f:
+        old = {case_key(c): c for c in json.load(f)['cases']}
+    with open(new_path) as f:
+        new = {case_key(c): c for c in json.load(f)['cases']}
+
+    regressions = 0
+    for key in sorted(old.keys() & new.keys()):
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            before, after = old[key].get(metric), new[key].get(metric)
+            if not before or after is None:
+                continue
+            change = (after - before) / before
+            regressed = change < -threshold if higher_is_better else change > threshold
+            regressions += regressed
+            marker = "REGRESSION" if regressed else ""
+            print(f"{key:32s} {metric:22s} {before:>10} -> {after:<10} {change:+.1%} {marker}")
+    return 1 if regressions else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--only', choices=['scrapers', 'inference'])
+    parser.add_argument('--platforms', nargs='*')
+    parser.add_argument('--max-posts', type=int, default=50)
+    parser.add_argument('--backends', nargs='*', default=['dom'], choices=['dom', 'network', 'http'])
+    parser.add_argument('--texts', type=int, default=256, help="Texts per inference case")
+    parser.add_argument('--out', help="Output JSON path (default: benchmarks/results/<git rev>.json)")
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'))
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD)
+    args = parser.parse_args()
+
+    if args.compare:
+        return compare(*args.compare, threshold=args.threshold)
+
+    cases = []
+    if args.only in (None, 'scrapers'):
+        from benchmarks import bench_scrapers
+        cases += bench_scrapers.run(args.platforms, args.max_posts, args.backends)
+    if args.only in (None, 'inference'):
+        from benchmarks import bench_inference
+        cases += bench_inference.run(n_texts=args.texts)
+
+    revision = git_revision()
+    report = {
+        'revision': revision,
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'cases': cases,
+    }
+    out = args.out or os.path.join(RESULTS_DIR, f"{revision}.json")
+    os.makedirs(os.path.dirname(out) or '.', exist_ok=True)
+    with open(out, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(cases, indent=2))
+    print(f"Saved {out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
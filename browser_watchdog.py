@@ -0,0 +1,246 @@
+"""Watch the Chrome process trees launched by the scrapers.
+
+A background thread samples RSS and CPU of every registered browser
+(chromedriver plus all its descendants) and flags browsers over the memory cap;
+the fetchers check over_cap() between scroll passes and recycle the browser,
+resuming from their checkpoint. Totals per platform go to the tracing gauges,
+so they appear in the Prometheus metrics.
+
+Each browser's pids are also written to a registry directory. If the process
+that launched them dies without quitting them (e.g. Streamlit killed
+mid-fetch), the next process reaps them when it starts (startup(), called by
+the CLI and the app) or when it launches its first browser.
+
+Sampling and reaping need psutil; without it a warning is logged once and
+browsers are neither watched nor reaped.
+"""
+import os
+import json
+import time
+import logging
+import threading
+
+from tracing import gauge, count as count_metric
+
+try:
+    import psutil
+    psutil_available = True
+except ImportError:
+    psutil_available = False
+
+DEFAULT_MEMORY_CAP_MB = int(os.environ.get('SENTIMENT_BROWSER_MEMORY_CAP_MB', 1500))
+DEFAULT_INTERVAL = 5.0
+REGISTRY_DIR = '.browser_pids'
+BROWSER_PROCESS_NAMES = ('chrome', 'chromium', 'chromedriver', 'google-chrome')
+
+logger = logging.getLogger(__name__)
+
+
+def driver_pid(driver):
+    try:
+        return driver.service.process.pid
+    except AttributeError:
+        return None
+
+
+def is_browser_process(proc):
+    try:
+        name = proc.name().lower()
+    except psutil.Error:
+        return False
+    return any(name.startswith(prefix) for prefix in BROWSER_PROCESS_NAMES)
+
+
+class BrowserHandle:
+    def __init__(self, driver, platform, pid):
+        self.driver = driver
+        self.platform = platform
+        self.pid = pid
+        self.started_at = time.time()
+        self.rss = 0
+        self.peak_rss = 0
+        self.cpu_percent = 0.0
+        self.over_cap = False
+        self._processes = {}    # pid -> psutil.Process, kept so cpu_percent has a baseline
+
+    def tree(self):
+        root = psutil.Process(self.pid)
+        procs = [root] + root.children(recursive=True)
+        current = {}
+        for proc in procs:
+            # Reuse the old object so cpu_percent measures since the last sample
+            current[proc.pid] = self._processes.get(proc.pid, proc)
+        self._processes = current
+        return list(current.values())
+
+    def sample(self, memory_cap):
+        rss, cpu = 0, 0.0
+        for proc in self.tree():
+            try:
+                rss += proc.memory_info().rss
+                cpu += proc.cpu_percent(None)
+            except psutil.Error:
+                continue
+        self.rss, self.cpu_percent = rss, cpu
+        self.peak_rss = max(self.peak_rss, rss)
+        self.over_cap = rss > memory_cap
+
+    def registry_entry(self):
+        entry = {'owner_pid': os.getpid(), 'platform': self.platform, 'started_at': self.started_at,
+                 'pids': {}}
+        for pid, proc in self._processes.items():
+            try:
+                entry['pids'][str(pid)] = proc.create_time()
+            except psutil.Error:
+                continue
+        return entry
+
+
+class BrowserWatchdog:
+    def __init__(self, memory_cap_mb=DEFAULT_MEMORY_CAP_MB, interval=DEFAULT_INTERVAL, registry_dir=REGISTRY_DIR):
+        self.memory_cap = memory_cap_mb * 2**20
+        self.interval = interval
+        self.registry_dir = registry_dir
+        self.handles = {}   # id(driver) -> BrowserHandle
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+        self._published = set()    # platforms with gauges, reset to 0 when their browsers are gone
+        self._reaped = False
+        self._warned = False
+
+    def _check_psutil(self):
+        if not psutil_available and not self._warned:
+            self._warned = True
+            logger.warning("psutil is not installed: browser memory is not watched and orphaned browsers "
+                           "are not reaped (pip install psutil)")
+        return psutil_available
+
+    def startup(self):
+        """Reap browsers orphaned by earlier runs; call once when the process starts"""
+        with self._lock:
+            if self._reaped:
+                return 0
+            self._reaped = True
+        if not self._check_psutil():
+            return 0
+        return self.reap_orphans()
+
+    # Registry -------------------------------------------------------------
+
+    def _registry_path(self, handle):
+        return os.path.join(self.registry_dir, f"{os.getpid()}-{handle.pid}.json")
+
+    def _write_registry(self, handle):
+        os.makedirs(self.registry_dir, exist_ok=True)
+        path = self._registry_path(handle)
+        tmp = f"{path}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump(handle.registry_entry(), f)
+        os.replace(tmp, path)
+
+    def reap_orphans(self):
+        """Kill browsers registered by processes that are no longer running"""
+        if not psutil_available or not os.path.isdir(self.registry_dir):
+            return 0
+        reaped = 0
+        for name in os.listdir(self.registry_dir):
+            if not name.endswith('.json'):
+                continue
+            path = os.path.join(self.registry_dir, name)
+            try:
+                with open(path) as f:
+                    entry = json.load(f)
+            except (OSError, ValueError):
+                continue
+            owner = entry.get('owner_pid')
+            if owner == os.getpid() or (owner and psutil.pid_exists(owner)):
+                continue
+            for pid, created in entry.get('pids', {}).items():
+                try:
+                    proc = psutil.Process(int(pid))
+                    # Skip pids that have since been reused by something else
+                    if abs(proc.create_time() - created) > 1 or not is_browser_process(proc):
+                        continue
+                    proc.kill()
+                    reaped += 1
+                except psutil.Error:
+                    continue
+            os.remove(path)
+        if reaped:
+            logger.warning("Reaped %d orphaned browser processes", reaped)
+            count_metric('browser_orphans_reaped', reaped)
+        return reaped
+
+    # Tracking ---------------------------------------------------------------
+
+    def register(self, driver, platform=None):
+        pid = driver_pid(driver)
+        if pid is None or not self._check_psutil():
+            return None
+        self.startup()
+        handle = BrowserHandle(driver, platform or 'unknown', pid)
+        with self._lock:
+            self.handles[id(driver)] = handle
+            self._ensure_started()
+        self._sample_one(handle)
+        return handle
+
+    def unregister(self, driver):
+        with self._lock:
+            handle = self.handles.pop(id(driver), None)
+        if handle:
+            try:
+                os.remove(self._registry_path(handle))
+            except OSError:
+                pass
+        return handle
+
+    def over_cap(self, driver):
+        handle = self.handles.get(id(driver))
+        return bool(handle and handle.over_cap)
+
+    def _ensure_started(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="browser-watchdog", daemon=True)
+            self._thread.start()
+
+    def _sample_one(self, handle):
+        try:
+            handle.sample(self.memory_cap)
+            self._write_registry(handle)
+        except psutil.NoSuchProcess:
+            pass
+        except (psutil.Error, OSError) as e:
+            logger.debug("Sampling browser %s failed: %s", handle.pid, e)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            with self._lock:
+                handles = list(self.handles.values())
+            totals = {}
+            for handle in handles:
+                self._sample_one(handle)
+                total = totals.setdefault(handle.platform, [0, 0, 0.0])
+                total[0] += 1
+                total[1] += handle.rss
+                total[2] += handle.cpu_percent
+            self.publish(totals)
+
+    def publish(self, totals):
+        for platform in set(totals) | self._published:
+            browsers, rss, cpu = totals.get(platform, (0, 0, 0.0))
+            gauge('browsers_active', browsers, platform=platform)
+            gauge('browser_rss_bytes', rss, platform=platform)
+            gauge('browser_cpu_percent', round(cpu, 1), platform=platform)
+        self._published |= set(totals)
+
+    def stats(self):
+        with self._lock:
+            handles = list(self.handles.values())
+        return [{'platform': h.platform, 'pid': h.pid, 'rss_mb': round(h.rss / 2**20, 1),
+                 'peak_rss_mb': round(h.peak_rss / 2**20, 1), 'cpu_percent': h.cpu_percent,
+                 'over_cap': h.over_cap, 'age_s': round(time.time() - h.started_at, 1)} for h in handles]
+
+
+watchdog = BrowserWatchdog()
@@ -0,0 +1,224 @@
+"""Network capture backend: read feed posts from the JSON the sites load.
+
+X, Instagram and Facebook fetch their feeds as GraphQL/XHR JSON. With Chrome's
+performance log enabled, NetworkCapture picks up matching responses and reads
+their bodies over CDP (Network.getResponseBody); the PAYLOAD_PARSERS turn them
+into Posts with the platform's post ID and an exact epoch timestamp. The page is
+only scrolled to trigger pagination, with images disabled.
+"""
+import json
+import base64
+import random
+import logging
+from datetime import datetime
+
+from selenium.common.exceptions import WebDriverException
+
+from schema import Post
+from deadline import Deadline
+from tracing import span, count as count_metric
+
+logger = logging.getLogger(__name__)
+
+# URL fragments of the feed requests worth reading, per platform
+CAPTURE_URL_PATTERNS = {
+    'twitter': ('/graphql/',),
+    'instagram': ('/graphql', '/api/v1/feed/'),
+    'facebook': ('/graphql',),
+}
+CAPTURE_MIME_TYPES = ('json', 'javascript', 'text/plain', 'text/html')
+
+
+def enable_network_logging(chrome_options):
+    """Turn on the performance log and skip image decoding for capture runs"""
+    chrome_options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
+    chrome_options.add_argument("--blink-settings=imagesEnabled=false")
+
+
+def iter_json_documents(body):
+    """Parse a response body that may hold one JSON document or one per line.
+
+    Facebook streams several documents per response and prefixes some with
+    "for (;;);".
+    """
+    body = body.strip()
+    if body.startswith("for (;;);"):
+        body = body[len("for (;;);"):]
+    try:
+        yield json.loads(body)
+        return
+    except ValueError:
+        pass
+    for line in body.splitlines():
+        line = line.strip()
+        if line.startswith(('{', '[')):
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+
+def walk(node):
+    """Yield every dict nested anywhere in a JSON document, in document order"""
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            yield node
+            stack.extend(reversed(list(node.values())))
+        elif isinstance(node, list):
+            stack.extend(reversed(node))
+
+
+def find_key(node, key):
+    for d in walk(node):
+        if d.get(key) is not None:
+            return d[key]
+    return None
+
+
+def twitter_created_at(value):
+    # "Wed Oct 10 20:19:24 +0000 2018"
+    try:
+        return str(int(datetime.strptime(value, '%a %b %d %H:%M:%S %z %Y').timestamp()))
+    except (TypeError, ValueError):
+        return value or "Unknown"
+
+
+def parse_twitter_payload(document):
+    """Tweets in UserTweets-style GraphQL responses (results with a `legacy` body)
+    and plain v1.1-style tweet objects, as on the syndication timeline"""
+    seen = set()
+    for node in walk(document):
+        legacy = node.get('legacy')
+        if isinstance(legacy, dict) and 'full_text' in legacy:
+            # Long tweets carry their untruncated text in note_tweet
+            note = find_key(node.get('note_tweet') or {}, 'text')
+            text = (note or legacy['full_text']).strip()
+            post_id = legacy.get('id_str') or node.get('rest_id')
+            created_at = legacy.get('created_at')
+        elif 'full_text' in node and node.get('id_str'):
+            text, post_id, created_at = node['full_text'].strip(), node['id_str'], node.get('created_at')
+        else:
+            continue
+        # The legacy body of a GraphQL result is itself a plain tweet object
+        if text and post_id and str(post_id) not in seen:
+            seen.add(str(post_id))
+            yield str(post_id), text, twitter_created_at(created_at)
+
+
+def parse_instagram_payload(document):
+    """Media items from the timeline GraphQL connection or the v1 feed API"""
+    for node in walk(document):
+        post_id = node.get('code') or node.get('shortcode')
+        taken_at = node.get('taken_at') or node.get('taken_at_timestamp')
+        if not post_id or taken_at is None:
+            continue
+        caption = node.get('caption')
+        if isinstance(caption, dict):
+            text = caption.get('text') or ""
+        else:
+            edges = (node.get('edge_media_to_caption') or {}).get('edges') or []
+            text = edges[0]['node'].get('text', "") if edges else ""
+        yield str(post_id), text.strip() or '[Image/Video post - No caption available]', str(int(taken_at))
+
+
+def parse_facebook_payload(document):
+    """Story nodes: a post_id with a message.text somewhere below it"""
+    for node in walk(document):
+        post_id = node.get('post_id')
+        if not post_id:
+            continue
+        message = find_key(node, 'message')
+        text = message.get('text') if isinstance(message, dict) else None
+        if not text:
+            continue
+        created = find_key(node, 'creation_time')
+        yield str(post_id), text.strip(), str(int(created)) if created else "Unknown"
+
+
+PAYLOAD_PARSERS = {
+    'twitter': parse_twitter_payload,
+    'instagram': parse_instagram_payload,
+    'facebook': parse_facebook_payload,
+}
+
+
+class NetworkCapture:
+    """Collect bodies of finished feed responses from Chrome's performance log"""
+
+    def __init__(self, driver, platform):
+        self.driver = driver
+        self.platform = platform
+        self.patterns = CAPTURE_URL_PATTERNS[platform]
+        self._pending = {}      # requestId -> url
+
+    def _wanted(self, response):
+        url = response.get('url', "")
+        mime = response.get('mimeType', "")
+        return any(p in url for p in self.patterns) and any(m in mime for m in CAPTURE_MIME_TYPES)
+
+    def drain(self):
+        """Return (url, body) for every matching response finished since the last call"""
+        bodies = []
+        with span('capture.drain', platform=self.platform):
+            for entry in self.driver.get_log('performance'):
+                try:
+                    message = json.loads(entry['message'])['message']
+                except (KeyError, ValueError):
+                    continue
+                method, params = message.get('method'), message.get('params', {})
+                if method == 'Network.responseReceived' and self._wanted(params.get('response', {})):
+                    self._pending[params['requestId']] = params['response']['url']
+                elif method == 'Network.loadingFinished' and params.get('requestId') in self._pending:
+                    url = self._pending.pop(params['requestId'])
+                    try:
+                        result = self.driver.execute_cdp_cmd('Network.getResponseBody',
+                                                             {'requestId': params['requestId']})
+                    except WebDriverException as e:
+                        # Chrome evicts bodies of old responses from its buffer
+                        logger.debug("No body for %s: %s", url, e)
+                        count_metric('capture_missing_bodies', platform=self.platform)
+                        continue
+                    body = result.get('body', "")
+                    if result.get('base64Encoded'):
+                        body = base64.b64decode(body).decode('utf-8', 'replace')
+                    bodies.append((url, body))
+        return bodies
+
+
+def iter_captured_posts(driver, platform, identifier, max_posts, progress, checkpoint=None, deadline=None,
+                        max_idle_scrolls=3, scroll_pause=(1.5, 3)):
+    """Scroll the loaded feed and yield Posts parsed from its network responses"""
+    deadline = deadline or Deadline()
+    capture = NetworkCapture(driver, platform)
+    parse = PAYLOAD_PARSERS[platform]
+    # Posts from an interrupted run come back as the feed is scrolled again; they
+    # are skipped but still count as progress
+    seen_ids = {post.post_id for post in checkpoint.posts if post.post_id} if checkpoint else set()
+    idle_scrolls = 0
+    while len(seen_ids) < max_posts and idle_scrolls < max_idle_scrolls:
+        if deadline.expired():
+            progress.warning("Stopping early with partial results: " + deadline.stop('capturing the feed'))
+            return
+        parsed_any = False
+        for url, body in capture.drain():
+            with span('capture.parse', platform=platform):
+                parsed = [item for document in iter_json_documents(body) for item in parse(document)]
+            parsed_any = parsed_any or bool(parsed)
+            for post_id, text, timestamp in parsed:
+                if post_id in seen_ids or len(seen_ids) >= max_posts:
+                    continue
+                seen_ids.add(post_id)
+                progress.emit('fetch', f"Captured post {len(seen_ids)}/{max_posts}", current=len(seen_ids), total=max_posts)
+                yield Post(text, timestamp, platform, identifier, post_id=post_id)
+        idle_scrolls = 0 if parsed_any else idle_scrolls + 1
+        if len(seen_ids) >= max_posts:
+            break
+        with span('fetch.scroll', platform=platform):
+            driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+            deadline.sleep(random.uniform(*scroll_pause))
+    if not seen_ids:
+        progress.warning("No feed responses captured. The site's API may have changed; try the DOM backend.")
+    elif checkpoint:
+        checkpoint.complete()
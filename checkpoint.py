@@ -0,0 +1,114 @@
+"""On-disk checkpoints so an interrupted fetch can resume where it stopped.
+
+A checkpoint holds the posts extracted so far and the fetcher's crawl frontier
+(how far the feed was scrolled, Instagram post links still to visit). It is
+rewritten atomically every few posts or seconds, kept when a fetch fails or is
+interrupted and removed once the fetcher marks the run complete.
+
+A Checkpoint without a directory keeps everything in memory and never touches
+disk, so fetchers can use one unconditionally.
+"""
+import os
+import json
+import time
+import hashlib
+import logging
+import tempfile
+
+from schema import Post
+
+CHECKPOINT_DIR = '.checkpoints'
+SAVE_EVERY_POSTS = 10
+SAVE_INTERVAL = 30.0
+
+logger = logging.getLogger(__name__)
+
+
+def checkpoint_path(directory, platform, identifier):
+    digest = hashlib.sha1(identifier.encode('utf-8')).hexdigest()[:16]
+    return os.path.join(directory, f"{platform}-{digest}.json")
+
+
+class Checkpoint:
+    def __init__(self, platform, identifier, directory=None, save_every=SAVE_EVERY_POSTS, save_interval=SAVE_INTERVAL):
+        self.platform = platform
+        self.identifier = identifier
+        self.path = checkpoint_path(directory, platform, identifier) if directory else None
+        self.save_every = save_every
+        self.save_interval = save_interval
+        self.posts = []
+        self.frontier = {}
+        self.completed = False
+        self._unsaved = 0
+        self._saved_at = time.monotonic()
+
+    def load(self):
+        """Read a previous checkpoint, if any; returns the posts it held"""
+        if not self.path or not os.path.exists(self.path):
+            return []
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning("Ignoring unreadable checkpoint %s: %s", self.path, e)
+            return []
+        if data.get('platform') != self.platform or data.get('identifier') != self.identifier:
+            return []
+        self.posts = [Post.from_dict(post) for post in data.get('posts', [])]
+        self.frontier = data.get('frontier', {})
+        return list(self.posts)
+
+    def seen_texts(self):
+        return {post.text for post in self.posts}
+
+    def add(self, post):
+        self.posts.append(post)
+        self._unsaved += 1
+        self._maybe_save()
+
+    def update(self, **frontier):
+        self.frontier.update(frontier)
+        self._maybe_save()
+
+    def complete(self):
+        self.completed = True
+
+    def has_progress(self):
+        """True once there is something worth resuming from: posts or an advanced frontier"""
+        return bool(self.posts) or any(self.frontier.values())
+
+    def _maybe_save(self):
+        if self._unsaved >= self.save_every or time.monotonic() - self._saved_at >= self.save_interval:
+            self.save()
+
+    def save(self):
+        if not self.path:
+            return
+        data = {
+            'platform': self.platform,
+            'identifier': self.identifier,
+            'updated_at': time.time(),
+            'frontier': self.frontier,
+            'posts': [post.to_dict() for post in self.posts],
+        }
+        directory = os.path.dirname(self.path)
+        os.makedirs(directory, exist_ok=True)
+        # Write a temp file next to the checkpoint and rename it over, so a crash
+        # mid-write never leaves a truncated checkpoint behind
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix='.tmp-', suffix='.json')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        self._unsaved = 0
+        self._saved_at = time.monotonic()
+
+    def clear(self):
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
@@ -0,0 +1,470 @@
+"""Headless entry point: fetch posts and score them without the Streamlit UI.
+
+    python cli.py analyze --platform twitter --id foo --max 500 --out results.jsonl
+
+Results are streamed to the output file batch by batch (JSONL, or Parquet when
+the path ends in .parquet and pyarrow is installed). --trace and --metrics write
+per-stage timings as a Chrome trace (open in chrome://tracing or Perfetto) and
+as Prometheus text. --profile samples the run and writes flamegraph-ready
+collapsed stacks plus a top-N summary to profiles/. --time-budget bounds the
+fetch; when it runs out the posts fetched so far are still analyzed and written.
+Near-duplicate posts (see neardup) are scored once per cluster unless
+--near-dup-threshold is 0; with --store, clusters extend to stored posts.
+
+    python cli.py batch --targets watchlist.txt --concurrency 24 --backend http --out results.jsonl
+
+runs every target of a watchlist (one "platform identifier" per line)
+concurrently through orchestrator.Orchestrator and scores each fetch as it
+finishes.
+
+    python cli.py submit --targets watchlist.txt --queue sentiment_jobs.db
+    python cli.py worker --queue sentiment_jobs.db --store sentiment_results.db
+
+put fetch-and-analyze jobs on the durable queue (see jobqueue) and run
+workers that pull them (see worker).
+"""
+import sys
+import json
+import sqlite3
+import signal
+import asyncio
+import logging
+import argparse
+
+import tracing
+from export import StreamingParquetWriter, DEFAULT_ROW_GROUP_SIZE
+from progress import ProgressBus, LogSubscriber
+from profiling import SamplingProfiler, DEFAULT_PROFILE_DIR
+from timestamps import TimestampReport
+from store import ResultStore, DEFAULT_DB_PATH
+from scrapers import (FETCHERS, BACKENDS, NETWORK_BACKEND_PLATFORMS, HTTP_BACKEND_PLATFORMS, check_backend,
+                      iter_resumable_posts)
+from checkpoint import CHECKPOINT_DIR
+from deadline import Deadline
+from orchestrator import Orchestrator, FetchJob, DEFAULT_MAX_SESSIONS, DEFAULT_PER_PLATFORM
+from jobqueue import open_broker, DEFAULT_QUEUE_PATH, LEASE_SECONDS
+from neardup import NearDuplicateIndex, DEFAULT_THRESHOLD
+from sentiment import load_sentiment_pipelines, stream_analyzed_posts, INFERENCE_BATCH_SIZE
+from browser_watchdog import watchdog
+
+# Exit codes
+EXIT_OK = 0
+EXIT_NO_POSTS = 1
+EXIT_USAGE = 2          # also what argparse uses for bad arguments
+EXIT_FETCH_FAILED = 3
+EXIT_OUTPUT_FAILED = 4
+
+logger = logging.getLogger("sentiment.cli")
+
+
+class JsonlWriter:
+    def __init__(self, path):
+        self.file = sys.stdout if path == '-' else open(path, 'w', encoding='utf-8')
+
+    def write_batch(self, batch):
+        for row in batch.rows():
+            self.file.write(json.dumps(row, ensure_ascii=False) + "\n")
+        self.file.flush()
+
+    def close(self):
+        if self.file is not sys.stdout:
+            self.file.close()
+
+    def abort(self):
+        try:
+            self.close()
+        except OSError:
+            pass
+
+
+def open_writer(path, row_group_size=DEFAULT_ROW_GROUP_SIZE):
+    if path.endswith('.parquet'):
+        return StreamingParquetWriter(path, row_group_size)
+    return JsonlWriter(path)
+
+
+def close_writer(writer, failed=False):
+    """Close the output, or abandon it after a failed write; returns False if the final flush fails"""
+    if failed:
+        writer.abort()
+        return True
+    try:
+        writer.close()
+    except OSError as e:
+        logger.error("Failed writing results: %s", e)
+        return False
+    return True
+
+
+def run_analyze(args):
+    if args.max < 1:
+        logger.error("--max must be at least 1")
+        return EXIT_USAGE
+    if not 0 <= args.near_dup_threshold <= 1:
+        logger.error("--near-dup-threshold must be between 0 and 1")
+        return EXIT_USAGE
+    if args.backend == 'network' and args.platform not in NETWORK_BACKEND_PLATFORMS:
+        logger.error("--backend network supports %s", ", ".join(sorted(NETWORK_BACKEND_PLATFORMS)))
+        return EXIT_USAGE
+    if args.backend == 'http' and args.platform not in HTTP_BACKEND_PLATFORMS:
+        logger.error("--backend http supports %s", ", ".join(sorted(HTTP_BACKEND_PLATFORMS)))
+        return EXIT_USAGE
+    fetch = FETCHERS[args.platform]
+    fetch_kwargs = {'backend': args.backend} if args.backend != 'dom' else {}
+    deadline = fetch_kwargs['deadline'] = Deadline(args.time_budget)
+    progress = ProgressBus(platform=args.platform)
+    log_progress = LogSubscriber(logger, interval=args.progress_interval)
+    progress.subscribe(log_progress)
+
+    try:
+        writer = open_writer(args.out, args.row_group_size)
+    except (OSError, ImportError) as e:
+        logger.error("Cannot open output %s: %s", args.out, e)
+        return EXIT_OUTPUT_FAILED
+
+    result_store = ResultStore(args.store) if args.store else None
+    dedup = NearDuplicateIndex(args.near_dup_threshold) if args.near_dup_threshold else None
+    if dedup and result_store:
+        dedup.seed(result_store.labeled_signatures())
+    total = 0
+    output_failed = False
+    timestamp_report = TimestampReport()
+    profiler = SamplingProfiler(platform=args.platform).start() if args.profile else None
+    with tracing.run_trace(platform=args.platform, identifier=args.id) as run:
+        try:
+            pipelines = load_sentiment_pipelines()
+            if args.resume:
+                posts = iter_resumable_posts(fetch, args.platform, args.id, args.max, progress,
+                                             checkpoint_dir=args.checkpoint_dir, **fetch_kwargs)
+            else:
+                posts = fetch(args.id, args.max, progress, **fetch_kwargs)
+            for batch in stream_analyzed_posts(posts, pipelines, batch_size=args.batch_size, dedup=dedup):
+                # Only the writes map to EXIT_OUTPUT_FAILED; OSErrors from the fetch are fetch failures
+                try:
+                    writer.write_batch(batch)
+                    if result_store:
+                        result_store.add_batch(batch)
+                except (OSError, sqlite3.Error) as e:
+                    logger.error("Failed writing results: %s", e)
+                    output_failed = True
+                    return EXIT_OUTPUT_FAILED
+                total += len(batch)
+                timestamp_report = timestamp_report.merge(batch.timestamp_report)
+        except Exception as e:
+            logger.error("Fetch failed after %d posts: %s", total, e)
+            return EXIT_FETCH_FAILED
+        finally:
+            log_progress.flush()
+            closed = close_writer(writer, output_failed)
+            if result_store:
+                result_store.close()
+            write_timings(run, args)
+            if profiler:
+                save_profile(profiler, total, args.profile)
+
+    if not closed:
+        return EXIT_OUTPUT_FAILED
+    if not total:
+        logger.error("No posts fetched. Check identifier or cookies.")
+        return EXIT_NO_POSTS
+    logger.info("Wrote %d analyzed posts to %s", total, args.out)
+    reused = run.counters.get('near_duplicates_reused')
+    if reused:
+        logger.info("%d near-duplicate posts reused the label of an earlier post", reused)
+    if deadline.partial:
+        logger.warning("Results are partial: %s", deadline.reason)
+    if timestamp_report.failures:
+        logger.warning("%d timestamps could not be parsed (%.0f%%), e.g. %s", timestamp_report.failures,
+                       timestamp_report.failure_rate * 100, timestamp_report.examples[:3])
+    return EXIT_OK
+
+
+def read_targets(path, max_posts, time_budget=None, backend='dom'):
+    """FetchJobs for a watchlist file: "platform identifier [max_posts]" per line, # comments"""
+    jobs = []
+    with open(path, encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.split('#', 1)[0].strip()
+            if not line:
+                continue
+            fields = line.split()
+            if len(fields) not in (2, 3) or fields[0] not in FETCHERS:
+                raise ValueError(f"{path}:{line_number}: expected 'platform identifier [max_posts]'")
+            platform, identifier = fields[:2]
+            kwargs = {}
+            # Platforms without the requested backend use the DOM fetcher
+            if (backend == 'network' and platform in NETWORK_BACKEND_PLATFORMS
+                    or backend == 'http' and platform in HTTP_BACKEND_PLATFORMS):
+                kwargs['backend'] = backend
+            jobs.append(FetchJob(platform, identifier, int(fields[2]) if len(fields) == 3 else max_posts,
+                                 time_budget, **kwargs))
+    return jobs
+
+
+def run_batch(args):
+    if args.max < 1 or args.concurrency < 1:
+        logger.error("--max and --concurrency must be at least 1")
+        return EXIT_USAGE
+    if not 0 <= args.near_dup_threshold <= 1:
+        logger.error("--near-dup-threshold must be between 0 and 1")
+        return EXIT_USAGE
+    try:
+        jobs = read_targets(args.targets, args.max, args.time_budget, args.backend)
+    except (OSError, ValueError) as e:
+        logger.error("Cannot read targets: %s", e)
+        return EXIT_USAGE
+    if not jobs:
+        logger.error("No targets in %s", args.targets)
+        return EXIT_USAGE
+    try:
+        writer = open_writer(args.out, args.row_group_size)
+    except (OSError, ImportError) as e:
+        logger.error("Cannot open output %s: %s", args.out, e)
+        return EXIT_OUTPUT_FAILED
+
+    def progress_factory(job):
+        progress = ProgressBus(platform=job.platform)
+        progress.subscribe(LogSubscriber(logger, interval=args.progress_interval))
+        return progress
+
+    result_store = ResultStore(args.store) if args.store else None
+    dedup = NearDuplicateIndex(args.near_dup_threshold) if args.near_dup_threshold else None
+    if dedup and result_store:
+        dedup.seed(result_store.labeled_signatures())
+    orchestrator = Orchestrator(args.concurrency, args.per_platform,
+                                checkpoint_dir=args.checkpoint_dir if args.resume else None,
+                                progress_factory=progress_factory)
+    pipelines = load_sentiment_pipelines()
+    totals = {'posts': 0, 'failed': 0, 'partial': 0}
+
+    def analyze(posts):
+        return list(stream_analyzed_posts(iter(posts), pipelines, batch_size=args.batch_size, dedup=dedup))
+
+    async def crawl():
+        async with orchestrator:
+            async for result in orchestrator.as_completed(jobs):
+                job = result.job
+                if result.error:
+                    totals['failed'] += 1
+                if result.partial_reason:
+                    totals['partial'] += 1
+                    logger.warning("%s %s is partial: %s", job.platform, job.identifier, result.partial_reason)
+                if not result.posts:
+                    continue
+                # Scoring runs off the loop so the other fetches keep being collected
+                for batch in await asyncio.to_thread(analyze, result.posts):
+                    try:
+                        writer.write_batch(batch)
+                        if result_store:
+                            result_store.add_batch(batch)
+                    except (OSError, sqlite3.Error) as e:
+                        logger.error("Failed writing results: %s", e)
+                        return EXIT_OUTPUT_FAILED
+                    totals['posts'] += len(batch)
+                logger.info("%s %s: %d posts in %.1fs", job.platform, job.identifier, len(result.posts),
+                            result.seconds)
+        return EXIT_OK
+
+    with tracing.run_trace(command='batch', targets=len(jobs)) as run:
+        status = None
+        try:
+            status = asyncio.run(crawl())
+        finally:
+            closed = close_writer(writer, status == EXIT_OUTPUT_FAILED)
+            if result_store:
+                result_store.close()
+            write_timings(run, args)
+    if status != EXIT_OK or not closed:
+        return EXIT_OUTPUT_FAILED
+
+    logger.info("Wrote %d analyzed posts from %d targets to %s (%d failed, %d partial)", totals['posts'],
+                len(jobs), args.out, totals['failed'], totals['partial'])
+    if not totals['posts']:
+        return EXIT_NO_POSTS if not totals['failed'] else EXIT_FETCH_FAILED
+    return EXIT_OK
+
+
+def run_submit(args):
+    if args.max < 1 or not 0 <= args.near_dup_threshold <= 1:
+        logger.error("--max must be at least 1 and --near-dup-threshold between 0 and 1")
+        return EXIT_USAGE
+    if args.targets:
+        try:
+            jobs = read_targets(args.targets, args.max, args.time_budget, args.backend)
+        except (OSError, ValueError) as e:
+            logger.error("Cannot read targets: %s", e)
+            return EXIT_USAGE
+    elif args.platform and args.id:
+        try:
+            check_backend(args.platform, args.backend)
+        except ValueError as e:
+            logger.error("%s", e)
+            return EXIT_USAGE
+        jobs = [FetchJob(args.platform, args.id, args.max, args.time_budget,
+                         **({'backend': args.backend} if args.backend != 'dom' else {}))]
+    else:
+        logger.error("Give --targets, or --platform and --id")
+        return EXIT_USAGE
+    broker = open_broker(args.queue)
+    try:
+        for job in jobs:
+            job_id = broker.submit(job.platform, job.identifier, job.max_posts, time_budget=job.time_budget,
+                                   near_dup_threshold=args.near_dup_threshold, **job.fetch_kwargs)
+            logger.info("Queued job %d: %s %s", job_id, job.platform, job.identifier)
+    finally:
+        broker.close()
+    return EXIT_OK
+
+
+def run_worker(args):
+    # Imported here so submitting jobs doesn't pull in the worker's dependencies
+    from worker import Worker
+    broker = open_broker(args.queue)
+    result_store = ResultStore(args.store)
+    worker = Worker(broker, result_store, load_sentiment_pipelines(), worker_id=args.worker_id,
+                    lease_seconds=args.lease, heartbeat_interval=args.heartbeat, poll_interval=args.poll_interval,
+                    checkpoint_dir=args.checkpoint_dir, batch_size=args.batch_size)
+    # Finish the running job on SIGTERM/Ctrl-C instead of leaving it to the lease timeout
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda *_: worker.stop())
+    logger.info("Worker %s polling %s", worker.worker_id, args.queue)
+    try:
+        done = worker.run(args.max_jobs, exit_when_idle=args.exit_when_idle)
+    finally:
+        result_store.close()
+        broker.close()
+    logger.info("Worker %s ran %d jobs", worker.worker_id, done)
+    return EXIT_OK
+
+
+def write_timings(run, args):
+    for stage in run.breakdown():
+        logger.debug("%-22s %4d calls %8.2fs total %7.3fs max", stage['stage'], stage['calls'],
+                     stage['total_s'], stage['max_s'])
+    try:
+        if args.trace:
+            tracing.write_json_trace(args.trace, run)
+        if args.metrics:
+            tracing.write_prometheus(args.metrics)
+    except OSError as e:
+        logger.warning("Could not write timings: %s", e)
+
+
+def save_profile(profiler, total, directory):
+    profiler.stop()
+    profiler.tag(posts=total)
+    try:
+        paths = profiler.save(directory)
+    except OSError as e:
+        logger.warning("Could not write profile: %s", e)
+        return
+    logger.info("Profile written to %s (collapsed stacks: %s)", paths['summary'], paths['folded'])
+
+
+def run_serve(args):
+    from server import serve
+    serve(load_sentiment_pipelines(), host=args.host, port=args.port,
+          max_batch_size=args.max_batch_size, max_wait=args.max_wait_ms / 1000)
+    return EXIT_OK
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Social media sentiment analysis without the web UI")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    analyze = subparsers.add_parser('analyze', help="Fetch posts and write sentiment results")
+    analyze.add_argument('--platform', required=True, choices=sorted(FETCHERS))
+    analyze.add_argument('--id', required=True, help="Username (Twitter/Instagram) or page URL (LinkedIn/Facebook)")
+    analyze.add_argument('--max', type=int, default=100, help="Maximum number of posts to fetch")
+    analyze.add_argument('--out', default='-', help="Output path (.jsonl or .parquet), '-' for stdout")
+    analyze.add_argument('--backend', choices=BACKENDS, default='dom',
+                         help="'network' reads posts from the feed's JSON responses (X, Instagram, Facebook); "
+                              "'http' reads them without a browser, falling back to 'dom' when that fails")
+    analyze.add_argument('--no-resume', dest='resume', action='store_false',
+                         help="Start over instead of resuming from a checkpoint left by an interrupted run")
+    analyze.add_argument('--checkpoint-dir', default=CHECKPOINT_DIR)
+    analyze.add_argument('--time-budget', type=float, default=None, metavar='SECONDS',
+                         help="Stop fetching after this many seconds and keep the posts fetched so far")
+    analyze.add_argument('--near-dup-threshold', type=float, default=DEFAULT_THRESHOLD, metavar='SIMILARITY',
+                         help="Score one post per cluster of posts at least this similar (0 turns it off)")
+    analyze.add_argument('--batch-size', type=int, default=INFERENCE_BATCH_SIZE)
+    analyze.add_argument('--row-group-size', type=int, default=DEFAULT_ROW_GROUP_SIZE,
+                         help="Rows buffered per Parquet row group")
+    analyze.add_argument('--store', nargs='?', const=DEFAULT_DB_PATH, default=None,
+                         help=f"Also add results to the SQLite history/rollup store (default path: {DEFAULT_DB_PATH})")
+    analyze.add_argument('--progress-interval', type=float, default=2.0,
+                         help="Minimum seconds between progress log lines")
+    analyze.add_argument('--trace', help="Write per-stage spans as a Chrome trace JSON file")
+    analyze.add_argument('--metrics', help="Write stage histograms and counters in Prometheus text format")
+    analyze.add_argument('--profile', nargs='?', const=DEFAULT_PROFILE_DIR, default=None, metavar='DIR',
+                         help=f"Profile the run and write collapsed stacks and a summary (default dir: {DEFAULT_PROFILE_DIR})")
+    analyze.set_defaults(handler=run_analyze)
+
+    batch = subparsers.add_parser('batch', help="Fetch and analyze a watchlist of targets concurrently")
+    batch.add_argument('--targets', required=True, help="File with one 'platform identifier [max_posts]' per line")
+    batch.add_argument('--max', type=int, default=100, help="Maximum number of posts per target")
+    batch.add_argument('--out', default='-', help="Output path (.jsonl or .parquet), '-' for stdout")
+    batch.add_argument('--backend', choices=BACKENDS, default='dom',
+                       help="Backend for the targets whose platform supports it")
+    batch.add_argument('--concurrency', type=int, default=DEFAULT_MAX_SESSIONS,
+                       help="Fetches running at once across all platforms")
+    batch.add_argument('--per-platform', type=int, default=DEFAULT_PER_PLATFORM,
+                       help="Fetches running at once per platform")
+    batch.add_argument('--no-resume', dest='resume', action='store_false')
+    batch.add_argument('--checkpoint-dir', default=CHECKPOINT_DIR)
+    batch.add_argument('--time-budget', type=float, default=None, metavar='SECONDS', help="Budget per target")
+    batch.add_argument('--near-dup-threshold', type=float, default=DEFAULT_THRESHOLD, metavar='SIMILARITY')
+    batch.add_argument('--batch-size', type=int, default=INFERENCE_BATCH_SIZE)
+    batch.add_argument('--row-group-size', type=int, default=DEFAULT_ROW_GROUP_SIZE)
+    batch.add_argument('--store', nargs='?', const=DEFAULT_DB_PATH, default=None)
+    batch.add_argument('--progress-interval', type=float, default=10.0)
+    batch.add_argument('--trace', help="Write per-stage spans as a Chrome trace JSON file")
+    batch.add_argument('--metrics', help="Write stage histograms and counters in Prometheus text format")
+    batch.set_defaults(handler=run_batch)
+
+    submit = subparsers.add_parser('submit', help="Put fetch-and-analyze jobs on the worker queue")
+    submit.add_argument('--queue', default=DEFAULT_QUEUE_PATH, help="Queue path or 'scheme://location'")
+    submit.add_argument('--targets', help="File with one 'platform identifier [max_posts]' per line")
+    submit.add_argument('--platform', choices=sorted(FETCHERS))
+    submit.add_argument('--id', help="Username or page URL, with --platform")
+    submit.add_argument('--max', type=int, default=100)
+    submit.add_argument('--backend', choices=BACKENDS, default='dom')
+    submit.add_argument('--time-budget', type=float, default=None, metavar='SECONDS')
+    submit.add_argument('--near-dup-threshold', type=float, default=DEFAULT_THRESHOLD, metavar='SIMILARITY')
+    submit.set_defaults(handler=run_submit)
+
+    worker = subparsers.add_parser('worker', help="Run queued jobs and write their results to the store")
+    worker.add_argument('--queue', default=DEFAULT_QUEUE_PATH, help="Queue path or 'scheme://location'")
+    worker.add_argument('--store', default=DEFAULT_DB_PATH)
+    worker.add_argument('--worker-id', help="Defaults to <hostname>-<pid>")
+    worker.add_argument('--lease', type=float, default=LEASE_SECONDS, metavar='SECONDS',
+                        help="A job whose worker stops sending heartbeats for this long is requeued")
+    worker.add_argument('--heartbeat', type=float, default=30.0, metavar='SECONDS')
+    worker.add_argument('--poll-interval', type=float, default=5.0, metavar='SECONDS')
+    worker.add_argument('--max-jobs', type=int, default=None)
+    worker.add_argument('--exit-when-idle', action='store_true', help="Stop once the queue is empty")
+    worker.add_argument('--checkpoint-dir', default=CHECKPOINT_DIR)
+    worker.add_argument('--batch-size', type=int, default=INFERENCE_BATCH_SIZE)
+    worker.set_defaults(handler=run_worker)
+
+    serve = subparsers.add_parser('serve', help="Run the HTTP sentiment scoring service")
+    serve.add_argument('--host', default='127.0.0.1')
+    serve.add_argument('--port', type=int, default=8765)
+    serve.add_argument('--max-batch-size', type=int, default=INFERENCE_BATCH_SIZE)
+    serve.add_argument('--max-wait-ms', type=float, default=5.0,
+                       help="How long to wait for more requests before running a batch")
+    serve.set_defaults(handler=run_serve)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s", stream=sys.stderr)
+    if args.handler in (run_analyze, run_batch, run_worker):
+        # Commands that launch browsers first reap any a killed run left behind
+        watchdog.startup()
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,62 @@
+"""Wall-clock budgets for fetches.
+
+A Deadline is created by the caller and passed down to a fetcher, which uses it
+for every sleep, WebDriverWait timeout and page load, and checks it between
+scroll passes and post visits. When it runs out the fetcher stops where it is
+and the posts yielded so far are the (partial) result:
+
+    deadline = Deadline(120)
+    posts = list(iter_facebook_posts(url, 200, deadline=deadline))
+    if deadline.partial:
+        print("partial:", deadline.reason)
+
+Deadline() without a budget never expires.
+"""
+import time
+
+
+class Deadline:
+    def __init__(self, seconds=None):
+        self.budget = seconds or None
+        self.started = time.monotonic()
+        self.expires_at = self.started + seconds if seconds else None
+        self.reason = None
+
+    def __repr__(self):
+        return f"Deadline(budget={self.budget}, remaining={self.remaining():.1f})"
+
+    def remaining(self):
+        if self.expires_at is None:
+            return float('inf')
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self):
+        return self.remaining() <= 0
+
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    def cap(self, seconds, minimum=0.1):
+        """`seconds`, shortened to what is left of the budget (for timeouts)"""
+        return max(minimum, min(seconds, self.remaining()))
+
+    def sleep(self, seconds):
+        """Sleep up to `seconds`; returns False when the budget ran out"""
+        time.sleep(min(seconds, self.remaining()))
+        return not self.expired()
+
+    def stop(self, stage):
+        """Record why the fetch stopped early; returns the reason"""
+        if self.reason is None:
+            self.reason = f"time budget of {self.budget:g}s used up during {stage} after {self.elapsed():.0f}s"
+        return self.reason
+
+    def cancel(self, reason):
+        """Expire the budget now, e.g. because the caller gave up on the fetch"""
+        self.expires_at = time.monotonic()
+        if self.reason is None:
+            self.reason = reason
+
+    @property
+    def partial(self):
+        return self.reason is not None
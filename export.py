@@ -0,0 +1,105 @@
+"""Typed columnar export of analyzed posts (Parquet / Arrow IPC / CSV).
+
+Exports are built from schema.ResultBatch, so sentiment, platform and identifier
+stay dictionary-encoded, confidence stays float32 and timestamps are UTC. pyarrow
+is optional; only the CSV export works without it.
+"""
+import io
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    pyarrow_available = True
+except ImportError:
+    pyarrow_available = False
+
+from schema import ResultBatch
+
+DEFAULT_ROW_GROUP_SIZE = 50000
+
+EXPORT_FORMATS = {
+    'CSV': ('csv', 'text/csv'),
+    'Parquet': ('parquet', 'application/vnd.apache.parquet'),
+    'Arrow IPC': ('arrow', 'application/vnd.apache.arrow.file'),
+}
+
+
+def results_table(batch):
+    if not pyarrow_available:
+        raise ImportError("pyarrow is required for Parquet/Arrow export. Install with 'pip install pyarrow'.")
+    return pa.Table.from_pandas(batch.to_frame(), preserve_index=False)
+
+
+def to_csv_bytes(batch):
+    return batch.to_frame().to_csv(index=False).encode('utf-8')
+
+
+def to_parquet_bytes(batch):
+    buffer = io.BytesIO()
+    pq.write_table(results_table(batch), buffer, compression='zstd')
+    return buffer.getvalue()
+
+
+def to_arrow_ipc_bytes(batch):
+    table = results_table(batch)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def export_bytes(batch, fmt):
+    if fmt == 'Parquet':
+        return to_parquet_bytes(batch)
+    if fmt == 'Arrow IPC':
+        return to_arrow_ipc_bytes(batch)
+    return to_csv_bytes(batch)
+
+
+class StreamingParquetWriter:
+    """Append ResultBatches to a Parquet file in bounded row groups"""
+
+    def __init__(self, path, row_group_size=DEFAULT_ROW_GROUP_SIZE):
+        if not pyarrow_available:
+            raise ImportError("pyarrow is required for Parquet output. Install with 'pip install pyarrow'.")
+        self.path = path
+        self.row_group_size = row_group_size
+        self.pending = []
+        self.pending_rows = 0
+        self.writer = None
+        self.schema = None
+
+    def write_batch(self, batch):
+        self.pending.append(batch)
+        self.pending_rows += len(batch)
+        if self.pending_rows >= self.row_group_size:
+            self._flush()
+
+    def _flush(self):
+        if not self.pending_rows:
+            return
+        table = results_table(ResultBatch.concat(self.pending))
+        if self.writer is None:
+            self.schema = table.schema
+            self.writer = pq.ParquetWriter(self.path, self.schema, compression='zstd')
+        else:
+            # Dictionary encodings differ between chunks; cast to the file schema
+            table = table.cast(self.schema)
+        self.writer.write_table(table, row_group_size=self.row_group_size)
+        self.pending = []
+        self.pending_rows = 0
+
+    def close(self):
+        self._flush()
+        if self.writer is not None:
+            self.writer.close()
+
+    def abort(self):
+        """Close after a failed write without flushing the pending rows to the same sink"""
+        self.pending = []
+        self.pending_rows = 0
+        if self.writer is not None:
+            try:
+                self.writer.close()
+            except OSError:
+                pass
@@ -0,0 +1,227 @@
+"""Browserless fetch backend: read posts over plain HTTP with pooled connections.
+
+Some feeds can be read without a browser: X's public syndication timeline,
+Instagram's web JSON API (authorized by the same cookie file the Selenium
+fetcher uses) and the JSON Facebook embeds in its server-rendered pages. The
+responses go through the capture.PAYLOAD_PARSERS, so posts carry the platform's
+post ID and timestamp exactly as with the network backend. A request on a warm
+pooled connection takes milliseconds where a Chrome page load takes seconds.
+
+HTTP_CAPABILITIES says what each platform supports. The fetchers in scrapers.py
+use this backend with backend='http' and fall back to Selenium when it fails.
+Site roots come from HTTP_BASE_URLS (SENTIMENT_HTTP_BASE_URL_<PLATFORM>), so the
+backend can run against benchmarks/fixture_server.py.
+"""
+import os
+import re
+import json
+import threading
+from urllib.parse import urlparse
+
+try:
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+    requests_available = True
+except ImportError:
+    requests_available = False
+
+from schema import Post
+from progress import ProgressBus
+from checkpoint import Checkpoint
+from deadline import Deadline
+from tracing import span, count as count_metric
+from capture import PAYLOAD_PARSERS, iter_json_documents
+
+HTTP_BASE_URLS = {
+    platform: os.environ.get(f"SENTIMENT_HTTP_BASE_URL_{platform.upper()}", default)
+    for platform, default in (
+        ('twitter', "https://syndication.twitter.com"),
+        ('instagram', "https://www.instagram.com"),
+        ('facebook', "https://www.facebook.com"),
+    )
+}
+
+# enabled: posts can be read over HTTP at all
+# paginated: the source pages past its first response (otherwise only the latest posts are available)
+# cookies: requests carry the platform's cookie file
+HTTP_CAPABILITIES = {
+    'twitter': {'enabled': True, 'paginated': False, 'cookies': False},
+    'instagram': {'enabled': True, 'paginated': True, 'cookies': True},
+    'facebook': {'enabled': True, 'paginated': False, 'cookies': True},
+    # The feed is only rendered client-side behind the authwall
+    'linkedin': {'enabled': False, 'paginated': False, 'cookies': True},
+}
+HTTP_BACKEND_PLATFORMS = frozenset(platform for platform, caps in HTTP_CAPABILITIES.items() if caps['enabled'])
+
+COOKIE_FILES = {
+    'twitter': 'cookies.json',
+    'linkedin': 'linkedin_cookies.json',
+    'instagram': 'instagram_cookies.json',
+    'facebook': 'facebook_cookies.json',
+}
+
+USER_AGENT = ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) "
+              "Chrome/120.0.0.0 Safari/537.36")
+POOL_SIZE = 8
+HTTP_TIMEOUT = 15
+INSTAGRAM_APP_ID = '936619743392459'
+INSTAGRAM_PAGE_SIZE = 12
+
+# Server-rendered pages carry their data in <script type="application/json"> tags
+EMBEDDED_JSON_RE = re.compile(r'<script[^>]*type="application/json"[^>]*>(.*?)</script>', re.S | re.I)
+
+
+class HttpFetchError(Exception):
+    """The HTTP backend could not read the feed; the caller may fall back to the browser"""
+
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def load_cookie_jar(session, path):
+    """Put the cookies of a Cookie-Editor export into a session"""
+    with open(path, 'r') as f:
+        cookies = json.load(f)
+    for cookie in cookies:
+        session.cookies.set(cookie['name'], cookie['value'], domain=cookie.get('domain', ''),
+                            path=cookie.get('path', '/'))
+
+
+def get_session(platform):
+    """The platform's pooled session, created with its cookies on first use"""
+    with _sessions_lock:
+        session = _sessions.get(platform)
+        if session is not None:
+            return session
+        session = requests.Session()
+        retry = Retry(total=2, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504),
+                      allowed_methods=('GET',), respect_retry_after_header=False)
+        adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE, max_retries=retry)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        session.headers['User-Agent'] = USER_AGENT
+        if HTTP_CAPABILITIES[platform]['cookies']:
+            path = COOKIE_FILES[platform]
+            try:
+                with span('fetch.cookies.load', platform=platform):
+                    load_cookie_jar(session, path)
+            except (OSError, ValueError, KeyError) as e:
+                session.close()
+                raise HttpFetchError(f"cannot load {path}: {e}") from e
+        _sessions[platform] = session
+        return session
+
+
+def close_sessions():
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+
+
+def http_get(session, url, platform, deadline, **kwargs):
+    with span('fetch.http', platform=platform):
+        try:
+            response = session.get(url, timeout=deadline.cap(HTTP_TIMEOUT), **kwargs)
+        except requests.RequestException as e:
+            raise HttpFetchError(f"{url}: {e}") from e
+    count_metric('http_requests', platform=platform, status=response.status_code)
+    path = urlparse(response.url).path
+    if response.status_code in (401, 403) or 'login' in path or 'authwall' in path:
+        raise HttpFetchError(f"{url}: login required, the cookies may have expired")
+    if response.status_code != 200:
+        raise HttpFetchError(f"{url}: HTTP {response.status_code}")
+    return response
+
+
+def http_json(session, url, platform, deadline, **kwargs):
+    response = http_get(session, url, platform, deadline, **kwargs)
+    try:
+        return response.json()
+    except ValueError as e:
+        raise HttpFetchError(f"{url}: response is not JSON") from e
+
+
+def embedded_documents(html):
+    """JSON documents embedded in a server-rendered page"""
+    for body in EMBEDDED_JSON_RE.findall(html):
+        yield from iter_json_documents(body)
+
+
+# Sources yield (documents, cursor) per page; cursor is where the next page
+# starts, None after the last one. They resume from a cursor saved earlier.
+
+def twitter_pages(session, username, deadline, cursor=None):
+    url = f"{HTTP_BASE_URLS['twitter']}/srv/timeline-profile/screen-name/{username}"
+    response = http_get(session, url, 'twitter', deadline)
+    yield list(embedded_documents(response.text)), None
+
+
+def instagram_pages(session, username, deadline, cursor=None):
+    base = HTTP_BASE_URLS['instagram']
+    headers = {'X-IG-App-ID': INSTAGRAM_APP_ID}
+    profile = http_json(session, f"{base}/api/v1/users/web_profile_info/", 'instagram', deadline,
+                        params={'username': username}, headers=headers)
+    user = (profile.get('data') or {}).get('user') or {}
+    if not user.get('id'):
+        raise HttpFetchError(f"Instagram profile {username!r} not found")
+    while True:
+        params = {'count': INSTAGRAM_PAGE_SIZE}
+        if cursor:
+            params['max_id'] = cursor
+        page = http_json(session, f"{base}/api/v1/feed/user/{user['id']}/", 'instagram', deadline,
+                         params=params, headers=headers)
+        cursor = page.get('next_max_id') if page.get('more_available') else None
+        yield [page], cursor
+        if not cursor:
+            return
+
+
+def facebook_pages(session, page_url, deadline, cursor=None):
+    response = http_get(session, page_url, 'facebook', deadline)
+    yield list(embedded_documents(response.text)), None
+
+
+HTTP_SOURCES = {
+    'twitter': twitter_pages,
+    'instagram': instagram_pages,
+    'facebook': facebook_pages,
+}
+
+
+def iter_http_posts(platform, identifier, max_posts=100, progress=None, checkpoint=None, deadline=None):
+    """Yield Posts read over HTTP; raises HttpFetchError when the feed can't be read"""
+    if platform not in HTTP_BACKEND_PLATFORMS:
+        raise HttpFetchError(f"The HTTP backend is not available for {platform}")
+    if not requests_available:
+        raise HttpFetchError("the requests package is not installed")
+    progress = progress or ProgressBus(platform=platform)
+    deadline = deadline or Deadline()
+    checkpoint = checkpoint or Checkpoint(platform, identifier)
+    session = get_session(platform)
+    parse = PAYLOAD_PARSERS[platform]
+    seen_ids = {post.post_id for post in checkpoint.posts if post.post_id}
+    pages = HTTP_SOURCES[platform](session, identifier, deadline, checkpoint.frontier.get('http_cursor'))
+    for documents, cursor in pages:
+        with span('capture.parse', platform=platform):
+            parsed = [item for document in documents for item in parse(document)]
+        for post_id, text, timestamp in parsed:
+            if post_id in seen_ids:
+                continue
+            seen_ids.add(post_id)
+            progress.emit('fetch', f"Fetched post {len(seen_ids)}/{max_posts} over HTTP",
+                          current=len(seen_ids), total=max_posts)
+            yield Post(text, timestamp, platform, identifier, post_id=post_id)
+            if len(seen_ids) >= max_posts:
+                checkpoint.complete()
+                return
+        checkpoint.update(http_cursor=cursor)
+        if cursor and deadline.expired():
+            progress.warning("Stopping early with partial results: " + deadline.stop('paging over HTTP'))
+            return
+    if seen_ids:
+        if not HTTP_CAPABILITIES[platform]['paginated']:
+            progress.info(f"Only the latest {len(seen_ids)} {platform} posts are available over HTTP")
+        checkpoint.complete()
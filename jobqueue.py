@@ -0,0 +1,306 @@
+"""Durable queue of fetch-and-analyze jobs for scrape workers.
+
+One host runs only a few Chrome instances, so watchlists are spread over
+workers on many machines (see worker.py). The app and `cli.py submit` put jobs
+on a queue; each worker claims one at a time under a lease, renews it with
+heartbeats while the fetch runs and reports the outcome. A job whose lease
+expires (the worker crashed or lost the network) is put back on the queue and
+picked up by another worker, up to MAX_ATTEMPTS claims:
+
+    broker = open_broker('sentiment_jobs.db')
+    job_id = broker.submit('twitter', 'foo', 200, backend='http')
+    job = broker.claim('worker-1')
+    ...
+    broker.complete(job.id, 'worker-1', {'posts': 180})
+
+Broker is the interface. SQLiteBroker keeps the queue in a SQLite file in WAL
+mode, which only works for workers on the same host: WAL needs shared memory,
+so the file must not sit on NFS/SMB storage. Workers on several machines need a
+networked Broker (e.g. on Redis or Postgres) registered in BROKERS and opened
+with open_broker('scheme://...').
+"""
+import json
+import time
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+
+from tracing import count as count_metric
+
+QUEUED, RUNNING, DONE, FAILED = 'queued', 'running', 'done', 'failed'
+JOB_STATUSES = (QUEUED, RUNNING, DONE, FAILED)
+
+DEFAULT_QUEUE_PATH = 'sentiment_jobs.db'
+LEASE_SECONDS = 120.0
+MAX_ATTEMPTS = 3
+# A failed job is retried after RETRY_DELAY seconds times its attempts so far
+RETRY_DELAY = 60.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    platform TEXT NOT NULL,
+    identifier TEXT NOT NULL,
+    max_posts INTEGER NOT NULL,
+    options TEXT NOT NULL DEFAULT '{}',
+    status TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    lease_expires REAL,
+    available_at REAL NOT NULL,
+    submitted_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    result TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (status, available_at, id);
+"""
+
+JOB_COLUMNS = ('id', 'platform', 'identifier', 'max_posts', 'options', 'status', 'attempts', 'worker',
+               'lease_expires', 'submitted_at', 'started_at', 'finished_at', 'result', 'error')
+
+
+class Job:
+    __slots__ = JOB_COLUMNS
+
+    def __init__(self, id, platform, identifier, max_posts, options=None, status=QUEUED, attempts=0, worker=None,
+                 lease_expires=None, submitted_at=None, started_at=None, finished_at=None, result=None, error=None):
+        self.id = id
+        self.platform = platform
+        self.identifier = identifier
+        self.max_posts = max_posts
+        # Fetch options: backend, time_budget, near_dup_threshold
+        self.options = options or {}
+        self.status = status
+        self.attempts = attempts
+        self.worker = worker
+        self.lease_expires = lease_expires
+        self.submitted_at = submitted_at
+        self.started_at = started_at
+        self.finished_at = finished_at
+        # What the worker reported: post counts, sentiment counts, partial reason
+        self.result = result
+        self.error = error
+
+    def __repr__(self):
+        return f"Job({self.id}, {self.platform!r}, {self.identifier!r}, {self.status!r})"
+
+    @classmethod
+    def from_row(cls, row):
+        data = dict(zip(JOB_COLUMNS, row))
+        data['options'] = json.loads(data['options'] or '{}')
+        data['result'] = json.loads(data['result']) if data['result'] else None
+        return cls(**data)
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in JOB_COLUMNS}
+
+
+class LeaseLost(Exception):
+    """The job's lease expired and it may already be running elsewhere"""
+
+
+class Broker(ABC):
+    """Interface every queue backend implements"""
+
+    @abstractmethod
+    def submit(self, platform, identifier, max_posts=100, **options):
+        """Queue a job; returns its id"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def claim(self, worker, lease_seconds=LEASE_SECONDS):
+        """The oldest runnable job, now leased to `worker`, or None when the queue is empty"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def heartbeat(self, job_id, worker, lease_seconds=LEASE_SECONDS):
+        """Extend the lease; raises LeaseLost when `worker` no longer holds it"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def complete(self, job_id, worker, result=None):
+        raise NotImplementedError
+
+    @abstractmethod
+    def fail(self, job_id, worker, error, retry=True):
+        """Record a failed attempt; the job is queued again unless it used up its attempts"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def requeue_expired(self):
+        """Put jobs with expired leases back on the queue; returns how many"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def get(self, job_id):
+        raise NotImplementedError
+
+    @abstractmethod
+    def jobs(self, status=None, limit=50):
+        """Most recently submitted jobs first"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def counts(self):
+        """Jobs per status"""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class SQLiteBroker(Broker):
+    """Queue in a local SQLite file; single host only (see the module docstring)"""
+
+    def __init__(self, path=DEFAULT_QUEUE_PATH, max_attempts=MAX_ATTEMPTS, retry_delay=RETRY_DELAY):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self._lock = threading.Lock()
+        # Transactions are opened explicitly; BEGIN IMMEDIATE serializes claims
+        # across processes, the timeout covers waiting for another worker's one
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    @contextmanager
+    def _transaction(self):
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+
+    def submit(self, platform, identifier, max_posts=100, **options):
+        now = time.time()
+        with self._lock, self._transaction():
+            cursor = self._conn.execute(
+                "INSERT INTO jobs (platform, identifier, max_posts, options, available_at, submitted_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (platform, identifier, int(max_posts), json.dumps(options), now, now),
+            )
+        return cursor.lastrowid
+
+    def _requeue_expired(self, now):
+        expired = self._conn.execute(
+            "SELECT id, attempts FROM jobs WHERE status = ? AND lease_expires < ?", (RUNNING, now)
+        ).fetchall()
+        for job_id, attempts in expired:
+            if attempts >= self.max_attempts:
+                self._conn.execute(
+                    "UPDATE jobs SET status = ?, worker = NULL, lease_expires = NULL, finished_at = ?, error = ? "
+                    "WHERE id = ?",
+                    (FAILED, now, f"lease expired on attempt {attempts} of {self.max_attempts}", job_id),
+                )
+            else:
+                self._conn.execute(
+                    "UPDATE jobs SET status = ?, worker = NULL, lease_expires = NULL, available_at = ? WHERE id = ?",
+                    (QUEUED, now, job_id),
+                )
+        if expired:
+            count_metric('jobs_requeued', len(expired))
+        return len(expired)
+
+    def requeue_expired(self):
+        with self._lock, self._transaction():
+            return self._requeue_expired(time.time())
+
+    def claim(self, worker, lease_seconds=LEASE_SECONDS):
+        now = time.time()
+        with self._lock, self._transaction():
+            self._requeue_expired(now)
+            row = self._conn.execute(
+                "SELECT id FROM jobs WHERE status = ? AND available_at <= ? ORDER BY id LIMIT 1", (QUEUED, now)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, worker = ?, lease_expires = ?, attempts = attempts + 1, started_at = ?, "
+                "error = NULL WHERE id = ?",
+                (RUNNING, worker, now + lease_seconds, now, row[0]),
+            )
+            return self._get(row[0])
+
+    def heartbeat(self, job_id, worker, lease_seconds=LEASE_SECONDS):
+        with self._lock, self._transaction():
+            updated = self._conn.execute(
+                "UPDATE jobs SET lease_expires = ? WHERE id = ? AND worker = ? AND status = ?",
+                (time.time() + lease_seconds, job_id, worker, RUNNING),
+            ).rowcount
+        if not updated:
+            raise LeaseLost(f"job {job_id} is no longer leased to {worker}")
+
+    def complete(self, job_id, worker, result=None):
+        with self._lock, self._transaction():
+            updated = self._conn.execute(
+                "UPDATE jobs SET status = ?, lease_expires = NULL, finished_at = ?, result = ? "
+                "WHERE id = ? AND worker = ? AND status = ?",
+                (DONE, time.time(), json.dumps(result or {}), job_id, worker, RUNNING),
+            ).rowcount
+        if not updated:
+            raise LeaseLost(f"job {job_id} is no longer leased to {worker}")
+
+    def fail(self, job_id, worker, error, retry=True):
+        now = time.time()
+        with self._lock, self._transaction():
+            row = self._conn.execute(
+                "SELECT attempts FROM jobs WHERE id = ? AND worker = ? AND status = ?", (job_id, worker, RUNNING)
+            ).fetchone()
+            if row is None:
+                raise LeaseLost(f"job {job_id} is no longer leased to {worker}")
+            if retry and row[0] < self.max_attempts:
+                self._conn.execute(
+                    "UPDATE jobs SET status = ?, worker = NULL, lease_expires = NULL, available_at = ?, error = ? "
+                    "WHERE id = ?",
+                    (QUEUED, now + self.retry_delay * row[0], str(error), job_id),
+                )
+            else:
+                self._conn.execute(
+                    "UPDATE jobs SET status = ?, lease_expires = NULL, finished_at = ?, error = ? WHERE id = ?",
+                    (FAILED, now, str(error), job_id),
+                )
+
+    def _get(self, job_id):
+        row = self._conn.execute(f"SELECT {', '.join(JOB_COLUMNS)} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return Job.from_row(row) if row else None
+
+    def get(self, job_id):
+        with self._lock:
+            return self._get(job_id)
+
+    def jobs(self, status=None, limit=50):
+        query = f"SELECT {', '.join(JOB_COLUMNS)} FROM jobs"
+        params = ()
+        if status:
+            query += " WHERE status = ?"
+            params = (status,)
+        with self._lock:
+            rows = self._conn.execute(query + " ORDER BY id DESC LIMIT ?", (*params, limit)).fetchall()
+        return [Job.from_row(row) for row in rows]
+
+    def counts(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {status: dict(rows).get(status, 0) for status in JOB_STATUSES}
+
+
+BROKERS = {'sqlite': SQLiteBroker}
+
+
+def open_broker(spec=DEFAULT_QUEUE_PATH, **kwargs):
+    """A broker from 'scheme://location'; a bare path opens a SQLite queue"""
+    scheme, sep, location = spec.partition('://')
+    if not sep:
+        scheme, location = 'sqlite', spec
+    if scheme not in BROKERS:
+        raise ValueError(f"Unknown queue backend {scheme!r}, expected one of {sorted(BROKERS)}")
+    return BROKERS[scheme](location, **kwargs)
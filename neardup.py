@@ -0,0 +1,152 @@
+"""Near-duplicate detection with MinHash signatures and LSH banding.
+
+Brands cross-post the same announcement to several platforms with small edits,
+which exact-text dedup misses. Each post gets a MinHash signature over the
+character shingles of its normalized text (textnorm). Signatures are split into bands; posts sharing a
+band are candidates and join a cluster when their estimated Jaccard similarity
+to its representative reaches the threshold. The index remembers each cluster's
+label, so only one post per cluster is scored:
+
+    index = NearDuplicateIndex(threshold=0.8)
+    sentiments, confidences, clusters, signatures = index.score(texts, scorer)
+
+Signatures are stored with the posts in the ResultStore; seeding an index from
+the store (ResultStore.labeled_signatures) carries clusters across fetches.
+"""
+import re
+import zlib
+import threading
+
+import numpy as np
+
+from schema import UNKNOWN, NO_CLUSTER
+from textnorm import normalize_texts
+from tracing import count as count_metric
+
+DEFAULT_THRESHOLD = 0.8
+NUM_PERM = 128
+SHINGLE_SIZE = 5
+_PRIME = (1 << 31) - 1
+# Punctuation and spacing edits should not change the shingles
+_SEPARATORS = re.compile(r"[\W_]+")
+
+# Fixed seed: stored signatures must stay comparable across processes
+_rng = np.random.RandomState(20240601)
+_A = _rng.randint(1, _PRIME, size=(NUM_PERM, 1)).astype(np.int64)
+_B = _rng.randint(0, _PRIME, size=(NUM_PERM, 1)).astype(np.int64)
+
+
+def shingles(text, size=SHINGLE_SIZE):
+    text = _SEPARATORS.sub(" ", text.lower()).strip()
+    if len(text) <= size:
+        return {text}
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+def minhash(text):
+    """MinHash signature of a text as NUM_PERM uint32 values"""
+    hashes = np.fromiter((zlib.crc32(s.encode('utf-8')) & _PRIME for s in shingles(text)), dtype=np.int64)
+    # One universal hash per permutation; a, x < 2**31 so a * x + b fits in int64
+    return ((_A * hashes + _B) % _PRIME).min(axis=1).astype(np.uint32)
+
+
+def minhash_many(texts):
+    if not texts:
+        return np.empty((0, NUM_PERM), dtype=np.uint32)
+    return np.vstack([minhash(text) for text in texts])
+
+
+def similarity(a, b):
+    """Estimated Jaccard similarity of the texts behind two signatures"""
+    return float(np.count_nonzero(a == b)) / len(a)
+
+
+def lsh_bands(threshold, num_perm=NUM_PERM):
+    """(bands, rows) whose candidate threshold (1/bands)**(1/rows) is the highest
+    one not above `threshold`, so similar pairs are rarely missed"""
+    best = None
+    for rows in range(1, num_perm + 1):
+        bands = num_perm // rows
+        candidate_threshold = (1 / bands) ** (1 / rows)
+        if candidate_threshold <= threshold and (best is None or candidate_threshold > best[0]):
+            best = (candidate_threshold, bands, rows)
+    return best[1:] if best else (num_perm, 1)
+
+
+class NearDuplicateIndex:
+    """Clusters of near-identical posts and the label of each cluster.
+
+    Shared by every fetch in a process (and every session of the app), so a post
+    cross-posted to another platform later reuses the label scored the first time.
+    """
+
+    def __init__(self, threshold=DEFAULT_THRESHOLD):
+        if not 0 < threshold <= 1:
+            raise ValueError(f"threshold must be in (0, 1], got {threshold}")
+        self.threshold = threshold
+        self.bands, self.rows = lsh_bands(threshold)
+        self.representatives = []   # cluster id -> signature of its first post
+        self.labels = {}            # cluster id -> (sentiment, confidence)
+        self._buckets = [{} for _ in range(self.bands)]    # band bytes -> cluster ids
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.representatives)
+
+    def _band_keys(self, signature):
+        return [signature[band * self.rows:(band + 1) * self.rows].tobytes() for band in range(self.bands)]
+
+    def assign(self, signature, label=None):
+        """Cluster id for a signature, starting a new cluster when nothing is similar enough"""
+        keys = self._band_keys(signature)
+        with self._lock:
+            candidates = {cluster for bucket, key in zip(self._buckets, keys) for cluster in bucket.get(key, ())}
+            best, best_similarity = NO_CLUSTER, self.threshold
+            for cluster in candidates:
+                estimate = similarity(signature, self.representatives[cluster])
+                if estimate >= best_similarity:
+                    best, best_similarity = cluster, estimate
+            if best == NO_CLUSTER:
+                best = len(self.representatives)
+                self.representatives.append(signature)
+                for bucket, key in zip(self._buckets, keys):
+                    bucket.setdefault(key, []).append(best)
+            if label is not None:
+                self.labels.setdefault(best, label)
+        return best
+
+    def seed(self, labeled_signatures):
+        """Add already scored posts as (signature, sentiment, confidence)"""
+        for signature, sentiment, confidence in labeled_signatures:
+            self.assign(signature, (int(sentiment), float(confidence)))
+
+    def score(self, texts, scorer):
+        """Score `texts`, calling `scorer` only for the first post of each unlabeled cluster.
+
+        Returns (sentiments, confidences, clusters, signatures). Every other post
+        gets the label of its cluster.
+        """
+        signatures = minhash_many(normalize_texts(texts))
+        clusters = np.array([self.assign(signature) for signature in signatures], dtype=np.int64)
+        with self._lock:
+            labels = {cluster: self.labels[cluster] for cluster in set(clusters.tolist()) if cluster in self.labels}
+        first = {}
+        for idx, cluster in enumerate(clusters.tolist()):
+            if cluster not in labels:
+                first.setdefault(cluster, idx)
+        if first:
+            sentiments, confidences = scorer([texts[idx] for idx in first.values()])
+            for cluster, sentiment, confidence in zip(first, sentiments, confidences):
+                labels[cluster] = (int(sentiment), float(confidence))
+            with self._lock:
+                for cluster in first:
+                    # A failed prediction is retried with the next post of the cluster
+                    if labels[cluster][0] != UNKNOWN:
+                        self.labels.setdefault(cluster, labels[cluster])
+        count_metric('near_duplicates_reused', len(texts) - len(first))
+
+        sentiments = np.empty(len(texts), dtype=np.int8)
+        confidences = np.empty(len(texts), dtype=np.float32)
+        for idx, cluster in enumerate(clusters.tolist()):
+            sentiments[idx], confidences[idx] = labels[cluster]
+        return sentiments, confidences, clusters, signatures
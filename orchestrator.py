@@ -0,0 +1,234 @@
+"""Drive many fetches at once from one asyncio event loop.
+
+The fetchers are blocking generators: every WebDriver call, WebDriverWait and
+Deadline.sleep holds its thread. The Orchestrator runs each fetch in a bounded
+thread pool and hands its posts to the event loop as they are yielded, so the
+waits and scrolls of different sessions interleave while the loop only
+schedules, rate-limits and collects:
+
+    jobs = [FetchJob('twitter', 'foo', 100, backend='http'), FetchJob('facebook', page_url, 50)]
+    results = asyncio.run(Orchestrator(max_sessions=24).run(jobs))
+
+Concurrency is capped overall (max_sessions) and per platform, and each fetch
+waits for its platform's RateLimiter before it starts. Chrome sessions take
+hundreds of MB each, so dozens of concurrent fetches are meant for the HTTP
+backend; the browser watchdog still recycles browsers over their memory cap.
+"""
+import time
+import asyncio
+import logging
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+from progress import ProgressBus
+from deadline import Deadline
+from checkpoint import CHECKPOINT_DIR
+from scrapers import FETCHERS, iter_resumable_posts
+from tracing import span, count as count_metric
+
+DEFAULT_MAX_SESSIONS = 16
+DEFAULT_PER_PLATFORM = 8
+# Fetch starts allowed per platform: (count, per seconds)
+DEFAULT_RATE_LIMITS = {
+    'twitter': (10, 60.0),
+    'linkedin': (2, 60.0),
+    'instagram': (4, 60.0),
+    'facebook': (6, 60.0),
+}
+_DONE = object()
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimiter:
+    """Token bucket for the event loop: `rate` acquisitions per `per` seconds, up to `burst` at once"""
+
+    def __init__(self, rate, per=60.0, burst=None):
+        self.interval = per / rate
+        self.burst = burst or rate
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """Wait for a token; returns the seconds spent waiting"""
+        waited = 0.0
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) / self.interval)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                delay = (1 - self.tokens) * self.interval
+                waited += delay
+                await asyncio.sleep(delay)
+
+
+class FetchJob:
+    """One fetch: a platform, an identifier and the fetcher's keyword arguments"""
+
+    def __init__(self, platform, identifier, max_posts=100, time_budget=None, **fetch_kwargs):
+        if platform not in FETCHERS:
+            raise ValueError(f"Unknown platform {platform!r}, expected one of {sorted(FETCHERS)}")
+        self.platform = platform
+        self.identifier = identifier
+        self.max_posts = max_posts
+        self.time_budget = time_budget
+        self.fetch_kwargs = fetch_kwargs
+
+    def __repr__(self):
+        return f"FetchJob({self.platform!r}, {self.identifier!r}, {self.max_posts})"
+
+
+class FetchResult:
+    __slots__ = ('job', 'posts', 'error', 'partial_reason', 'seconds', 'rate_wait')
+
+    def __init__(self, job, posts, error=None, partial_reason=None, seconds=0.0, rate_wait=0.0):
+        self.job = job
+        self.posts = posts
+        self.error = error
+        self.partial_reason = partial_reason
+        self.seconds = seconds
+        self.rate_wait = rate_wait
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+class Orchestrator:
+    def __init__(self, max_sessions=DEFAULT_MAX_SESSIONS, per_platform=DEFAULT_PER_PLATFORM, rate_limits=None,
+                 checkpoint_dir=CHECKPOINT_DIR, progress_factory=None):
+        self.max_sessions = max_sessions
+        self.per_platform = per_platform
+        self.rate_limits = dict(DEFAULT_RATE_LIMITS, **(rate_limits or {}))
+        # None runs fetches without on-disk checkpoints
+        self.checkpoint_dir = checkpoint_dir
+        self.progress_factory = progress_factory or (lambda job: ProgressBus(platform=job.platform))
+        self._executor = None
+        self._sessions = None
+        self._platform_sessions = {}
+        self._limiters = {}
+
+    async def __aenter__(self):
+        self._start()
+        return self
+
+    async def __aexit__(self, *exc):
+        self.close()
+
+    def _start(self):
+        if self._executor is None:
+            # Asyncio primitives bind to the loop they are first used in, so
+            # they are created here rather than in __init__
+            self._executor = ThreadPoolExecutor(max_workers=self.max_sessions, thread_name_prefix='fetch')
+            self._sessions = asyncio.Semaphore(self.max_sessions)
+            self._platform_sessions = {}
+            self._limiters = {}
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _limiter(self, platform):
+        if platform not in self._limiters and platform in self.rate_limits:
+            self._limiters[platform] = RateLimiter(*self.rate_limits[platform])
+        return self._limiters.get(platform)
+
+    def _platform_semaphore(self, platform):
+        if platform not in self._platform_sessions:
+            self._platform_sessions[platform] = asyncio.Semaphore(self.per_platform)
+        return self._platform_sessions[platform]
+
+    def _posts(self, job, progress, deadline):
+        fetch = FETCHERS[job.platform]
+        kwargs = dict(job.fetch_kwargs, deadline=deadline)
+        if self.checkpoint_dir:
+            return iter_resumable_posts(fetch, job.platform, job.identifier, job.max_posts, progress,
+                                        checkpoint_dir=self.checkpoint_dir, **kwargs)
+        return fetch(job.identifier, job.max_posts, progress, **kwargs)
+
+    async def fetch(self, job, on_post=None):
+        """Run one job to completion and return its FetchResult.
+
+        `on_post(job, post)` is called on the event loop for each post as the
+        fetcher yields it. Errors are returned in the result, not raised.
+        """
+        self._start()
+        loop = asyncio.get_running_loop()
+        progress = self.progress_factory(job)
+        deadline = Deadline(job.time_budget)
+        posts = []
+        queue = asyncio.Queue()
+        stop = threading.Event()
+
+        def drain():
+            # Runs in the pool; hands every post to the loop as soon as it is yielded
+            post_iter = self._posts(job, progress, deadline)
+            try:
+                for post in post_iter:
+                    loop.call_soon_threadsafe(queue.put_nowait, post)
+                    if stop.is_set():
+                        break
+            finally:
+                post_iter.close()
+
+        async with self._platform_semaphore(job.platform):
+            # Wait for the rate limit before taking one of the shared session slots
+            limiter = self._limiter(job.platform)
+            rate_wait = await limiter.acquire() if limiter else 0.0
+            if rate_wait:
+                count_metric('rate_limit_waits', platform=job.platform)
+            async with self._sessions:
+                started = time.monotonic()
+                error = None
+                with span('orchestrator.fetch', platform=job.platform):
+                    future = loop.run_in_executor(self._executor, contextvars.copy_context().run, drain)
+                    future.add_done_callback(lambda _: queue.put_nowait(_DONE))
+                    try:
+                        while True:
+                            post = await queue.get()
+                            if post is _DONE:
+                                break
+                            posts.append(post)
+                            if on_post:
+                                on_post(job, post)
+                        future.result()
+                    except asyncio.CancelledError:
+                        # The thread can't be interrupted; make the fetcher stop at its next check
+                        stop.set()
+                        deadline.cancel("fetch cancelled")
+                        raise
+                    except Exception as e:
+                        logger.warning("Fetch of %s %s failed after %d posts: %s", job.platform, job.identifier,
+                                       len(posts), e)
+                        count_metric('orchestrator_failures', platform=job.platform)
+                        error = e
+        return FetchResult(job, posts, error, deadline.reason, time.monotonic() - started, rate_wait)
+
+    async def as_completed(self, jobs, on_post=None):
+        """Run every job concurrently and yield each FetchResult as its fetch finishes.
+
+        Use inside `async with orchestrator:` so the thread pool is shut down.
+        """
+        tasks = [asyncio.ensure_future(self.fetch(job, on_post)) for job in jobs]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def run(self, jobs, on_post=None):
+        """Run every job concurrently; returns their FetchResults in job order"""
+        async with self:
+            return await asyncio.gather(*(self.fetch(job, on_post) for job in jobs))
+
+
+def run_jobs(jobs, **orchestrator_kwargs):
+    """Blocking helper: run jobs on a fresh event loop"""
+    return asyncio.run(Orchestrator(**orchestrator_kwargs).run(jobs))
@@ -0,0 +1,206 @@
+"""Sampling profiler for one fetch+analyze run.
+
+    with profile_run(platform='twitter') as prof:
+        ...fetch and analyze...
+    prof.tag(posts=120)
+    paths = prof.save()
+
+A background thread samples the Python stacks of the profiled threads (the
+caller, threads started during the run and the shared inference workers) every
+few milliseconds. Works across the scraper producer thread and the model workers,
+which a per-thread deterministic profiler would miss. Output:
+
+    <name>.folded   collapsed stacks, one "frame;frame;frame count" per line,
+                    for flamegraph.pl, speedscope or inferno
+    <name>.txt      top-N functions by cumulative and self time, plus WebDriver
+                    command counts
+    <name>.json     the same summary, machine readable
+"""
+import os
+import sys
+import json
+import time
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+try:
+    from selenium.webdriver.remote.webdriver import WebDriver
+    selenium_available = True
+except ImportError:
+    selenium_available = False
+
+DEFAULT_INTERVAL = 0.005
+DEFAULT_PROFILE_DIR = 'profiles'
+TOP_N = 30
+# Long-lived threads that do work on behalf of a run (see batching.MicroBatcher)
+SHARED_THREAD_PREFIXES = ('inference-worker',)
+
+
+def frame_label(frame):
+    code = frame.f_code
+    module = os.path.splitext(os.path.basename(code.co_filename))[0]
+    return f"{module}:{code.co_name}:{code.co_firstlineno}"
+
+
+class WebDriverCallCounter:
+    """Count WebDriver commands by name while active.
+
+    Patches WebDriver.execute process-wide, so commands of other sessions running
+    at the same time are counted too.
+    """
+
+    def __init__(self):
+        self.calls = Counter()
+        self._lock = threading.Lock()
+        self._original = None
+
+    def start(self):
+        if not selenium_available:
+            return
+        counter = self
+        original = self._original = WebDriver.execute
+
+        def execute(driver, driver_command, params=None):
+            with counter._lock:
+                counter.calls[driver_command] += 1
+            return original(driver, driver_command, params)
+
+        WebDriver.execute = execute
+
+    def stop(self):
+        if self._original is not None:
+            WebDriver.execute = self._original
+            self._original = None
+
+
+class SamplingProfiler:
+    def __init__(self, interval=DEFAULT_INTERVAL, thread_prefixes=SHARED_THREAD_PREFIXES, **tags):
+        self.interval = interval
+        self.thread_prefixes = thread_prefixes
+        self.tags = tags
+        self.stacks = Counter()     # tuple of frame labels, root first -> samples
+        self.samples = 0
+        self.webdriver = WebDriverCallCounter()
+        self.started_at = None
+        self.elapsed = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+        self._owner = None
+        self._excluded = set()
+
+    def tag(self, **tags):
+        self.tags.update(tags)
+
+    def _profiled(self, ident, names):
+        if ident == self._thread.ident:
+            return False
+        if ident == self._owner or ident not in self._excluded:
+            return True
+        return names.get(ident, '').startswith(self.thread_prefixes)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if not self._profiled(ident, names):
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(frame_label(frame))
+                    frame = frame.f_back
+                stack.append(names.get(ident, f"thread-{ident}"))
+                self.stacks[tuple(reversed(stack))] += 1
+            self.samples += 1
+
+    def start(self):
+        self._owner = threading.get_ident()
+        # Threads already running belong to other sessions unless they are shared workers
+        self._excluded = {t.ident for t in threading.enumerate()}
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self.started_at = time.time()
+        self.webdriver.start()
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.webdriver.stop()
+        self.elapsed = time.time() - self.started_at
+
+    def collapsed(self):
+        return "".join(f"{';'.join(stack)} {count}\n" for stack, count in self.stacks.most_common())
+
+    def seconds_per_sample(self):
+        # Sampling overhead stretches the real period beyond `interval`
+        if self.samples and self.elapsed:
+            return self.elapsed / self.samples
+        return self.interval
+
+    def top(self, n=TOP_N):
+        """Functions by cumulative samples (on the stack) and self samples (on top)"""
+        period = self.seconds_per_sample()
+        cumulative, own = Counter(), Counter()
+        for stack, count in self.stacks.items():
+            # A recursive function is counted once per sample
+            for label in set(stack[1:]):
+                cumulative[label] += count
+            own[stack[-1]] += count
+        return [
+            {'function': label, 'cumulative_s': round(samples * period, 3),
+             'self_s': round(own[label] * period, 3), 'samples': samples}
+            for label, samples in cumulative.most_common(n)
+        ]
+
+    def summary(self, n=TOP_N):
+        return {
+            'tags': self.tags,
+            'started_at': self.started_at,
+            'elapsed_s': round(self.elapsed, 3),
+            'interval_s': self.interval,
+            'samples': self.samples,
+            'top': self.top(n),
+            'webdriver_calls': dict(self.webdriver.calls.most_common()),
+            'webdriver_total': sum(self.webdriver.calls.values()),
+        }
+
+    def summary_text(self, n=TOP_N):
+        summary = self.summary(n)
+        tags = " ".join(f"{key}={value}" for key, value in self.tags.items())
+        lines = [f"Profile {tags} elapsed={summary['elapsed_s']}s samples={summary['samples']} "
+                 f"interval={self.interval * 1000:g}ms", "",
+                 f"{'cumulative_s':>12} {'self_s':>8}  function"]
+        lines += [f"{row['cumulative_s']:>12.3f} {row['self_s']:>8.3f}  {row['function']}" for row in summary['top']]
+        lines += ["", f"WebDriver commands: {summary['webdriver_total']}"]
+        lines += [f"{count:>8}  {command}" for command, count in summary['webdriver_calls'].items()]
+        return "\n".join(lines) + "\n"
+
+    def base_name(self):
+        stamp = time.strftime('%Y%m%d-%H%M%S', time.localtime(self.started_at))
+        parts = [str(self.tags.get('platform', 'run')), stamp]
+        if 'posts' in self.tags:
+            parts.append(f"{self.tags['posts']}posts")
+        return "-".join(parts)
+
+    def save(self, directory=DEFAULT_PROFILE_DIR, n=TOP_N):
+        """Write .folded, .txt and .json files; returns their paths"""
+        os.makedirs(directory, exist_ok=True)
+        base = os.path.join(directory, self.base_name())
+        paths = {'folded': f"{base}.folded", 'summary': f"{base}.txt", 'json': f"{base}.json"}
+        with open(paths['folded'], 'w') as f:
+            f.write(self.collapsed())
+        with open(paths['summary'], 'w') as f:
+            f.write(self.summary_text(n))
+        with open(paths['json'], 'w') as f:
+            json.dump(self.summary(n), f, indent=2)
+        return paths
+
+
+@contextmanager
+def profile_run(interval=DEFAULT_INTERVAL, **tags):
+    profiler = SamplingProfiler(interval, **tags).start()
+    try:
+        yield profiler
+    finally:
+        profiler.stop()
@@ -0,0 +1,121 @@
+"""Structured progress events for the scrapers, independent of any UI.
+
+Fetchers emit events to a ProgressBus; the Streamlit app and the CLI subscribe
+to the same bus and decide how (and how often) to render them.
+"""
+import time
+import logging
+import threading
+from collections import namedtuple
+
+LEVELS = ('progress', 'info', 'success', 'warning', 'error')
+
+ProgressEvent = namedtuple('ProgressEvent', ['stage', 'message', 'level', 'current', 'total', 'platform', 'timestamp'])
+
+
+class ProgressBus:
+    """Fan progress events out to every subscriber"""
+
+    def __init__(self, platform=None):
+        self.platform = platform
+        self._subscribers = []
+        self._lock = threading.Lock()
+
+    def subscribe(self, callback):
+        with self._lock:
+            self._subscribers.append(callback)
+
+        def unsubscribe():
+            with self._lock:
+                if callback in self._subscribers:
+                    self._subscribers.remove(callback)
+        return unsubscribe
+
+    def emit(self, stage, message="", level='progress', current=None, total=None, platform=None):
+        event = ProgressEvent(stage, message, level, current, total, platform or self.platform, time.time())
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            try:
+                callback(event)
+            except Exception:
+                # A broken subscriber must never break a fetch
+                logging.getLogger(__name__).exception("Progress subscriber failed")
+        return event
+
+    # Shorthands for the common levels
+    def info(self, message, stage='status'):
+        return self.emit(stage, message, level='info')
+
+    def success(self, message, stage='status'):
+        return self.emit(stage, message, level='success')
+
+    def warning(self, message, stage='status'):
+        return self.emit(stage, message, level='warning')
+
+    def error(self, message, stage='status'):
+        return self.emit(stage, message, level='error')
+
+
+class ThrottledSubscriber:
+    """Base subscriber that renders progress at most every `interval` seconds.
+
+    Warnings and errors are always rendered immediately; everything else only
+    updates the latest state, which is drawn when the interval has elapsed or on
+    flush().
+    """
+
+    def __init__(self, interval=0.25):
+        self.interval = interval
+        self.latest = None
+        self._last_render = 0.0
+        self._dirty = False
+        self._lock = threading.Lock()
+
+    def __call__(self, event):
+        if event.level in ('warning', 'error'):
+            self.render_alert(event)
+            return
+        with self._lock:
+            self.latest = event
+            self._dirty = True
+            now = time.monotonic()
+            if now - self._last_render < self.interval:
+                return
+            self._last_render = now
+            self._dirty = False
+        self.render(event)
+
+    def flush(self):
+        with self._lock:
+            event, dirty = self.latest, self._dirty
+            self._dirty = False
+        if event is not None and dirty:
+            self.render(event)
+
+    def render(self, event):
+        raise NotImplementedError
+
+    def render_alert(self, event):
+        self.render(event)
+
+
+class LogSubscriber(ThrottledSubscriber):
+    """Write progress events to a logger, e.g. for CLI or worker runs"""
+
+    LOG_LEVELS = {
+        'progress': logging.INFO,
+        'info': logging.INFO,
+        'success': logging.INFO,
+        'warning': logging.WARNING,
+        'error': logging.ERROR,
+    }
+
+    def __init__(self, logger=None, interval=1.0):
+        super().__init__(interval)
+        self.logger = logger or logging.getLogger("sentiment.progress")
+
+    def render(self, event):
+        prefix = f"[{event.platform}] " if event.platform else ""
+        counter = f" ({event.current}/{event.total})" if event.current is not None and event.total else ""
+        self.logger.log(self.LOG_LEVELS.get(event.level, logging.INFO), "%s%s%s", prefix, event.message, counter)
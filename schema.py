@@ -0,0 +1,172 @@
+"""Compact post and result representations shared by every stage.
+
+Fetchers yield Post records (slotted, with interned platform/identifier), the
+inference stage turns a list of them into a columnar ResultBatch: sentiment as
+int8 category codes, confidence as float32 and timestamps as int64 epoch seconds.
+When near-duplicate detection is on (see neardup), each row also carries its
+cluster id and MinHash signature. Summaries and exports work on those arrays
+directly.
+"""
+import sys
+import time
+import functools
+
+import numpy as np
+import pandas as pd
+
+from timestamps import NO_TIMESTAMP, TimestampReport, normalize_timestamps
+
+SENTIMENTS = ('Positive', 'Neutral', 'Negative', 'Unknown')
+POSITIVE, NEUTRAL, NEGATIVE, UNKNOWN = range(len(SENTIMENTS))
+SENTIMENT_CODES = {name: code for code, name in enumerate(SENTIMENTS)}
+# Cluster id of posts scored without near-duplicate detection
+NO_CLUSTER = -1
+
+
+class Post:
+    __slots__ = ('text', 'timestamp', 'platform', 'identifier', 'fetched_at', 'post_id')
+
+    def __init__(self, text, timestamp="Unknown", platform="", identifier="", fetched_at=None, post_id=None):
+        self.text = text
+        self.timestamp = timestamp
+        self.platform = sys.intern(platform)
+        self.identifier = sys.intern(identifier)
+        # Relative timestamps ("3d") are resolved against this
+        self.fetched_at = fetched_at or time.time()
+        # Platform's own ID when the post came from a feed payload, None for DOM scraping
+        self.post_id = post_id
+
+    def __repr__(self):
+        return f"Post({self.text[:40]!r}, {self.timestamp!r}, {self.platform!r})"
+
+    def to_dict(self):
+        return {'text': self.text, 'timestamp': self.timestamp, 'platform': self.platform,
+                'identifier': self.identifier, 'fetched_at': self.fetched_at, 'post_id': self.post_id}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['text'], data.get('timestamp', "Unknown"), data.get('platform', ""),
+                   data.get('identifier', ""), data.get('fetched_at'), data.get('post_id'))
+
+
+class ResultBatch:
+    """Columnar batch of analyzed posts"""
+
+    __slots__ = ('texts', 'timestamps_raw', 'timestamps', 'sentiments', 'confidences', 'platforms', 'identifiers',
+                 'timestamp_report', 'clusters', 'signatures')
+
+    def __init__(self, texts, timestamps_raw, timestamps, sentiments, confidences, platforms, identifiers,
+                 timestamp_report=None, clusters=None, signatures=None):
+        self.texts = texts
+        self.timestamps_raw = timestamps_raw
+        self.timestamps = timestamps
+        self.sentiments = sentiments
+        self.confidences = confidences
+        self.platforms = platforms
+        self.identifiers = identifiers
+        self.timestamp_report = timestamp_report or TimestampReport()
+        self.clusters = np.full(len(texts), NO_CLUSTER, dtype=np.int64) if clusters is None else clusters
+        # (rows, NUM_PERM) uint32 MinHash signatures, or None
+        self.signatures = signatures
+
+    @classmethod
+    def from_posts(cls, posts, sentiments, confidences, clusters=None, signatures=None):
+        raw = [post.timestamp for post in posts]
+        epochs, report = normalize_timestamps(raw, [post.fetched_at for post in posts])
+        return cls(
+            [post.text for post in posts],
+            raw,
+            epochs,
+            np.asarray(sentiments, dtype=np.int8),
+            np.asarray(confidences, dtype=np.float32),
+            [post.platform for post in posts],
+            [post.identifier for post in posts],
+            report,
+            None if clusters is None else np.asarray(clusters, dtype=np.int64),
+            signatures,
+        )
+
+    @classmethod
+    def empty(cls):
+        return cls([], [], np.empty(0, np.int64), np.empty(0, np.int8), np.empty(0, np.float32), [], [])
+
+    @classmethod
+    def concat(cls, batches):
+        batches = [batch for batch in batches if len(batch)]
+        if not batches:
+            return cls.empty()
+        if len(batches) == 1:
+            return batches[0]
+        return cls(
+            [text for batch in batches for text in batch.texts],
+            [raw for batch in batches for raw in batch.timestamps_raw],
+            np.concatenate([batch.timestamps for batch in batches]),
+            np.concatenate([batch.sentiments for batch in batches]),
+            np.concatenate([batch.confidences for batch in batches]),
+            [p for batch in batches for p in batch.platforms],
+            [i for batch in batches for i in batch.identifiers],
+            functools.reduce(TimestampReport.merge, (batch.timestamp_report for batch in batches)),
+            np.concatenate([batch.clusters for batch in batches]),
+            np.vstack([batch.signatures for batch in batches])
+            if all(batch.signatures is not None for batch in batches) else None,
+        )
+
+    def __len__(self):
+        return len(self.texts)
+
+    def slice(self, start, stop):
+        return ResultBatch(
+            self.texts[start:stop], self.timestamps_raw[start:stop], self.timestamps[start:stop],
+            self.sentiments[start:stop], self.confidences[start:stop],
+            self.platforms[start:stop], self.identifiers[start:stop], None, self.clusters[start:stop],
+            None if self.signatures is None else self.signatures[start:stop],
+        )
+
+    def distinct_mask(self):
+        """True for the first post of each near-duplicate cluster and for unclustered posts"""
+        mask = self.clusters == NO_CLUSTER
+        _, first = np.unique(self.clusters, return_index=True)
+        mask[first] = True
+        return mask
+
+    def distinct_count(self):
+        return int(np.count_nonzero(self.distinct_mask()))
+
+    def sentiment_counts(self, distinct=False):
+        """Counts per sentiment name, computed with one bincount; with `distinct`,
+        each near-duplicate cluster counts once"""
+        codes = self.sentiments[self.distinct_mask()] if distinct else self.sentiments
+        counts = np.bincount(codes, minlength=len(SENTIMENTS))
+        return {name: int(count) for name, count in zip(SENTIMENTS, counts) if count}
+
+    def rows(self):
+        """Iterate plain dicts, e.g. for JSONL output or HTML cards"""
+        for idx in range(len(self.texts)):
+            epoch = int(self.timestamps[idx])
+            cluster = int(self.clusters[idx])
+            yield {
+                'text': self.texts[idx],
+                'timestamp': self.timestamps_raw[idx],
+                'epoch': None if epoch == NO_TIMESTAMP else epoch,
+                'sentiment': SENTIMENTS[self.sentiments[idx]],
+                'confidence': round(float(self.confidences[idx]), 4),
+                'platform': self.platforms[idx],
+                'identifier': self.identifiers[idx],
+                'cluster': None if cluster == NO_CLUSTER else cluster,
+            }
+
+    def to_frame(self):
+        """Typed DataFrame: categorical sentiment/platform/identifier, float32 confidence, UTC timestamps"""
+        timestamps = pd.to_datetime(
+            pd.Series(self.timestamps).where(self.timestamps != NO_TIMESTAMP), unit='s', utc=True
+        )
+        return pd.DataFrame({
+            'text': self.texts,
+            'timestamp': timestamps,
+            'timestamp_raw': pd.Series(self.timestamps_raw, dtype=object).astype(str),
+            'sentiment': pd.Categorical.from_codes(self.sentiments, categories=list(SENTIMENTS)),
+            'confidence': self.confidences,
+            'platform': pd.Categorical(self.platforms),
+            'identifier': pd.Categorical(self.identifiers),
+            'cluster': pd.Series(self.clusters).where(self.clusters != NO_CLUSTER).astype('Int64'),
+        })
@@ -0,0 +1,872 @@
+"""Selenium scrapers for each platform.
+
+Each iter_*_posts function is a generator that yields schema.Post records as
+posts are extracted and reports progress through a ProgressBus. Nothing here
+depends on Streamlit.
+
+X, Instagram and Facebook also accept backend='network', which reads posts from
+the feed's JSON responses (see capture.py) instead of the rendered DOM, and
+backend='http', which reads them without a browser (see http_fetch.py) and only
+starts Chrome for the DOM fetcher when that fails.
+
+Fetchers record their crawl frontier on a checkpoint.Checkpoint and mark it
+complete when they finish; iter_resumable_posts persists it so a failed or
+interrupted fetch resumes on the next run.
+
+Every fetcher takes a deadline.Deadline bounding its sleeps, waits, scrolls and
+post visits. When the budget runs out it stops, leaving deadline.reason set
+(deadline.partial) and the checkpoint in place.
+
+The LinkedIn, Instagram and Facebook fetchers look fields up through the
+SELECTORS chains, tried in the order of their recorded hit rates (see
+selector_stats.py). Facebook post containers and LinkedIn post text are
+gathered from every live selector of their chain, since one page can match
+several of them.
+"""
+import os
+import json
+import random
+from selenium import webdriver
+from selenium.webdriver.chrome.service import Service
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import (TimeoutException, NoSuchElementException, StaleElementReferenceException,
+                                        WebDriverException)
+from webdriver_manager.chrome import ChromeDriverManager
+from progress import ProgressBus
+from schema import Post
+from checkpoint import Checkpoint, CHECKPOINT_DIR
+from deadline import Deadline
+from browser_watchdog import watchdog
+from selector_stats import selector_registry
+from tracing import span, count as count_metric
+from capture import enable_network_logging, iter_captured_posts, PAYLOAD_PARSERS
+from http_fetch import HTTP_BACKEND_PLATFORMS, HttpFetchError, iter_http_posts
+
+# Site roots. Overridable through the environment (SENTIMENT_BASE_URL_TWITTER=...)
+# or by assigning to BASE_URLS, so the scrapers can run against local fixture servers.
+BASE_URLS = {
+    platform: os.environ.get(f"SENTIMENT_BASE_URL_{platform.upper()}", default)
+    for platform, default in (
+        ('twitter', "https://x.com"),
+        ('linkedin', "https://www.linkedin.com"),
+        ('instagram', "https://www.instagram.com"),
+        ('facebook', "https://www.facebook.com"),
+    )
+}
+
+BACKENDS = ('dom', 'network', 'http')
+NETWORK_BACKEND_PLATFORMS = frozenset(PAYLOAD_PARSERS)
+
+# Fallback selectors per field; each lookup tries them best hit rate first
+SELECTORS = {
+    'linkedin': {
+        'post': ['div.feed-shared-update-v2', 'div[data-urn*="activity"]'],
+        'text': [
+            'div.feed-shared-update-v2__description span[dir="ltr"]',
+            'div.feed-shared-text span[dir="ltr"]',
+            'div.update-components-text span',
+            'span.break-words',
+        ],
+        'timestamp': ['time', 'span.feed-shared-actor__sub-description'],
+    },
+    'instagram': {
+        'caption': [
+            'h1',
+            'span._ap3a._aaco._aacu._aacx._aad7._aade',
+            'span.x1lliihq',
+            'span[style*="line-height"]',
+            'div.x1lliihq span',
+        ],
+        'timestamp': ['time[datetime]', 'time'],
+    },
+    'facebook': {
+        'post': [
+            'div[data-ad-preview="message"]',
+            'div.userContent',
+            'div[data-ad-comet-preview="message"]',
+            'div[dir="auto"][style*="text-align"]',
+        ],
+        'timestamp': ['abbr', 'span[id*="date"]', 'a[href*="posts"]'],
+    },
+}
+
+# Collapsed-text toggles, all clicked with one script call per scroll pass
+SEE_MORE_TOGGLES = {
+    'linkedin': ['button.feed-shared-inline-show-more-text__see-more-less-toggle', 'button[aria-label*="see more"]'],
+    'facebook': ['div[role="button"]', 'div.see_more_link', '[aria-label*="See more"]', '[aria-label*="See More"]'],
+}
+
+# Clicks every toggle labelled "see more" that wasn't clicked before, then calls
+# back once the DOM has had no mutations for `quiet` ms (or after `timeout` ms)
+EXPAND_SCRIPT = """
+const [selectors, label, timeout, quiet] = arguments;
+const done = arguments[arguments.length - 1];
+let clicked = 0;
+for (const el of document.querySelectorAll(selectors.join(','))) {
+    const text = (el.innerText || el.getAttribute('aria-label') || '').toLowerCase();
+    if (el.dataset.sentimentExpanded || !text.includes(label)) continue;
+    el.dataset.sentimentExpanded = '1';
+    el.click();
+    clicked++;
+}
+if (!clicked) { done(0); return; }
+let settle, limit;
+const observer = new MutationObserver(() => { clearTimeout(settle); settle = setTimeout(finish, quiet); });
+function finish() { observer.disconnect(); clearTimeout(settle); clearTimeout(limit); done(clicked); }
+observer.observe(document.body, {childList: true, subtree: true, characterData: true});
+settle = setTimeout(finish, quiet);
+limit = setTimeout(finish, timeout);
+"""
+
+def check_backend(platform, backend):
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend {backend!r}, expected one of {BACKENDS}")
+    if backend == 'network' and platform not in NETWORK_BACKEND_PLATFORMS:
+        raise ValueError(f"The network backend is not available for {platform}")
+    if backend == 'http' and platform not in HTTP_BACKEND_PLATFORMS:
+        raise ValueError(f"The HTTP backend is not available for {platform}")
+
+def load_cookies(path, platform):
+    with span('fetch.cookies.load', platform=platform):
+        with open(path, 'r') as f:
+            return json.load(f)
+
+def add_cookies(driver, cookies, platform, fix_same_site=True):
+    with span('fetch.cookies.inject', platform=platform):
+        for cookie in cookies:
+            try:
+                if fix_same_site and 'sameSite' in cookie:
+                    if cookie['sameSite'] not in ['Strict', 'Lax', 'None']:
+                        cookie['sameSite'] = 'None'
+                driver.add_cookie(cookie)
+            except Exception:
+                pass
+
+def find_all(root, selector):
+    return root.find_elements(By.CSS_SELECTOR, selector)
+
+def joined_texts(root, selector):
+    """Text of the elements matching selector, each distinct piece once"""
+    texts = []
+    for elem in root.find_elements(By.CSS_SELECTOR, selector):
+        text = elem.text.strip()
+        if text and text not in texts:
+            texts.append(text)
+    return " ".join(texts)
+
+def first_value(root, selector, *attributes):
+    """First non-empty attribute of the first matching element; None stands for its text"""
+    for elem in root.find_elements(By.CSS_SELECTOR, selector)[:1]:
+        for attribute in attributes:
+            value = elem.text.strip() if attribute is None else elem.get_attribute(attribute)
+            if value:
+                return value
+    return None
+
+def instagram_caption(driver, selector, username):
+    for elem in driver.find_elements(By.CSS_SELECTOR, selector):
+        text = elem.text.strip()
+        # The header repeats the username before the caption
+        if text.lower().startswith(username.lower()):
+            text = text[len(username):].strip()
+        if len(text) > 10 and text.lower() != username.lower():
+            return text
+    return None
+
+def expand_collapsed_text(driver, platform, deadline, timeout=2.0, quiet=0.3):
+    """Click all "see more" toggles on the page and wait once for the DOM to settle; returns the click count"""
+    with span('fetch.expand', platform=platform):
+        try:
+            clicked = driver.execute_async_script(EXPAND_SCRIPT, SEE_MORE_TOGGLES[platform], 'see more',
+                                                  int(deadline.cap(timeout) * 1000), int(quiet * 1000))
+        except WebDriverException:
+            return 0
+    if clicked:
+        count_metric('see_more_expanded', clicked, platform=platform)
+    return clicked or 0
+
+def iter_http_first(platform, identifier, max_posts, progress, checkpoint, deadline, browser_fetch):
+    """Yield posts read over HTTP, running browser_fetch() instead when that fails before yielding any"""
+    fetched = 0
+    try:
+        for post in iter_http_posts(platform, identifier, max_posts, progress, checkpoint, deadline):
+            fetched += 1
+            yield post
+    except HttpFetchError as e:
+        if fetched:
+            # Falling back now would fetch the same posts again
+            progress.warning(f"HTTP fetch stopped after {fetched} posts: {e}")
+            return
+        progress.warning(f"HTTP fetch failed ({e}), falling back to the browser")
+    else:
+        if fetched or deadline.partial:
+            return
+        progress.warning("No posts found over HTTP, falling back to the browser")
+    count_metric('http_fallbacks', platform=platform)
+    yield from browser_fetch()
+
+def budget_spent(deadline, progress, stage):
+    """True, after reporting it, once the fetch's time budget has run out"""
+    if not deadline.expired():
+        return False
+    progress.warning(f"Stopping early with partial results: {deadline.stop(stage)}")
+    return True
+
+def restore_scroll(driver, checkpoint, platform, deadline=None, pause=1.5):
+    """Scroll as far down the feed as an interrupted run got; returns the pass count"""
+    deadline = deadline or Deadline()
+    passes = checkpoint.frontier.get('scroll_passes', 0)
+    if not passes:
+        return 0
+    with span('fetch.resume', platform=platform):
+        last_height = driver.execute_script("return document.body.scrollHeight")
+        for _ in range(passes):
+            driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+            if not deadline.sleep(pause):
+                break
+            new_height = driver.execute_script("return document.body.scrollHeight")
+            if new_height == last_height:
+                break
+            last_height = new_height
+    return passes
+
+def create_driver(headless=True, platform=None, capture_network=False):
+    """Create a Chrome driver with improved options"""
+    chrome_options = Options()
+    if headless:
+        chrome_options.add_argument("--headless=new")
+    chrome_options.add_argument("--no-sandbox")
+    chrome_options.add_argument("--disable-dev-shm-usage")
+    chrome_options.add_argument("--disable-blink-features=AutomationControlled")
+    chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
+    chrome_options.add_experimental_option('useAutomationExtension', False)
+    chrome_options.add_argument("--disable-gpu")
+    chrome_options.add_argument("--window-size=1920,1080")
+    chrome_options.add_argument("--disable-notifications")
+    chrome_options.add_argument("--disable-popup-blocking")
+    chrome_options.add_argument("--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36")
+    if capture_network:
+        enable_network_logging(chrome_options)
+    
+    with span('driver.install', platform=platform):
+        service = Service(ChromeDriverManager().install())
+    with span('driver.start', platform=platform):
+        driver = webdriver.Chrome(service=service, options=chrome_options)
+    driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
+    watchdog.register(driver, platform)
+    return driver
+
+def quit_driver(driver):
+    watchdog.unregister(driver)
+    try:
+        driver.quit()
+    except Exception:
+        pass
+
+def recycle_driver(driver, platform, cookies, progress, feed_url=None, checkpoint=None, headless=True,
+                   deadline=None):
+    """Swap a browser that went over the memory cap for a fresh one at the same feed position"""
+    deadline = deadline or Deadline()
+    progress.warning("Browser went over its memory cap, restarting it")
+    with span('driver.recycle', platform=platform):
+        quit_driver(driver)
+        driver = create_driver(headless=headless, platform=platform)
+        driver.get(BASE_URLS[platform])
+        deadline.sleep(3)
+        add_cookies(driver, cookies, platform)
+        if feed_url:
+            driver.get(feed_url)
+            deadline.sleep(random.uniform(5, 8))
+            if checkpoint:
+                restore_scroll(driver, checkpoint, platform, deadline)
+    count_metric('browser_recycles', platform=platform)
+    return driver
+
+# Yield posts from Twitter as they are extracted
+def iter_twitter_posts(username, max_posts=100, progress=None, backend='dom', checkpoint=None, deadline=None):
+    check_backend('twitter', backend)
+    progress = progress or ProgressBus(platform='twitter')
+    deadline = deadline or Deadline()
+    if backend == 'http':
+        yield from iter_http_first('twitter', username, max_posts, progress, checkpoint, deadline,
+                                   lambda: iter_twitter_posts(username, max_posts, progress, checkpoint=checkpoint,
+                                                              deadline=deadline))
+        return
+    checkpoint = checkpoint or Checkpoint('twitter', username)
+    driver = create_driver(headless=True, platform='twitter', capture_network=backend == 'network')
+    
+    try:
+        cookies = load_cookies('cookies.json', 'twitter')
+        
+        profile_url = f"{BASE_URLS['twitter']}/{username}"
+        with span('fetch.navigate', platform='twitter'):
+            driver.get(profile_url)
+            deadline.sleep(random.uniform(3, 5))
+        
+        add_cookies(driver, cookies, 'twitter', fix_same_site=False)
+        
+        with span('fetch.navigate', platform='twitter'):
+            driver.refresh()
+            deadline.sleep(random.uniform(5, 7))
+        
+        max_retries = 3
+        for attempt in range(max_retries):
+            try:
+                with span('fetch.wait', platform='twitter'):
+                    WebDriverWait(driver, deadline.cap(30)).until(
+                        EC.presence_of_element_located((By.CSS_SELECTOR, 'article[data-testid="tweet"]'))
+                    )
+                break
+            except Exception as e:
+                if budget_spent(deadline, progress, 'waiting for the feed'):
+                    return
+                progress.warning(f"Twitter fetch attempt {attempt + 1} failed: {e}")
+                if attempt < max_retries - 1:
+                    count_metric('retries', platform='twitter')
+                    deadline.sleep(random.uniform(5, 10))
+                    driver.refresh()
+                    continue
+                raise
+        
+        if backend == 'network':
+            yield from iter_captured_posts(driver, 'twitter', username, max_posts, progress, checkpoint, deadline)
+            return
+        
+        count = 0
+        resumed_texts = checkpoint.seen_texts()
+        scroll_passes = restore_scroll(driver, checkpoint, 'twitter', deadline)
+        last_height = driver.execute_script("return document.body.scrollHeight")
+        
+        while count < max_posts:
+            if budget_spent(deadline, progress, 'scrolling'):
+                return
+            articles = driver.find_elements(By.CSS_SELECTOR, 'article[data-testid="tweet"]')
+            for article in articles[count:]:
+                post = None
+                try:
+                    with span('fetch.extract', platform='twitter'):
+                        text_element = article.find_element(By.CSS_SELECTOR, 'div[data-testid="tweetText"]')
+                        post_text = text_element.text.strip()
+                        time_element = article.find_element(By.CSS_SELECTOR, 'time')
+                        timestamp = time_element.get_attribute('datetime') if time_element else "Unknown"
+                    if post_text in resumed_texts:
+                        # Already extracted before the interruption
+                        resumed_texts.discard(post_text)
+                        count += 1
+                    elif post_text:
+                        count += 1
+                        post = Post(post_text, timestamp, 'twitter', username)
+                except StaleElementReferenceException:
+                    count_metric('stale_elements', platform='twitter')
+                    continue
+                except NoSuchElementException:
+                    count_metric('selector_misses', platform='twitter', field='tweet')
+                    continue
+                except Exception:
+                    continue
+                if post is not None:
+                    progress.emit('fetch', f"Fetched post {count}/{max_posts}", current=count, total=max_posts)
+                    yield post
+                if count >= max_posts:
+                    break
+            with span('fetch.scroll', platform='twitter'):
+                driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+                deadline.sleep(random.uniform(2, 4))
+                new_height = driver.execute_script("return document.body.scrollHeight")
+            scroll_passes += 1
+            checkpoint.update(scroll_passes=scroll_passes)
+            if new_height == last_height:
+                break
+            last_height = new_height
+        checkpoint.complete()
+    finally:
+        quit_driver(driver)
+
+# Yield posts from LinkedIn as they are extracted - IMPROVED
+def iter_linkedin_posts(url, max_posts=100, progress=None, checkpoint=None, deadline=None):
+    progress = progress or ProgressBus(platform='linkedin')
+    deadline = deadline or Deadline()
+    selectors = selector_registry('linkedin', SELECTORS['linkedin'])
+    checkpoint = checkpoint or Checkpoint('linkedin', url)
+    driver = create_driver(headless=True, platform='linkedin')
+    
+    try:
+        try:
+            cookies = load_cookies('linkedin_cookies.json', 'linkedin')
+            progress.info(f"Loaded {len(cookies)} LinkedIn cookies")
+        except FileNotFoundError:
+            progress.error("linkedin_cookies.json not found. Generate it using Cookie-Editor.")
+            return
+        
+        # First navigate to linkedin.com to set cookies
+        with span('fetch.navigate', platform='linkedin'):
+            driver.get(BASE_URLS['linkedin'])
+            deadline.sleep(3)
+        
+        # Add cookies
+        add_cookies(driver, cookies, 'linkedin')
+        
+        # Navigate to the profile/company page
+        with span('fetch.navigate', platform='linkedin'):
+            driver.get(url)
+            deadline.sleep(random.uniform(5, 8))
+        
+        # Check if we're logged in
+        if "authwall" in driver.current_url or "login" in driver.current_url:
+            progress.error("LinkedIn cookies expired or invalid. Please regenerate linkedin_cookies.json")
+            progress.info("Steps: 1. Login to LinkedIn 2. Use Cookie-Editor to export cookies 3. Save as linkedin_cookies.json")
+            return
+        
+        # Navigate to posts section
+        posts_url = url.rstrip('/') + '/posts/'
+        with span('fetch.navigate', platform='linkedin'):
+            driver.get(posts_url)
+            deadline.sleep(random.uniform(5, 8))
+        
+        # Wait for posts to load
+        try:
+            with span('fetch.wait', platform='linkedin'):
+                WebDriverWait(driver, deadline.cap(30)).until(
+                    lambda d: len(d.find_elements(By.CSS_SELECTOR, 'div.feed-shared-update-v2, div[data-urn]')) > 0
+                )
+        except TimeoutException:
+            if budget_spent(deadline, progress, 'waiting for the feed'):
+                return
+            progress.error("Timeout loading LinkedIn posts. The page structure may have changed or cookies are invalid.")
+            return
+        
+        seen_texts = checkpoint.seen_texts()
+        scroll_passes = restore_scroll(driver, checkpoint, 'linkedin', deadline)
+        last_height = driver.execute_script("return document.body.scrollHeight")
+        no_new_posts_count = 0
+        
+        while len(seen_texts) < max_posts and no_new_posts_count < 3:
+            if budget_spent(deadline, progress, 'scrolling'):
+                return
+            expand_collapsed_text(driver, 'linkedin', deadline)
+            _, articles = selectors.find('post', lambda selector: find_all(driver, selector), progress)
+            articles = articles or []
+            
+            initial_count = len(seen_texts)
+            
+            for article in articles:
+                if len(seen_texts) >= max_posts:
+                    break
+                if budget_spent(deadline, progress, 'extracting posts'):
+                    return
+                    
+                post = None
+                try:
+                    with span('fetch.extract', platform='linkedin'):
+                        # Post text from every text container, each distinct piece once
+                        post_text = ""
+                        for text in selectors.collect('text', lambda selector: joined_texts(article, selector), progress):
+                            if text not in post_text:
+                                post_text += text + " "
+                        post_text = post_text.strip()
+                        
+                        # Extract timestamp
+                        _, timestamp = selectors.find(
+                            'timestamp', lambda selector: first_value(article, selector, 'datetime', None), progress)
+                        timestamp = timestamp or "Unknown"
+                    
+                    # Only add if we got meaningful text
+                    if post_text and len(post_text) > 20:
+                        # Check for duplicates
+                        if post_text not in seen_texts:
+                            seen_texts.add(post_text)
+                            post = Post(post_text, timestamp, 'linkedin', url)
+                
+                except StaleElementReferenceException:
+                    count_metric('stale_elements', platform='linkedin')
+                    continue
+                except Exception:
+                    continue
+                if post is not None:
+                    progress.emit('fetch', f"✓ Fetched post {len(seen_texts)}/{max_posts}", current=len(seen_texts), total=max_posts)
+                    yield post
+            
+            # Check if we got new posts
+            if len(seen_texts) == initial_count:
+                no_new_posts_count += 1
+            else:
+                no_new_posts_count = 0
+            
+            # Scroll down
+            with span('fetch.scroll', platform='linkedin'):
+                driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+                deadline.sleep(random.uniform(3, 5))
+                new_height = driver.execute_script("return document.body.scrollHeight")
+            scroll_passes += 1
+            checkpoint.update(scroll_passes=scroll_passes)
+            
+            if new_height == last_height:
+                no_new_posts_count += 1
+            last_height = new_height
+            
+            if watchdog.over_cap(driver):
+                driver = recycle_driver(driver, 'linkedin', cookies, progress, posts_url, checkpoint, deadline=deadline)
+                last_height = driver.execute_script("return document.body.scrollHeight")
+        
+        checkpoint.complete()
+        progress.success(f"Successfully fetched {len(seen_texts)} LinkedIn posts")
+    
+    except Exception as e:
+        if not budget_spent(deadline, progress, 'loading the page'):
+            progress.error(f"Error fetching LinkedIn posts: {str(e)}")
+    finally:
+        selectors.save()
+        quit_driver(driver)
+
+# Yield posts from Instagram as they are extracted - IMPROVED
+def iter_instagram_posts(username, max_posts=100, progress=None, headless=False, backend='dom', checkpoint=None,
+                         deadline=None):
+    check_backend('instagram', backend)
+    progress = progress or ProgressBus(platform='instagram')
+    deadline = deadline or Deadline()
+    if backend == 'http':
+        yield from iter_http_first('instagram', username, max_posts, progress, checkpoint, deadline,
+                                   lambda: iter_instagram_posts(username, max_posts, progress, headless,
+                                                                checkpoint=checkpoint, deadline=deadline))
+        return
+    selectors = selector_registry('instagram', SELECTORS['instagram'])
+    checkpoint = checkpoint or Checkpoint('instagram', username)
+    # Non-headless by default for better compatibility
+    driver = create_driver(headless=headless, platform='instagram', capture_network=backend == 'network')
+    
+    try:
+        try:
+            cookies = load_cookies('instagram_cookies.json', 'instagram')
+            progress.success(f"Loaded {len(cookies)} Instagram cookies")
+        except FileNotFoundError:
+            progress.error("instagram_cookies.json not found. Generate it using Cookie-Editor on Instagram.")
+            return
+        
+        # Navigate to Instagram
+        with span('fetch.navigate', platform='instagram'):
+            driver.get(BASE_URLS['instagram'])
+            deadline.sleep(3)
+        
+        # Add cookies
+        add_cookies(driver, cookies, 'instagram')
+        
+        # Refresh to apply cookies
+        with span('fetch.navigate', platform='instagram'):
+            driver.refresh()
+            deadline.sleep(5)
+        
+        # Navigate to profile
+        profile_url = f"{BASE_URLS['instagram']}/{username}/"
+        progress.info(f"Navigating to {profile_url}")
+        with span('fetch.navigate', platform='instagram'):
+            driver.get(profile_url)
+            deadline.sleep(7)
+        
+        # Check if logged in
+        if "login" in driver.current_url.lower():
+            progress.error("Instagram login required. Cookies expired. Please regenerate instagram_cookies.json")
+            return
+        
+        # Close any popups
+        try:
+            not_now_buttons = driver.find_elements(By.XPATH, "//button[contains(text(), 'Not Now')] | //button[contains(text(), 'Not now')]")
+            for btn in not_now_buttons:
+                try:
+                    btn.click()
+                    deadline.sleep(1)
+                except:
+                    pass
+        except:
+            pass
+        
+        # Wait for posts
+        try:
+            with span('fetch.wait', platform='instagram'):
+                WebDriverWait(driver, deadline.cap(20)).until(
+                    EC.presence_of_element_located((By.CSS_SELECTOR, 'a[href*="/p/"], a[href*="/reel/"]'))
+                )
+        except TimeoutException:
+            if budget_spent(deadline, progress, 'waiting for the feed'):
+                return
+            progress.error("Could not load Instagram posts. Profile may be private or cookies expired.")
+            return
+        
+        # Captions and timestamps come with the feed payload, so no per-post visits
+        if backend == 'network':
+            yield from iter_captured_posts(driver, 'instagram', username, max_posts, progress, checkpoint, deadline)
+            return
+        
+        count = 0
+        post_links = set(checkpoint.frontier.get('post_links', []))
+        
+        # Scroll to collect post links, unless an interrupted run already did
+        last_height = driver.execute_script("return document.body.scrollHeight")
+        scroll_attempts = 0
+        max_scroll_attempts = 0 if post_links else 15
+        
+        while len(post_links) < max_posts and scroll_attempts < max_scroll_attempts:
+            if budget_spent(deadline, progress, 'collecting post links'):
+                return
+            links = driver.find_elements(By.CSS_SELECTOR, 'a[href*="/p/"], a[href*="/reel/"]')
+            for link in links:
+                href = link.get_attribute('href')
+                if href and ('/p/' in href or '/reel/' in href):
+                    post_links.add(href)
+                if len(post_links) >= max_posts:
+                    break
+            
+            with span('fetch.scroll', platform='instagram'):
+                driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+                deadline.sleep(random.uniform(2, 4))
+                new_height = driver.execute_script("return document.body.scrollHeight")
+            if new_height == last_height:
+                break
+            last_height = new_height
+            scroll_attempts += 1
+        
+        post_links = checkpoint.frontier.get('post_links') or list(post_links)[:max_posts]
+        visited = checkpoint.frontier.get('visited', 0)
+        checkpoint.update(post_links=post_links, visited=visited)
+        progress.info(f"Found {len(post_links)} post links. Extracting captions...")
+        if visited:
+            progress.info(f"Resuming after {visited} already visited posts")
+        
+        # Visit each post
+        for idx, post_link in enumerate(post_links[visited:], start=visited):
+            if budget_spent(deadline, progress, 'visiting posts'):
+                return
+            if watchdog.over_cap(driver):
+                driver = recycle_driver(driver, 'instagram', cookies, progress, headless=headless, deadline=deadline)
+            try:
+                with span('fetch.visit', platform='instagram'):
+                    driver.get(post_link)
+                    deadline.sleep(random.uniform(3, 5))
+                
+                    # Wait for page load
+                    try:
+                        WebDriverWait(driver, deadline.cap(10)).until(
+                            EC.presence_of_element_located((By.TAG_NAME, 'article'))
+                        )
+                    except:
+                        pass
+                
+                    # Caption from the header or caption spans; posts without one are common
+                    _, post_text = selectors.find(
+                        'caption', lambda selector: instagram_caption(driver, selector, username), progress,
+                        required=False)
+                    post_text = post_text or ""
+                
+                    # Fallback: get all text from article and extract meaningful parts
+                    if not post_text:
+                        try:
+                            article = driver.find_element(By.TAG_NAME, 'article')
+                            full_text = article.text
+                            lines = [line.strip() for line in full_text.split('\n')]
+                            # Filter out common Instagram UI elements
+                            meaningful_lines = []
+                            skip_words = ['like', 'likes', 'comment', 'comments', 'share', 'save', 'follow', 'following', 'followers']
+                            for line in lines:
+                                if len(line) > 15 and not any(word in line.lower() for word in skip_words):
+                                    if line.lower() != username.lower():
+                                        meaningful_lines.append(line)
+                            if meaningful_lines:
+                                post_text = ' '.join(meaningful_lines[:2])  # Take first 2 meaningful lines
+                        except:
+                            pass
+                
+                    # Get timestamp
+                    _, timestamp = selectors.find(
+                        'timestamp', lambda selector: first_value(driver, selector, 'datetime', 'title', None), progress)
+                    timestamp = timestamp or "Unknown"
+                
+                post_text = post_text.strip()
+                count += 1
+                if post_text:
+                    progress.emit('fetch', f"✓ Post {idx+1}/{len(post_links)}: {len(post_text)} chars", current=idx + 1, total=len(post_links))
+                    yield Post(post_text, timestamp, 'instagram', username)
+                else:
+                    progress.emit('fetch', f"ℹ Post {idx+1}/{len(post_links)}: No caption", current=idx + 1, total=len(post_links))
+                    yield Post('[Image/Video post - No caption available]', timestamp, 'instagram', username)
+                
+            except Exception as e:
+                progress.warning(f"⚠ Error on post {idx+1}: {str(e)[:100]}")
+                continue
+            finally:
+                checkpoint.update(visited=idx + 1)
+        
+        checkpoint.complete()
+        progress.success(f"Extracted {count} Instagram posts")
+    
+    except Exception as e:
+        if not budget_spent(deadline, progress, 'loading the page'):
+            progress.error(f"Instagram error: {str(e)}")
+    finally:
+        selectors.save()
+        quit_driver(driver)
+
+# Yield posts from Facebook as they are extracted - IMPROVED
+def iter_facebook_posts(page_url, max_posts=100, progress=None, backend='dom', checkpoint=None, deadline=None):
+    check_backend('facebook', backend)
+    progress = progress or ProgressBus(platform='facebook')
+    deadline = deadline or Deadline()
+    if backend == 'http':
+        yield from iter_http_first('facebook', page_url, max_posts, progress, checkpoint, deadline,
+                                   lambda: iter_facebook_posts(page_url, max_posts, progress, checkpoint=checkpoint,
+                                                               deadline=deadline))
+        return
+    selectors = selector_registry('facebook', SELECTORS['facebook'])
+    checkpoint = checkpoint or Checkpoint('facebook', page_url)
+    driver = create_driver(headless=True, platform='facebook', capture_network=backend == 'network')
+    
+    try:
+        try:
+            cookies = load_cookies('facebook_cookies.json', 'facebook')
+            progress.info(f"Loaded {len(cookies)} Facebook cookies")
+        except FileNotFoundError:
+            progress.error("facebook_cookies.json not found. Generate it using Cookie-Editor on Facebook.")
+            return
+        
+        with span('fetch.navigate', platform='facebook'):
+            driver.get(BASE_URLS['facebook'])
+            deadline.sleep(3)
+        
+        add_cookies(driver, cookies, 'facebook')
+        
+        with span('fetch.navigate', platform='facebook'):
+            driver.refresh()
+            deadline.sleep(5)
+        
+        with span('fetch.navigate', platform='facebook'):
+            driver.get(page_url)
+            deadline.sleep(random.uniform(5, 8))
+        
+        # Check login
+        if "login" in driver.current_url.lower():
+            progress.error("Facebook login required. Cookies expired. Refresh facebook_cookies.json.")
+            return
+        
+        if backend == 'network':
+            yield from iter_captured_posts(driver, 'facebook', page_url, max_posts, progress, checkpoint, deadline)
+            return
+        
+        seen_texts = checkpoint.seen_texts()
+        scroll_passes = restore_scroll(driver, checkpoint, 'facebook', deadline)
+        last_height = driver.execute_script("return document.body.scrollHeight")
+        scroll_attempts = 0
+        max_scroll_attempts = 25
+        
+        while len(seen_texts) < max_posts and scroll_attempts < max_scroll_attempts:
+            if budget_spent(deadline, progress, 'scrolling'):
+                return
+            expand_collapsed_text(driver, 'facebook', deadline)
+            # Pages mix layouts, so posts are collected from every container selector
+            matches = selectors.collect('post', lambda selector: find_all(driver, selector), progress)
+            post_elements = [elem for elements in matches for elem in elements]
+            
+            for post_elem in post_elements:
+                if len(seen_texts) >= max_posts:
+                    break
+                if budget_spent(deadline, progress, 'extracting posts'):
+                    return
+                
+                post = None
+                try:
+                    with span('fetch.extract', platform='facebook'):
+                        post_text = post_elem.text.strip()
+                        
+                        # Get timestamp
+                        _, timestamp = selectors.find(
+                            'timestamp',
+                            lambda selector: first_value(post_elem, selector, 'data-utime', 'title', None), progress)
+                        timestamp = timestamp or "Unknown"
+                    
+                    if post_text and len(post_text) > 20:
+                        # Check for duplicates
+                        if post_text not in seen_texts:
+                            seen_texts.add(post_text)
+                            post = Post(post_text, timestamp, 'facebook', page_url)
+                
+                except StaleElementReferenceException:
+                    count_metric('stale_elements', platform='facebook')
+                    continue
+                except:
+                    continue
+                if post is not None:
+                    progress.emit('fetch', f"✓ Fetched Facebook post {len(seen_texts)}/{max_posts}", current=len(seen_texts), total=max_posts)
+                    yield post
+            
+            with span('fetch.scroll', platform='facebook'):
+                driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+                deadline.sleep(random.uniform(3, 6))
+                new_height = driver.execute_script("return document.body.scrollHeight")
+            scroll_passes += 1
+            checkpoint.update(scroll_passes=scroll_passes)
+            if new_height == last_height:
+                scroll_attempts += 1
+            else:
+                scroll_attempts = 0
+            last_height = new_height
+            
+            if watchdog.over_cap(driver):
+                driver = recycle_driver(driver, 'facebook', cookies, progress, page_url, checkpoint, deadline=deadline)
+                last_height = driver.execute_script("return document.body.scrollHeight")
+        
+        checkpoint.complete()
+        progress.success(f"Fetched {len(seen_texts)} Facebook posts")
+    
+    except Exception as e:
+        if not budget_spent(deadline, progress, 'loading the page'):
+            progress.error(f"Facebook error: {str(e)}")
+    finally:
+        selectors.save()
+        quit_driver(driver)
+
+
+FETCHERS = {
+    'twitter': iter_twitter_posts,
+    'linkedin': iter_linkedin_posts,
+    'instagram': iter_instagram_posts,
+    'facebook': iter_facebook_posts,
+}
+
+
+def iter_resumable_posts(fetch, platform, identifier, max_posts=100, progress=None,
+                         checkpoint_dir=CHECKPOINT_DIR, **kwargs):
+    """Run `fetch` with an on-disk checkpoint, resuming a previous interrupted run.
+
+    Posts from the checkpoint are yielded first. The checkpoint is removed when
+    the fetcher completes or max_posts is reached, and saved otherwise (fetch
+    error, fetcher gave up early, or the consumer stopped iterating) as long as
+    it holds posts or a scroll position to resume from.
+    """
+    progress = progress or ProgressBus(platform=platform)
+    checkpoint = Checkpoint(platform, identifier, checkpoint_dir)
+    resumed = checkpoint.load()[:max_posts]
+    if resumed:
+        progress.info(f"Resuming from checkpoint with {len(resumed)} posts already fetched")
+        yield from resumed
+    if len(resumed) >= max_posts:
+        checkpoint.clear()
+        return
+
+    total = len(resumed)
+    posts = fetch(identifier, max_posts, progress, checkpoint=checkpoint, **kwargs)
+    try:
+        for post in posts:
+            checkpoint.add(post)
+            total += 1
+            yield post
+            if total >= max_posts:
+                checkpoint.complete()
+                break
+    finally:
+        posts.close()
+        if checkpoint.completed or not checkpoint.has_progress():
+            # A fetch that got nowhere (missing cookies, login wall) leaves nothing to resume
+            checkpoint.clear()
+        else:
+            checkpoint.save()
+            progress.warning(f"Fetch stopped early; {total} posts kept in a checkpoint for the next run")
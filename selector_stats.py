@@ -0,0 +1,214 @@
+"""Adaptive selector ordering from hit-rate statistics.
+
+The DOM fetchers keep a chain of fallback selectors per field (post container,
+text, timestamp, ...) and each miss costs a WebDriver round trip. A
+SelectorRegistry records which selectors hit, tries the historically best one
+first and skips selectors that have been dead for a while, probing them now
+and then in case the site brings them back:
+
+    registry = selector_registry('facebook', {'post': ['div.userContent', ...]})
+    selector, elements = registry.find('timestamp', lambda s: post.find_elements(By.CSS_SELECTOR, s))
+    posts = [elem for elements in registry.collect('post', find_all) for elem in elements]
+    ...
+    registry.save()
+
+find() stops at the first selector that hits; collect() queries every live
+selector, for fields whose selectors match different parts of a page (mixed
+layouts, text split over several containers).
+
+Hit and miss counts decay exponentially, so a layout change reorders the chain
+within a few dozen lookups. Statistics are kept per platform in
+.selector_stats/<platform>.json. When every selector of a field keeps failing,
+the registry logs a warning, reports it to the fetch's ProgressBus and counts
+selector_field_failures.
+"""
+import os
+import json
+import time
+import logging
+import tempfile
+import threading
+
+from tracing import count as count_metric
+
+SELECTOR_STATS_DIR = '.selector_stats'
+DECAY = 0.98
+# A selector is skipped after this many misses in a row without a hit for DEAD_AFTER seconds
+DEAD_AFTER_MISSES = 50
+DEAD_AFTER = 3 * 86400
+# Dead selectors are still tried on every PROBE_EVERY-th lookup of their field
+PROBE_EVERY = 25
+# Lookups in a row where no selector of a field hit before alerting
+ALERT_AFTER = 10
+
+logger = logging.getLogger(__name__)
+
+
+class SelectorStats:
+    __slots__ = ('hits', 'misses', 'misses_in_row', 'last_hit')
+
+    def __init__(self, hits=0.0, misses=0.0, misses_in_row=0, last_hit=None):
+        self.hits = hits
+        self.misses = misses
+        self.misses_in_row = misses_in_row
+        self.last_hit = last_hit
+
+    def record(self, hit, now):
+        self.hits = self.hits * DECAY + hit
+        self.misses = self.misses * DECAY + (not hit)
+        if hit:
+            self.misses_in_row = 0
+            self.last_hit = now
+        else:
+            self.misses_in_row += 1
+
+    def hit_rate(self):
+        # Smoothed, so a selector without history sits in the middle
+        return (self.hits + 1) / (self.hits + self.misses + 2)
+
+    def dead(self, now):
+        return self.misses_in_row >= DEAD_AFTER_MISSES and (self.last_hit is None or now - self.last_hit > DEAD_AFTER)
+
+    def to_dict(self):
+        return {'hits': round(self.hits, 4), 'misses': round(self.misses, 4),
+                'misses_in_row': self.misses_in_row, 'last_hit': self.last_hit}
+
+
+class SelectorRegistry:
+    def __init__(self, platform, selectors, directory=SELECTOR_STATS_DIR):
+        self.platform = platform
+        self.selectors = selectors      # field -> selectors in their declared order
+        self.path = os.path.join(directory, f"{platform}.json") if directory else None
+        self.stats = {field: {selector: SelectorStats() for selector in chain} for field, chain in selectors.items()}
+        self.lookups = dict.fromkeys(selectors, 0)
+        self.failures_in_row = dict.fromkeys(selectors, 0)
+        self._lock = threading.Lock()
+
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return self
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning("Ignoring unreadable selector stats %s: %s", self.path, e)
+            return self
+        # Selectors no longer in the code are dropped, new ones start without history
+        for field, chain in self.stats.items():
+            for selector, saved in data.get(field, {}).items():
+                if selector in chain:
+                    chain[selector] = SelectorStats(**saved)
+        return self
+
+    def save(self):
+        if not self.path:
+            return
+        with self._lock:
+            data = {field: {selector: stats.to_dict() for selector, stats in chain.items()}
+                    for field, chain in self.stats.items()}
+        directory = os.path.dirname(self.path)
+        # Losing some statistics is not worth failing a fetch over
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=directory, prefix='.tmp-', suffix='.json')
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump(data, f, indent=1)
+                os.replace(tmp, self.path)
+            except BaseException:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+                raise
+        except OSError as e:
+            logger.warning("Could not save selector stats to %s: %s", self.path, e)
+
+    def ordered(self, field):
+        """The field's selectors, best hit rate first, without dead ones"""
+        now = time.time()
+        with self._lock:
+            self.lookups[field] += 1
+            probe = self.lookups[field] % PROBE_EVERY == 0
+            chain = self.stats[field]
+            declared = self.selectors[field]
+            alive = [selector for selector in declared if probe or not chain[selector].dead(now)]
+            # Never skip everything; a field whose selectors all died tries them all
+            alive = alive or list(declared)
+            return sorted(alive, key=lambda selector: -chain[selector].hit_rate())
+
+    def record(self, field, selector, hit):
+        with self._lock:
+            self.stats[field][selector].record(bool(hit), time.time())
+        if not hit:
+            count_metric('selector_misses', platform=self.platform, field=field)
+
+    def find(self, field, lookup, progress=None, required=True):
+        """Try the field's selectors in order until lookup(selector) returns something truthy.
+
+        Returns (selector, result), or (None, None) when every selector missed.
+        Fields that are often legitimately absent (required=False) never alert.
+        """
+        for selector in self.ordered(field):
+            result = lookup(selector)
+            self.record(field, selector, result)
+            if result:
+                self._field_hit(field)
+                return selector, result
+        if required:
+            self._field_failed(field, progress)
+        return None, None
+
+    def collect(self, field, lookup, progress=None, required=True):
+        """Results of every live selector of the field that hits, best hit rate first"""
+        results = []
+        for selector in self.ordered(field):
+            result = lookup(selector)
+            self.record(field, selector, result)
+            if result:
+                results.append(result)
+        if results:
+            self._field_hit(field)
+        elif required:
+            self._field_failed(field, progress)
+        return results
+
+    def _field_hit(self, field):
+        with self._lock:
+            self.failures_in_row[field] = 0
+
+    def _field_failed(self, field, progress):
+        with self._lock:
+            self.failures_in_row[field] += 1
+            alert = self.failures_in_row[field] == ALERT_AFTER
+        if alert:
+            count_metric('selector_field_failures', platform=self.platform, field=field)
+            message = (f"All {self.platform} selectors for '{field}' failed on the last {ALERT_AFTER} lookups; "
+                       f"the page layout may have changed")
+            logger.warning(message)
+            if progress is not None:
+                progress.warning(message)
+
+    def report(self):
+        """Per field, the selectors in their current order with hit rates"""
+        now = time.time()
+        with self._lock:
+            return {
+                field: sorted(
+                    ({'selector': selector, 'hit_rate': round(stats.hit_rate(), 3), 'dead': stats.dead(now)}
+                     for selector, stats in chain.items()),
+                    key=lambda row: -row['hit_rate'],
+                )
+                for field, chain in self.stats.items()
+            }
+
+
+_registries = {}
+_registries_lock = threading.Lock()
+
+
+def selector_registry(platform, selectors, directory=SELECTOR_STATS_DIR):
+    """The process-wide registry for a platform, loaded from disk on first use"""
+    with _registries_lock:
+        registry = _registries.get(platform)
+        if registry is None:
+            registry = _registries[platform] = SelectorRegistry(platform, selectors, directory).load()
+        return registry
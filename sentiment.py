@@ -0,0 +1,289 @@
+"""Sentiment models, language routing and the streaming inference stage."""
+import re
+import time
+import queue
+import logging
+import threading
+import contextvars
+
+import numpy as np
+
+from schema import SENTIMENTS, POSITIVE, NEUTRAL, NEGATIVE, UNKNOWN, ResultBatch
+from textnorm import normalize_texts, LRUCache
+from tracing import span, count as count_metric
+
+logger = logging.getLogger(__name__)
+
+# Try to import pipeline from transformers
+try:
+    from transformers import pipeline
+    transformers_available = True
+except ImportError as e:
+    logger.warning("Failed to import 'pipeline' from transformers: %s. Using TextBlob as fallback.", e)
+    transformers_available = False
+
+# Fallback to TextBlob
+try:
+    from textblob import TextBlob
+    textblob_available = True
+except ImportError as e:
+    logger.warning("Failed to import TextBlob: %s. Install with 'pip install textblob'.", e)
+    textblob_available = False
+
+MULTILINGUAL_MODEL = "nlptown/bert-base-multilingual-uncased-sentiment"
+ENGLISH_MODEL = "finiteautomata/bertweet-base-sentiment-analysis"
+INFERENCE_BATCH_SIZE = 32
+SENTIMENT_CACHE_SIZE = 20000
+
+# Initialize sentiment analysis pipelines, one per language route
+def load_sentiment_pipelines():
+    pipelines = {}
+    if transformers_available:
+        try:
+            with span('model.load', model='en'):
+                pipelines['en'] = pipeline("sentiment-analysis", model=ENGLISH_MODEL)
+        except Exception as e:
+            logger.warning("Failed to load English model: %s. Routing all posts to the multilingual model.", e)
+        try:
+            with span('model.load', model='multi'):
+                pipelines['multi'] = pipeline("sentiment-analysis", model=MULTILINGUAL_MODEL)
+        except Exception as e:
+            logger.warning("Failed to load multilingual model: %s. Routing all posts to the English model.", e)
+        if not pipelines:
+            logger.error("No transformer model could be loaded. Using TextBlob.")
+    elif textblob_available:
+        logger.warning("Using TextBlob for sentiment analysis.")
+    else:
+        logger.error("No sentiment analysis available.")
+    return pipelines
+
+# Fast language identification: a post is routed to the English model when it is
+# mostly Latin script and enough of its words are common English function words.
+# Anything else, including short posts without that evidence, goes to the
+# multilingual model, which handles English too. Run it on the raw text: spelled
+# out emoji (":red_heart:") would read as English words.
+ENGLISH_STOPWORDS = frozenset("""
+a about after all also an and any are as at be because been but by can could did do
+does for from get got had has have he her his how i if in into is it its just like me
+more my new no not now of on one only or our out so some than that the their them
+then there they this to up us was we were what when which who will with would you your
+""".split())
+WORD_RE = re.compile(r"[^\W\d_]+", re.UNICODE)
+NOISE_RE = re.compile(r"https?://\S+|\bHTTPURL\b|[@#]\w+")
+
+def detect_languages(texts, min_stopword_ratio=0.15, min_ascii_ratio=0.9):
+    """Label each text 'en' or 'multi' in a single pass over the batch"""
+    routes = []
+    for text in texts:
+        words = WORD_RE.findall(NOISE_RE.sub(" ", text).lower())
+        if not words:
+            routes.append('en')
+            continue
+        letters = "".join(words)
+        ascii_ratio = sum(1 for ch in letters if ch.isascii()) / len(letters)
+        stopword_ratio = sum(1 for w in words if w in ENGLISH_STOPWORDS) / len(words)
+        if ascii_ratio >= min_ascii_ratio and stopword_ratio >= min_stopword_ratio:
+            routes.append('en')
+        else:
+            routes.append('multi')
+    return routes
+
+# Map model labels from either route onto schema.SENTIMENTS codes
+LABEL_MAP = {
+    '1 star': NEGATIVE, '2 stars': NEGATIVE,
+    '3 stars': NEUTRAL,
+    '4 stars': POSITIVE, '5 stars': POSITIVE,
+    'neg': NEGATIVE, 'negative': NEGATIVE,
+    'neu': NEUTRAL, 'neutral': NEUTRAL,
+    'pos': POSITIVE, 'positive': POSITIVE,
+}
+
+def normalize_label(label):
+    return LABEL_MAP.get(label.lower(), UNKNOWN)
+
+def textblob_sentiment(text):
+    polarity = TextBlob(text).sentiment.polarity
+    if polarity > 0.1:
+        sentiment = POSITIVE
+    elif polarity < -0.1:
+        sentiment = NEGATIVE
+    else:
+        sentiment = NEUTRAL
+    return sentiment, abs(polarity)
+
+# Labels by normalized text, shared by every caller in the process
+sentiment_cache = LRUCache(SENTIMENT_CACHE_SIZE)
+
+# Analyze a batch of texts: normalize them (textnorm), answer what the cache
+# already knows and score each remaining distinct text once.
+# Returns (sentiment codes as int8, confidences as float32) arrays.
+def analyze_sentiments(texts, pipelines, batch_size=INFERENCE_BATCH_SIZE, cache=sentiment_cache):
+    sentiments = np.full(len(texts), UNKNOWN, dtype=np.int8)
+    confidences = np.zeros(len(texts), dtype=np.float32)
+    if not texts:
+        return sentiments, confidences
+
+    # The same text scores differently under TextBlob and the transformer models
+    backend = tuple(sorted(pipelines)) if pipelines else ('textblob',)
+    keys = [(backend, text) for text in normalize_texts(texts)]
+    routes = detect_languages(texts) if pipelines else None
+    cached = cache.get_many(keys) if cache is not None else [None] * len(keys)
+    pending = {}    # key -> indices of the texts it stands for
+    for idx, (key, hit) in enumerate(zip(keys, cached)):
+        if hit is None:
+            pending.setdefault(key, []).append(idx)
+        else:
+            sentiments[idx], confidences[idx] = hit
+    count_metric('sentiment_cache_hits', len(texts) - sum(len(indices) for indices in pending.values()))
+    if not pending:
+        return sentiments, confidences
+
+    scored, scores = score_texts([text for _, text in pending], pipelines, batch_size,
+                                 routes and [routes[indices[0]] for indices in pending.values()])
+    labels = []
+    for (key, indices), sentiment, confidence in zip(pending.items(), scored, scores):
+        sentiments[indices] = sentiment
+        confidences[indices] = confidence
+        if sentiment != UNKNOWN:
+            labels.append((key, (int(sentiment), float(confidence))))
+    if cache is not None:
+        cache.put_many(labels)
+    return sentiments, confidences
+
+# Score already normalized texts, routing each one to the model for its language.
+# `routes` are detect_languages labels from the raw texts; detected here if not given.
+def score_texts(texts, pipelines, batch_size=INFERENCE_BATCH_SIZE, routes=None):
+    sentiments = np.full(len(texts), UNKNOWN, dtype=np.int8)
+    confidences = np.zeros(len(texts), dtype=np.float32)
+    if not pipelines:
+        if textblob_available:
+            with span('inference', route='textblob', batch=len(texts)):
+                for idx, text in enumerate(texts):
+                    try:
+                        sentiments[idx], confidences[idx] = textblob_sentiment(text)
+                    except Exception as e:
+                        logger.warning("Error analyzing text: %s", e)
+        return sentiments, confidences
+
+    routes = routes or detect_languages(texts)
+    batches = {}
+    for idx, route in enumerate(routes):
+        # Fall back to whichever model actually loaded
+        if route not in pipelines:
+            route = 'multi' if 'multi' in pipelines else 'en'
+        batches.setdefault(route, []).append(idx)
+
+    for route, indices in batches.items():
+        try:
+            with span('inference', route=route, batch=len(indices)):
+                outputs = pipelines[route]([texts[i] for i in indices], batch_size=batch_size, truncation=True)
+        except Exception as e:
+            logger.warning("Error analyzing %s batch: %s", route, e)
+            continue
+        for idx, result in zip(indices, outputs):
+            sentiments[idx] = normalize_label(result['label'])
+            confidences[idx] = result['score']
+    return sentiments, confidences
+
+# Analyze sentiment of a single text, as (label, "0.00" confidence string)
+def analyze_sentiment(text, sentiment_pipeline):
+    pipelines = {'multi': sentiment_pipeline} if sentiment_pipeline and transformers_available else {}
+    sentiments, confidences = analyze_sentiments([text], pipelines)
+    return SENTIMENTS[sentiments[0]], f"{confidences[0]:.2f}"
+
+# Streaming scrape -> inference pipeline. The fetcher runs in a producer thread and
+# feeds a bounded queue (a full queue blocks the scraper, giving backpressure) while
+# this thread drains it in batches, so scraping and scoring overlap.
+STREAM_QUEUE_SIZE = 64
+STREAM_MAX_WAIT = 0.5
+_STREAM_DONE = object()
+
+def stream_analyzed_posts(post_iter, pipelines, batch_size=INFERENCE_BATCH_SIZE,
+                          queue_size=STREAM_QUEUE_SIZE, max_wait=STREAM_MAX_WAIT, on_thread_start=None,
+                          scorer=None, dedup=None):
+    """Yield a ResultBatch as soon as each batch of posts has been scored.
+
+    An exception raised by the fetcher is re-raised here once every post it
+    produced before failing has been yielded. `on_thread_start` is called with the
+    producer thread before it starts, e.g. to attach a UI context to it. The
+    producer runs in a copy of the caller's contextvars, so fetch spans land in
+    the caller's tracing.RunTrace.
+    `scorer(texts)` replaces the direct model call, e.g. to go through a shared
+    MicroBatcher; like analyze_sentiments it returns (sentiments, confidences).
+    With `dedup` (a neardup.NearDuplicateIndex) only one post per near-duplicate
+    cluster is scored and the batches carry cluster ids and signatures.
+    """
+    if scorer is None:
+        def scorer(texts):
+            return analyze_sentiments(texts, pipelines, batch_size)
+
+    post_queue = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                post_queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for post in post_iter:
+                if not put(post):
+                    break
+        except Exception as e:
+            put(e)
+        finally:
+            put(_STREAM_DONE)
+            close = getattr(post_iter, 'close', None)
+            if close:
+                close()
+
+    producer = threading.Thread(target=contextvars.copy_context().run, args=(produce,),
+                                name="post-producer", daemon=True)
+    if on_thread_start:
+        on_thread_start(producer)
+    producer.start()
+
+    error = None
+    try:
+        done = False
+        while not done:
+            # Block for the first post, then top the batch up until it is full
+            # or max_wait has passed
+            batch = []
+            item = post_queue.get()
+            deadline = time.monotonic() + max_wait
+            while True:
+                if item is _STREAM_DONE:
+                    done = True
+                    break
+                if isinstance(item, Exception):
+                    error = item
+                    done = True
+                    break
+                batch.append(item)
+                remaining = deadline - time.monotonic()
+                if len(batch) >= batch_size or remaining <= 0:
+                    break
+                try:
+                    item = post_queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            if batch:
+                texts = [post.text for post in batch]
+                clusters = signatures = None
+                with span('score', batch=len(batch)):
+                    if dedup is None:
+                        sentiments, confidences = scorer(texts)
+                    else:
+                        sentiments, confidences, clusters, signatures = dedup.score(texts, scorer)
+                yield ResultBatch.from_posts(batch, sentiments, confidences, clusters, signatures)
+        if error is not None:
+            raise error
+    finally:
+        stop.set()
+        producer.join(timeout=1)
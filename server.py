@@ -0,0 +1,125 @@
+"""Local HTTP service that scores text we already have, without scraping.
+
+    POST /sentiment  {"text": "..."}  or  {"texts": ["...", "..."]}
+    GET  /stats      latency percentiles and batch-size histogram
+    GET  /metrics    per-stage timings and counters in Prometheus text format
+    GET  /health
+
+Every request goes through one shared MicroBatcher, so concurrent requests are
+scored together instead of one model call per text.
+"""
+import json
+import logging
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from batching import MicroBatcher
+from schema import SENTIMENTS
+import tracing
+
+MAX_BODY_BYTES = 4 * 1024 * 1024
+REQUEST_TIMEOUT = 60
+BAD_PAYLOAD = {'error': "expected {'text': str} or {'texts': [str, ...]}"}
+
+logger = logging.getLogger("sentiment.server")
+
+
+def format_results(sentiments, confidences):
+    return [
+        {'sentiment': SENTIMENTS[code], 'confidence': round(float(score), 4)}
+        for code, score in zip(sentiments, confidences)
+    ]
+
+
+class SentimentHandler(BaseHTTPRequestHandler):
+    batcher = None
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+    def send_json(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_text(self, status, text, content_type='text/plain; version=0.0.4; charset=utf-8'):
+        body = text.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == '/health':
+            self.send_json(200, {'status': 'ok'})
+        elif self.path == '/stats':
+            self.send_json(200, self.batcher.stats.snapshot())
+        elif self.path == '/metrics':
+            self.send_text(200, tracing.prometheus_text())
+        else:
+            self.send_json(404, {'error': 'not found'})
+
+    def do_POST(self):
+        if self.path != '/sentiment':
+            self.send_json(404, {'error': 'not found'})
+            return
+        length = int(self.headers.get('Content-Length') or 0)
+        if length > MAX_BODY_BYTES:
+            self.send_json(413, {'error': 'request body too large'})
+            return
+        try:
+            payload = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            self.send_json(400, {'error': 'body must be JSON'})
+            return
+        if not isinstance(payload, dict):
+            self.send_json(400, BAD_PAYLOAD)
+            return
+
+        if isinstance(payload.get('text'), str):
+            texts, single = [payload['text']], True
+        elif isinstance(payload.get('texts'), list) and all(isinstance(t, str) for t in payload['texts']):
+            texts, single = payload['texts'], False
+        else:
+            self.send_json(400, BAD_PAYLOAD)
+            return
+
+        try:
+            results = format_results(*self.batcher.analyze(texts, timeout=REQUEST_TIMEOUT))
+        except Exception as e:
+            logger.exception("Scoring failed")
+            self.send_json(500, {'error': str(e)})
+            return
+        self.send_json(200, results[0] if single else {'results': results})
+
+
+class SentimentServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Bursts of concurrent clients are the whole point, so don't reset them at accept()
+    request_queue_size = 128
+
+
+def make_server(batcher, host='127.0.0.1', port=8765):
+    handler = type('BoundSentimentHandler', (SentimentHandler,), {'batcher': batcher})
+    return SentimentServer((host, port), handler)
+
+
+def serve(pipelines, host='127.0.0.1', port=8765, max_batch_size=None, max_wait=None):
+    kwargs = {}
+    if max_batch_size:
+        kwargs['max_batch_size'] = max_batch_size
+    if max_wait is not None:
+        kwargs['max_wait'] = max_wait
+    batcher = MicroBatcher(pipelines, **kwargs)
+    httpd = make_server(batcher, host, port)
+    logger.info("Serving sentiment on http://%s:%d", host, port)
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+        batcher.close()
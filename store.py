@@ -0,0 +1,261 @@
+"""SQLite storage for analyzed posts with incrementally maintained rollups.
+
+Every stored post also updates per-(platform, identifier, hour/day, sentiment)
+counts and confidence sums in the same transaction, so trend charts and period
+comparisons read a handful of rollup rows instead of re-aggregating every post.
+Posts already in the store (same platform, identifier and text) are skipped and
+don't touch the rollups, so adding a batch costs O(new posts). MinHash
+signatures of posts scored with near-duplicate detection are kept with them, so
+later fetches can reuse their labels (see neardup). Posts stored by a queue
+worker are also linked to the job that fetched them, including posts that were
+already in the store, so a job's results can be read back (see worker).
+"""
+import time
+import sqlite3
+import hashlib
+import threading
+
+import numpy as np
+import pandas as pd
+
+from schema import SENTIMENTS, UNKNOWN, ResultBatch
+from timestamps import NO_TIMESTAMP
+
+DEFAULT_DB_PATH = 'sentiment_results.db'
+GRANULARITIES = {'hour': 3600, 'day': 86400}
+HASH_LOOKUP_CHUNK = 500
+SEED_SIGNATURE_LIMIT = 50000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS posts (
+    id INTEGER PRIMARY KEY,
+    platform TEXT NOT NULL,
+    identifier TEXT NOT NULL,
+    text_hash TEXT NOT NULL,
+    text TEXT NOT NULL,
+    timestamp_raw TEXT,
+    epoch INTEGER,
+    stored_at INTEGER NOT NULL,
+    sentiment INTEGER NOT NULL,
+    confidence REAL NOT NULL,
+    minhash BLOB,
+    UNIQUE (platform, identifier, text_hash)
+);
+CREATE INDEX IF NOT EXISTS posts_by_time ON posts (platform, identifier, epoch);
+CREATE TABLE IF NOT EXISTS job_posts (
+    job_id INTEGER NOT NULL,
+    post_id INTEGER NOT NULL,
+    UNIQUE (job_id, post_id)
+);
+CREATE TABLE IF NOT EXISTS rollups (
+    platform TEXT NOT NULL,
+    identifier TEXT NOT NULL,
+    granularity TEXT NOT NULL,
+    bucket INTEGER NOT NULL,
+    sentiment INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    confidence_sum REAL NOT NULL,
+    PRIMARY KEY (platform, identifier, granularity, bucket, sentiment)
+);
+"""
+
+UPSERT_ROLLUP = """
+INSERT INTO rollups (platform, identifier, granularity, bucket, sentiment, count, confidence_sum)
+VALUES (?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (platform, identifier, granularity, bucket, sentiment)
+DO UPDATE SET count = count + excluded.count, confidence_sum = confidence_sum + excluded.confidence_sum
+"""
+
+
+def text_hash(text):
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
+
+
+class ResultStore:
+    def __init__(self, path=DEFAULT_DB_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._migrate()
+
+    def _migrate(self):
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(posts)")}
+        if 'minhash' not in columns:
+            with self._conn:
+                self._conn.execute("ALTER TABLE posts ADD COLUMN minhash BLOB")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _existing_ids(self, platform, identifier, hashes):
+        # text_hash -> post id for the hashes already stored
+        existing = {}
+        for start in range(0, len(hashes), HASH_LOOKUP_CHUNK):
+            chunk = hashes[start:start + HASH_LOOKUP_CHUNK]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self._conn.execute(
+                f"SELECT text_hash, id FROM posts WHERE platform = ? AND identifier = ? AND text_hash IN ({placeholders})",
+                (platform, identifier, *chunk),
+            )
+            existing.update(rows)
+        return existing
+
+    def add_batch(self, batch, stored_at=None, job_id=None):
+        """Store a ResultBatch and fold its new posts into the rollups; returns the number of new posts.
+
+        With `job_id`, every post of the batch, new or not, is linked to that queue job.
+        """
+        if not len(batch):
+            return 0
+        stored_at = int(stored_at or time.time())
+        hashes = [text_hash(text) for text in batch.texts]
+        # Posts without a parseable timestamp are bucketed at the time they were stored
+        epochs = np.where(batch.timestamps == NO_TIMESTAMP, stored_at, batch.timestamps)
+
+        with self._lock, self._conn:
+            by_key = {}
+            for idx, key in enumerate(zip(batch.platforms, batch.identifiers)):
+                by_key.setdefault(key, []).append(idx)
+            new_rows = []
+            for (platform, identifier), indices in by_key.items():
+                seen = set(self._existing_ids(platform, identifier, [hashes[i] for i in indices]))
+                for idx in indices:
+                    if hashes[idx] not in seen:
+                        seen.add(hashes[idx])
+                        new_rows.append(idx)
+            new_rows.sort()
+            if new_rows:
+                self._insert_posts(batch, hashes, epochs, new_rows, stored_at)
+            if job_id is not None:
+                self._link_job(job_id, batch, hashes, by_key)
+        return len(new_rows)
+
+    def _insert_posts(self, batch, hashes, epochs, new_rows, stored_at):
+        self._conn.executemany(
+            "INSERT INTO posts (platform, identifier, text_hash, text, timestamp_raw, epoch, stored_at, sentiment, confidence, minhash) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [
+                (batch.platforms[i], batch.identifiers[i], hashes[i], batch.texts[i], str(batch.timestamps_raw[i]),
+                 None if batch.timestamps[i] == NO_TIMESTAMP else int(batch.timestamps[i]), stored_at,
+                 int(batch.sentiments[i]), float(batch.confidences[i]),
+                 None if batch.signatures is None else batch.signatures[i].tobytes())
+                for i in new_rows
+            ],
+        )
+        self._conn.executemany(UPSERT_ROLLUP, self._rollup_deltas(batch, epochs, new_rows))
+
+    def _link_job(self, job_id, batch, hashes, by_key):
+        post_ids = [None] * len(batch)
+        for (platform, identifier), indices in by_key.items():
+            ids = self._existing_ids(platform, identifier, [hashes[i] for i in indices])
+            for idx in indices:
+                post_ids[idx] = ids[hashes[idx]]
+        # Rowid order keeps the order the job fetched its posts in
+        self._conn.executemany("INSERT OR IGNORE INTO job_posts (job_id, post_id) VALUES (?, ?)",
+                               [(int(job_id), post_id) for post_id in post_ids])
+
+    @staticmethod
+    def _rollup_deltas(batch, epochs, rows):
+        # Aggregate the new posts in memory first so each bucket gets one upsert
+        frame = pd.DataFrame({
+            'platform': [batch.platforms[i] for i in rows],
+            'identifier': [batch.identifiers[i] for i in rows],
+            'epoch': epochs[rows],
+            'sentiment': batch.sentiments[rows].astype(np.int64),
+            'confidence': batch.confidences[rows].astype(np.float64),
+        })
+        deltas = []
+        for granularity, seconds in GRANULARITIES.items():
+            frame['bucket'] = frame['epoch'] // seconds * seconds
+            grouped = frame.groupby(['platform', 'identifier', 'bucket', 'sentiment'], sort=False)['confidence'].agg(['size', 'sum'])
+            for (platform, identifier, bucket, sentiment), (count, confidence_sum) in grouped.iterrows():
+                deltas.append((platform, identifier, granularity, int(bucket), int(sentiment), int(count), float(confidence_sum)))
+        return deltas
+
+    def labeled_signatures(self, limit=SEED_SIGNATURE_LIMIT):
+        """(signature, sentiment, confidence) of the latest scored posts, for seeding a NearDuplicateIndex"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT minhash, sentiment, confidence FROM posts WHERE minhash IS NOT NULL AND sentiment != ? "
+                "ORDER BY id DESC LIMIT ?", (UNKNOWN, limit),
+            ).fetchall()
+        return [(np.frombuffer(blob, dtype=np.uint32), sentiment, confidence) for blob, sentiment, confidence in rows]
+
+    def identifiers(self):
+        with self._lock:
+            return self._conn.execute("SELECT DISTINCT platform, identifier FROM rollups ORDER BY platform, identifier").fetchall()
+
+    def job_batch(self, job_id):
+        """The posts a queue job fetched, in fetch order, as a ResultBatch"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT p.text, p.timestamp_raw, p.epoch, p.sentiment, p.confidence, p.platform, p.identifier "
+                "FROM job_posts j JOIN posts p ON p.id = j.post_id WHERE j.job_id = ? ORDER BY j.rowid",
+                (int(job_id),),
+            ).fetchall()
+        if not rows:
+            return ResultBatch.empty()
+        texts, raw, epochs, sentiments, confidences, platforms, identifiers = zip(*rows)
+        return ResultBatch(
+            list(texts), list(raw),
+            np.array([NO_TIMESTAMP if epoch is None else epoch for epoch in epochs], dtype=np.int64),
+            np.array(sentiments, dtype=np.int8), np.array(confidences, dtype=np.float32),
+            list(platforms), list(identifiers),
+        )
+
+    def _rollup_rows(self, platform, identifier, granularity, start=None, end=None):
+        query = ("SELECT bucket, sentiment, count, confidence_sum FROM rollups "
+                 "WHERE platform = ? AND identifier = ? AND granularity = ?")
+        params = [platform, identifier, granularity]
+        if start is not None:
+            query += " AND bucket >= ?"
+            params.append(int(start))
+        if end is not None:
+            query += " AND bucket < ?"
+            params.append(int(end))
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return pd.DataFrame(rows, columns=['bucket', 'sentiment', 'count', 'confidence_sum'])
+
+    def trend(self, platform, identifier, granularity='day', start=None, end=None):
+        """Counts per sentiment and mean confidence for each time bucket"""
+        rows = self._rollup_rows(platform, identifier, granularity, start, end)
+        if rows.empty:
+            return pd.DataFrame(columns=list(SENTIMENTS) + ['mean_confidence'])
+        rows['sentiment'] = rows['sentiment'].map(lambda code: SENTIMENTS[code])
+        counts = rows.pivot_table(index='bucket', columns='sentiment', values='count', aggfunc='sum', fill_value=0)
+        totals = rows.groupby('bucket')[['count', 'confidence_sum']].sum()
+        counts['mean_confidence'] = totals['confidence_sum'] / totals['count']
+        counts.index = pd.to_datetime(counts.index, unit='s', utc=True)
+        counts.columns.name = None
+        return counts
+
+    def period_summary(self, platform, identifier, start, end):
+        """Counts, share and mean confidence per sentiment for [start, end)"""
+        rows = self._rollup_rows(platform, identifier, 'hour', start, end)
+        summary = pd.DataFrame(index=list(SENTIMENTS), data={'count': 0, 'confidence_sum': 0.0})
+        if not rows.empty:
+            grouped = rows.groupby('sentiment')[['count', 'confidence_sum']].sum()
+            grouped.index = [SENTIMENTS[code] for code in grouped.index]
+            summary.loc[grouped.index] = grouped
+        total = summary['count'].sum()
+        summary['share'] = summary['count'] / total if total else 0.0
+        summary['mean_confidence'] = (summary['confidence_sum'] / summary['count'].where(summary['count'] > 0)).fillna(0.0)
+        return summary.drop(columns='confidence_sum')
+
+    def compare_periods(self, platform, identifier, period_seconds, now=None):
+        """Compare the latest period with the one before it, on hour boundaries"""
+        end = (int(now or time.time()) // 3600 + 1) * 3600
+        current = self.period_summary(platform, identifier, end - period_seconds, end)
+        previous = self.period_summary(platform, identifier, end - 2 * period_seconds, end - period_seconds)
+        comparison = pd.DataFrame({
+            'current': current['count'],
+            'previous': previous['count'],
+            'current_share': current['share'],
+            'previous_share': previous['share'],
+        })
+        comparison['share_change'] = comparison['current_share'] - comparison['previous_share']
+        return comparison
@@ -0,0 +1,112 @@
+import pytest
+
+from jobqueue import SQLiteBroker, Broker, LeaseLost, QUEUED, RUNNING, DONE, FAILED, open_broker
+
+
+@pytest.fixture
+def broker(tmp_path):
+    broker = SQLiteBroker(str(tmp_path / 'jobs.db'), max_attempts=3, retry_delay=0)
+    yield broker
+    broker.close()
+
+
+def available_at(broker, job_id):
+    return broker._conn.execute("SELECT available_at FROM jobs WHERE id = ?", (job_id,)).fetchone()[0]
+
+
+def test_claim_leases_oldest_job(broker):
+    first = broker.submit('twitter', 'foo', 50, backend='http')
+    broker.submit('facebook', 'bar')
+    job = broker.claim('w1')
+    assert job.id == first
+    assert (job.status, job.worker, job.attempts) == (RUNNING, 'w1', 1)
+    assert job.options == {'backend': 'http'}
+
+
+def test_expired_lease_is_requeued(broker):
+    job_id = broker.submit('twitter', 'foo')
+    broker.claim('w1', lease_seconds=-1)
+    assert broker.requeue_expired() == 1
+    job = broker.get(job_id)
+    assert (job.status, job.worker) == (QUEUED, None)
+    assert broker.claim('w2').id == job_id
+
+
+def test_lease_lost_after_requeue(broker):
+    job_id = broker.submit('twitter', 'foo')
+    broker.claim('w1', lease_seconds=-1)
+    again = broker.claim('w2')
+    assert again.id == job_id and again.attempts == 2
+    with pytest.raises(LeaseLost):
+        broker.heartbeat(job_id, 'w1')
+    with pytest.raises(LeaseLost):
+        broker.complete(job_id, 'w1', {'posts': 1})
+    with pytest.raises(LeaseLost):
+        broker.fail(job_id, 'w1', "boom")
+    broker.heartbeat(job_id, 'w2')
+    broker.complete(job_id, 'w2', {'posts': 3})
+    job = broker.get(job_id)
+    assert (job.status, job.result) == (DONE, {'posts': 3})
+
+
+def test_expired_leases_fail_after_max_attempts(broker):
+    job_id = broker.submit('twitter', 'foo')
+    for attempt in range(1, 4):
+        job = broker.claim('w1', lease_seconds=-1)
+        assert (job.id, job.attempts) == (job_id, attempt)
+    assert broker.claim('w1') is None
+    job = broker.get(job_id)
+    assert job.status == FAILED
+    assert "attempt 3 of 3" in job.error
+
+
+def test_failed_job_is_retried_with_growing_delay(tmp_path):
+    broker = SQLiteBroker(str(tmp_path / 'jobs.db'), max_attempts=3, retry_delay=60)
+    job_id = broker.submit('twitter', 'foo')
+    job = broker.claim('w1')
+    broker.fail(job_id, 'w1', "timeout")
+    job = broker.get(job_id)
+    assert (job.status, job.error) == (QUEUED, "timeout")
+    assert available_at(broker, job_id) - job.started_at == pytest.approx(60, abs=1)
+    # Not runnable until the delay has passed
+    assert broker.claim('w1') is None
+    broker.close()
+
+
+def test_fail_without_retry_or_attempts_left(broker):
+    job_id = broker.submit('twitter', 'foo')
+    broker.claim('w1')
+    broker.fail(job_id, 'w1', "unknown platform", retry=False)
+    assert broker.get(job_id).status == FAILED
+
+    job_id = broker.submit('twitter', 'bar')
+    for _ in range(3):
+        broker.claim('w1')
+        broker.fail(job_id, 'w1', "timeout")
+    job = broker.get(job_id)
+    assert (job.status, job.attempts) == (FAILED, 3)
+
+
+def test_counts_and_listing(broker):
+    for identifier in ('a', 'b', 'c'):
+        broker.submit('twitter', identifier)
+    broker.claim('w1')
+    assert broker.counts() == {QUEUED: 2, RUNNING: 1, DONE: 0, FAILED: 0}
+    assert [job.identifier for job in broker.jobs()] == ['c', 'b', 'a']
+
+
+def test_incomplete_backend_fails_on_creation():
+    class Partial(Broker):
+        def submit(self, platform, identifier, max_posts=100, **options):
+            return 1
+
+    with pytest.raises(TypeError):
+        Partial()
+
+
+def test_open_broker(tmp_path):
+    broker = open_broker(str(tmp_path / 'jobs.db'))
+    assert isinstance(broker, SQLiteBroker)
+    broker.close()
+    with pytest.raises(ValueError):
+        open_broker('redis://localhost')
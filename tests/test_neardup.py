@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+from neardup import NearDuplicateIndex, NUM_PERM, minhash, similarity
+from schema import NO_CLUSTER, POSITIVE, NEGATIVE
+
+BASE = np.arange(NUM_PERM, dtype=np.uint32)
+
+
+def variant(equal):
+    """A signature agreeing with BASE in its first `equal` positions"""
+    signature = BASE.copy()
+    signature[equal:] += 1000
+    return signature
+
+
+def test_joins_cluster_at_threshold():
+    index = NearDuplicateIndex(threshold=0.8)
+    first = index.assign(BASE)
+    equal = int(np.ceil(0.8 * NUM_PERM))
+    assert similarity(BASE, variant(equal)) >= 0.8
+    assert index.assign(variant(equal)) == first
+    assert len(index) == 1
+
+
+def test_starts_new_cluster_below_threshold():
+    index = NearDuplicateIndex(threshold=0.8)
+    first = index.assign(BASE)
+    equal = int(np.ceil(0.8 * NUM_PERM)) - 1
+    assert similarity(BASE, variant(equal)) < 0.8
+    second = index.assign(variant(equal))
+    assert second != first and second != NO_CLUSTER
+    assert len(index) == 2
+
+
+def test_threshold_one_only_clusters_identical_signatures():
+    index = NearDuplicateIndex(threshold=1.0)
+    first = index.assign(BASE)
+    assert index.assign(BASE.copy()) == first
+    assert index.assign(variant(NUM_PERM - 1)) != first
+
+
+@pytest.mark.parametrize('threshold', [0, -0.1, 1.5])
+def test_rejects_invalid_threshold(threshold):
+    with pytest.raises(ValueError):
+        NearDuplicateIndex(threshold)
+
+
+def test_cross_posts_are_scored_once():
+    texts = [
+        "Our new running shoe is out today, lighter and faster than ever. Grab a pair at the store!",
+        "Our new running shoe is out today - lighter and faster than ever. Grab a pair at the store!!",
+        "Quarterly results came in below expectations and we are cutting the outlook for the year.",
+    ]
+    assert similarity(minhash(texts[0]), minhash(texts[1])) >= 0.8
+    calls = []
+
+    def scorer(batch):
+        calls.append(list(batch))
+        return np.array([POSITIVE, NEGATIVE][:len(batch)]), np.array([0.9, 0.7][:len(batch)])
+
+    index = NearDuplicateIndex(threshold=0.8)
+    sentiments, confidences, clusters, signatures = index.score(texts, scorer)
+    assert calls == [[texts[0], texts[2]]]
+    assert clusters[0] == clusters[1] != clusters[2]
+    assert sentiments.tolist() == [POSITIVE, POSITIVE, NEGATIVE]
+    assert signatures.shape == (3, NUM_PERM)
+
+
+def test_seeded_labels_are_reused():
+    index = NearDuplicateIndex(threshold=0.8)
+    index.seed([(BASE, NEGATIVE, 0.6)])
+    cluster = index.assign(variant(NUM_PERM - 5))
+    assert index.labels[cluster] == (NEGATIVE, pytest.approx(0.6))
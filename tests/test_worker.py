@@ -0,0 +1,41 @@
+import time
+
+import pytest
+
+from deadline import Deadline
+from jobqueue import SQLiteBroker
+from worker import Heartbeat
+
+
+@pytest.fixture
+def broker(tmp_path):
+    broker = SQLiteBroker(str(tmp_path / 'jobs.db'))
+    yield broker
+    broker.close()
+
+
+def wait_for(condition, timeout=2.0):
+    end = time.monotonic() + timeout
+    while not condition() and time.monotonic() < end:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_heartbeat_renews_lease(broker):
+    broker.submit('twitter', 'foo')
+    job = broker.claim('w1', lease_seconds=1)
+    deadline = Deadline()
+    with Heartbeat(broker, job, 'w1', deadline, lease_seconds=60, interval=0.01) as heartbeat:
+        assert wait_for(lambda: broker.get(job.id).lease_expires > time.time() + 30)
+    assert not heartbeat.lost and deadline.reason is None
+
+
+def test_lost_lease_cancels_the_fetch(broker):
+    broker.submit('twitter', 'foo')
+    job = broker.claim('w1', lease_seconds=-1)
+    # The queue hands the expired job to another worker
+    assert broker.claim('w2').id == job.id
+    deadline = Deadline()
+    with Heartbeat(broker, job, 'w1', deadline, interval=0.01) as heartbeat:
+        assert wait_for(lambda: heartbeat.lost)
+    assert deadline.reason == "job lease lost"
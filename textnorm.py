@@ -0,0 +1,127 @@
+"""Text normalization applied before scoring.
+
+Scraped text carries UI leftovers ("…see more" toggles, LinkedIn span fragments
+appended twice by the extraction loop) and tokens the tweet models expect in a
+canonical form. normalize_texts cleans a whole batch in one pass with
+precompiled regexes and translation tables:
+
+    URLs                    -> HTTPURL
+    @mentions               -> @USER
+    #hashtags               -> hashtags
+    emoji                   -> :emoji_name: (with the optional `emoji` package),
+                               skin tones and variation selectors dropped
+    typographic quotes, dashes and odd spaces -> ASCII
+
+The result feeds the models and is the key of the sentiment cache, so copies of
+a post that only differ in links, mentions or whitespace are scored once.
+"""
+import re
+import threading
+from collections import OrderedDict
+
+try:
+    import emoji
+    emoji_available = True
+except ImportError:
+    emoji_available = False
+
+URL_RE = re.compile(r"(?:https?://|www\.)\S+", re.IGNORECASE)
+MENTION_RE = re.compile(r"(?<![\w@])@\w+")
+HASHTAG_RE = re.compile(r"(?<![\w#])#(\w+)")
+# "…see more" / "... more" where a feed truncated the post, and other toggles, at the end of the text
+SEE_MORE_RE = re.compile(r"\s*(?:(?:…|\.\.\.)\s*(?:see more|more)|\b(?:see (?:more|less|translation)|show (?:more|less)))\s*$",
+                         re.IGNORECASE)
+FRAGMENT_SPLIT_RE = re.compile(r"(?<=[.!?…])\s+|\s*\n+\s*")
+WHITESPACE_RE = re.compile(r"\s+")
+# Repeated fragments shorter than this are kept ("Thanks! Thanks!")
+MIN_REPEATED_FRAGMENT = 12
+
+CHARACTER_MAP = str.maketrans({
+    '\u2018': "'", '\u2019': "'", '\u201a': "'", '\u201b': "'",
+    '\u201c': '"', '\u201d': '"', '\u201e': '"', '\u00ab': '"', '\u00bb': '"',
+    '\u2013': '-', '\u2014': '-', '\u2212': '-',
+    '\u00a0': ' ', '\u2009': ' ', '\u202f': ' ', '\u3000': ' ',
+    # Zero-width characters, variation selectors and skin tone modifiers
+    '\u200b': None, '\u200c': None, '\u200d': None, '\u2060': None, '\ufeff': None,
+    '\ufe0e': None, '\ufe0f': None,
+    **{chr(code): None for code in range(0x1F3FB, 0x1F400)},
+})
+
+
+def drop_repeated_fragments(text):
+    """Remove sentences and lines that already appeared earlier in the text"""
+    half = len(text) // 2
+    if half >= MIN_REPEATED_FRAGMENT and text[:half].strip() == text[half:].strip():
+        return text[:half].strip()
+    fragments = FRAGMENT_SPLIT_RE.split(text)
+    if len(fragments) < 2:
+        return text
+    seen = set()
+    kept = []
+    for fragment in fragments:
+        if len(fragment) >= MIN_REPEATED_FRAGMENT:
+            if fragment in seen:
+                continue
+            seen.add(fragment)
+        kept.append(fragment)
+    return " ".join(kept)
+
+
+def normalize_texts(texts):
+    """Normalized copies of a batch of post texts, in order"""
+    translate, url_sub, mention_sub, hashtag_sub = str.translate, URL_RE.sub, MENTION_RE.sub, HASHTAG_RE.sub
+    see_more_sub, whitespace_sub = SEE_MORE_RE.sub, WHITESPACE_RE.sub
+    demojize = emoji.demojize if emoji_available else None
+    normalized = []
+    for text in texts:
+        text = translate(text, CHARACTER_MAP)
+        text = drop_repeated_fragments(see_more_sub("", text))
+        text = hashtag_sub(r"\1", mention_sub("@USER", url_sub("HTTPURL", text)))
+        if demojize is not None:
+            text = demojize(text)
+        normalized.append(whitespace_sub(" ", text).strip())
+    return normalized
+
+
+def normalize_text(text):
+    return normalize_texts([text])[0]
+
+
+class LRUCache:
+    """Thread-safe mapping that forgets the least recently used keys past `maxsize`"""
+
+    def __init__(self, maxsize=10000):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get_many(self, keys):
+        """Values for `keys`, None where missing"""
+        values = []
+        with self._lock:
+            for key in keys:
+                value = self._data.get(key)
+                if value is None:
+                    self.misses += 1
+                else:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                values.append(value)
+        return values
+
+    def put_many(self, items):
+        with self._lock:
+            for key, value in items:
+                self._data[key] = value
+                self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
@@ -0,0 +1,240 @@
+"""Normalize the timestamps each platform hands back into UTC epoch seconds.
+
+Scrapers return whatever the page shows: ISO `datetime` attributes (Twitter,
+Instagram), relative text like "3d •" (LinkedIn), `data-utime` epochs or `title`
+strings like "Monday, March 4, 2024 at 10:31 AM" (Facebook), or "Unknown".
+normalize_timestamps parses a whole batch at once: values are deduplicated,
+classified by shape, and each class is parsed with one vectorized call. The
+strptime formats that matched a shape are cached and tried first, so later
+batches usually parse in one call. Naive date strings are taken to be UTC, and
+dates without a year ("12 Mar") are placed in the year before the fetch time.
+"""
+import re
+import threading
+import time
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+NO_TIMESTAMP = np.iinfo(np.int64).min
+EPOCH = pd.Timestamp(0, tz='UTC')
+
+MISSING_VALUES = frozenset(['', 'unknown', 'none', 'null', 'nan'])
+
+EPOCH_RE = re.compile(r"^\d{9,13}$")
+ISO_RE = re.compile(r"^\d{4}-\d{2}-\d{2}([T ]\d{2}:\d{2}.*)?$")
+RELATIVE_RE = re.compile(
+    r"^(?P<n>\d+)\s*(?P<unit>s|sec|secs|second|seconds|m|min|mins|minute|minutes|h|hr|hrs|hour|hours|"
+    r"d|day|days|w|wk|wks|week|weeks|mo|mos|month|months|y|yr|yrs|year|years)\b(\s*ago)?",
+    re.IGNORECASE,
+)
+JUST_NOW_RE = re.compile(r"^(just now|now|moments? ago)\b", re.IGNORECASE)
+YESTERDAY_RE = re.compile(r"^yesterday\b", re.IGNORECASE)
+# Separators and decorations around relative times, e.g. "3d • Edited •"
+DECORATION_RE = re.compile(r"\s*[•·]\s*(edited)?\s*", re.IGNORECASE)
+SHAPE_RE = re.compile(r"\d+|[^\W\d_]+")
+
+UNIT_SECONDS = {
+    's': 1, 'sec': 1, 'secs': 1, 'second': 1, 'seconds': 1,
+    'm': 60, 'min': 60, 'mins': 60, 'minute': 60, 'minutes': 60,
+    'h': 3600, 'hr': 3600, 'hrs': 3600, 'hour': 3600, 'hours': 3600,
+    'd': 86400, 'day': 86400, 'days': 86400,
+    'w': 604800, 'wk': 604800, 'wks': 604800, 'week': 604800, 'weeks': 604800,
+    'mo': 2592000, 'mos': 2592000, 'month': 2592000, 'months': 2592000,
+    'y': 31536000, 'yr': 31536000, 'yrs': 31536000, 'year': 31536000, 'years': 31536000,
+}
+
+# Formats tried, in order, for date strings that are neither ISO nor relative
+DATE_FORMATS = (
+    "%A, %B %d, %Y at %I:%M %p",
+    "%A, %B %d, %Y at %H:%M",
+    "%B %d, %Y at %I:%M %p",
+    "%B %d, %Y at %H:%M",
+    "%B %d, %Y",
+    "%b %d, %Y",
+    "%d %B %Y",
+    "%d %b %Y",
+    "%m/%d/%Y %I:%M %p",
+    "%m/%d/%Y",
+    "%a %b %d %H:%M:%S %z %Y",
+    # Facebook and LinkedIn leave out the year for dates in the current one
+    "%B %d",
+    "%b %d",
+    "%d %B",
+    "%d %b",
+)
+
+_format_cache = {}    # value shape -> formats that matched it, in the order they were found
+_format_cache_lock = threading.Lock()
+
+
+class TimestampReport:
+    """How a set of raw timestamps was parsed"""
+
+    def __init__(self, kinds=None, failures=0, missing=0, examples=None):
+        self.kinds = Counter(kinds or {})
+        self.failures = failures
+        self.missing = missing
+        self.examples = list(examples or [])
+
+    @property
+    def total(self):
+        return sum(self.kinds.values()) + self.failures + self.missing
+
+    @property
+    def parsed(self):
+        return sum(self.kinds.values())
+
+    @property
+    def failure_rate(self):
+        attempted = self.parsed + self.failures
+        return self.failures / attempted if attempted else 0.0
+
+    def merge(self, other):
+        return TimestampReport(self.kinds + other.kinds, self.failures + other.failures,
+                               self.missing + other.missing,
+                               list(dict.fromkeys(self.examples + other.examples))[:10])
+
+    def as_dict(self):
+        return {
+            'total': self.total,
+            'parsed': self.parsed,
+            'missing': self.missing,
+            'failures': self.failures,
+            'failure_rate': round(self.failure_rate, 4),
+            'kinds': dict(self.kinds),
+            'failure_examples': self.examples,
+        }
+
+
+def value_shape(value):
+    """Shape of a date string with digits and words abstracted, used as the format cache key"""
+    return SHAPE_RE.sub(lambda m: '9' if m.group().isdigit() else 'a', value)
+
+
+def _classify(value):
+    if EPOCH_RE.match(value):
+        return 'epoch'
+    if ISO_RE.match(value):
+        return 'iso'
+    if JUST_NOW_RE.match(value) or YESTERDAY_RE.match(value) or RELATIVE_RE.match(value):
+        return 'relative'
+    return 'formatted'
+
+
+def _relative_seconds(value):
+    if JUST_NOW_RE.match(value):
+        return 0
+    if YESTERDAY_RE.match(value):
+        return 86400
+    match = RELATIVE_RE.match(value)
+    return int(match.group('n')) * UNIT_SECONDS[match.group('unit').lower()]
+
+
+def _to_epochs(parsed):
+    epochs = np.full(len(parsed), NO_TIMESTAMP, dtype=np.int64)
+    valid = parsed.notna().to_numpy()
+    if valid.any():
+        epochs[valid] = ((parsed[valid] - EPOCH) // pd.Timedelta(seconds=1)).to_numpy(dtype=np.int64)
+    return epochs
+
+
+def _parse_with_format(group, fmt, now):
+    if '%Y' in fmt:
+        return _to_epochs(pd.to_datetime(group, format=fmt, errors='coerce', utc=True))
+    # No year: take the fetch year, or the year before when that lands in the future
+    year = time.gmtime(now).tm_year
+    epochs = _to_epochs(pd.to_datetime(group + f" {year}", format=f"{fmt} %Y", errors='coerce', utc=True))
+    future = (epochs != NO_TIMESTAMP) & (epochs > now + 86400)
+    if future.any():
+        epochs[future] = _to_epochs(pd.to_datetime(group[future] + f" {year - 1}", format=f"{fmt} %Y",
+                                                   errors='coerce', utc=True))
+    return epochs
+
+
+def _parse_formatted(values, now=None):
+    """Parse date strings by shape, trying the formats that matched the shape before first.
+
+    A shape stands for values in several formats ("March 4, 2024" and "Mar 4,
+    2024"), so rows the known formats miss are retried with the others.
+    """
+    now = int(now or time.time())
+    epochs = np.full(len(values), NO_TIMESTAMP, dtype=np.int64)
+    by_shape = {}
+    for idx, value in enumerate(values):
+        by_shape.setdefault(value_shape(value), []).append(idx)
+
+    for shape, indices in by_shape.items():
+        group = pd.Series([values[i] for i in indices], dtype=object)
+        group_epochs = np.full(len(group), NO_TIMESTAMP, dtype=np.int64)
+        with _format_cache_lock:
+            known = list(_format_cache.get(shape, ()))
+        matched = []
+        for fmt in known + [fmt for fmt in DATE_FORMATS if fmt not in known]:
+            todo = np.flatnonzero(group_epochs == NO_TIMESTAMP)
+            if not len(todo):
+                break
+            parsed = _parse_with_format(group.iloc[todo].reset_index(drop=True), fmt, now)
+            if (parsed != NO_TIMESTAMP).any():
+                group_epochs[todo] = parsed
+                matched.append(fmt)
+        new = [fmt for fmt in matched if fmt not in known]
+        if new:
+            with _format_cache_lock:
+                _format_cache[shape] = known + new
+        epochs[indices] = group_epochs
+    return epochs
+
+
+def normalize_timestamps(raw_values, fetched_at=None):
+    """Return (int64 epoch seconds array, TimestampReport) for a batch of raw values.
+
+    `fetched_at` is the reference time for relative values: a single epoch
+    second value or one per raw value. Defaults to now.
+    """
+    count = len(raw_values)
+    epochs = np.full(count, NO_TIMESTAMP, dtype=np.int64)
+    if not count:
+        return epochs, TimestampReport()
+    if fetched_at is None:
+        fetched_at = time.time()
+    reference = np.broadcast_to(np.asarray(fetched_at, dtype=np.float64), (count,)).astype(np.int64)
+
+    # Clean and dedupe so repeated values ("1w •") are classified once
+    cleaned = [DECORATION_RE.sub(' ', str(value or '')).strip() for value in raw_values]
+    uniques, inverse = np.unique(np.asarray(cleaned, dtype=object), return_inverse=True)
+    kinds = np.array([
+        'missing' if value.lower() in MISSING_VALUES else _classify(value) for value in uniques
+    ], dtype=object)
+    row_kinds = kinds[inverse]
+
+    absolute = np.full(len(uniques), NO_TIMESTAMP, dtype=np.int64)
+    for kind in ('epoch', 'iso', 'formatted'):
+        positions = np.flatnonzero(kinds == kind)
+        if not len(positions):
+            continue
+        values = [uniques[p] for p in positions]
+        if kind == 'epoch':
+            numbers = np.array([int(v) for v in values], dtype=np.int64)
+            # 13-digit values are milliseconds
+            absolute[positions] = np.where(numbers > 10**11, numbers // 1000, numbers)
+        elif kind == 'iso':
+            absolute[positions] = _to_epochs(pd.to_datetime(pd.Series(values, dtype=object),
+                                                            format='ISO8601', errors='coerce', utc=True))
+        else:
+            absolute[positions] = _parse_formatted(values, reference.max())
+    epochs[:] = absolute[inverse]
+
+    relative_positions = np.flatnonzero(kinds == 'relative')
+    if len(relative_positions):
+        offsets = np.zeros(len(uniques), dtype=np.int64)
+        offsets[relative_positions] = [_relative_seconds(uniques[p]) for p in relative_positions]
+        is_relative = row_kinds == 'relative'
+        epochs[is_relative] = reference[is_relative] - offsets[inverse][is_relative]
+
+    missing = row_kinds == 'missing'
+    failed = (epochs == NO_TIMESTAMP) & ~missing
+    parsed_kinds = Counter(row_kinds[~failed & ~missing].tolist())
+    examples = list(dict.fromkeys(cleaned[i] for i in np.flatnonzero(failed)))[:5]
+    return epochs, TimestampReport(parsed_kinds, int(failed.sum()), int(missing.sum()), examples)
@@ -0,0 +1,227 @@
+"""Lightweight span tracing and metrics for the fetch and inference stages.
+
+    with span('fetch.navigate', platform='twitter'):
+        driver.get(url)
+    count('selector_misses', platform='linkedin', field='text')
+
+Finished spans feed per-(stage, platform) latency histograms and are kept in a
+bounded buffer. They can be exported as a Chrome/Perfetto JSON trace
+(write_json_trace) or as Prometheus text (prometheus_text / write_prometheus).
+A RunTrace collects the spans of a single fetch+analyze run, including spans from
+worker threads started with contextvars.copy_context().
+"""
+import os
+import json
+import time
+import bisect
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+
+HISTOGRAM_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+MAX_SPANS = 20000
+
+_current_run = contextvars.ContextVar('tracing_run', default=None)
+_current_span = contextvars.ContextVar('tracing_span', default=None)
+
+
+class Span:
+    __slots__ = ('name', 'start', 'duration', 'attrs', 'thread', 'parent', 'error')
+
+    def __init__(self, name, attrs, parent):
+        self.name = name
+        self.attrs = attrs
+        self.parent = parent
+        self.thread = threading.get_ident()
+        self.start = time.time()
+        self.duration = None
+        self.error = None
+
+
+def _label_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items() if v is not None))
+
+
+class Tracer:
+    def __init__(self, max_spans=MAX_SPANS):
+        self.spans = deque(maxlen=max_spans)
+        self.histograms = {}    # (stage, labels) -> [bucket counts..., +Inf count, sum]
+        self.counters = {}      # (name, labels) -> value
+        self.gauges = {}        # (name, labels) -> value
+        self._lock = threading.Lock()
+
+    def finish(self, span):
+        labels = _label_key({'platform': span.attrs.get('platform')})
+        with self._lock:
+            self.spans.append(span)
+            hist = self.histograms.setdefault((span.name, labels), [0] * (len(HISTOGRAM_BUCKETS) + 2))
+            hist[bisect.bisect_left(HISTOGRAM_BUCKETS, span.duration)] += 1
+            hist[-1] += span.duration
+
+    def count(self, name, value=1, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def gauge(self, name, value, **labels):
+        with self._lock:
+            self.gauges[(name, _label_key(labels))] = value
+
+    def reset(self):
+        with self._lock:
+            self.spans.clear()
+            self.histograms.clear()
+            self.counters.clear()
+            self.gauges.clear()
+
+    def prometheus_text(self, prefix='sentiment'):
+        def fmt_labels(labels, extra=()):
+            pairs = list(labels) + list(extra)
+            if not pairs:
+                return ""
+            return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+        with self._lock:
+            histograms = {k: list(v) for k, v in self.histograms.items()}
+            counters = dict(self.counters)
+            gauges = dict(self.gauges)
+
+        lines = [f"# HELP {prefix}_stage_seconds Duration of traced stages",
+                 f"# TYPE {prefix}_stage_seconds histogram"]
+        for (stage, labels), hist in sorted(histograms.items()):
+            labels = (('stage', stage),) + labels
+            cumulative = 0
+            for bound, bucket_count in zip(HISTOGRAM_BUCKETS, hist):
+                cumulative += bucket_count
+                lines.append(f"{prefix}_stage_seconds_bucket{fmt_labels(labels, [('le', bound)])} {cumulative}")
+            cumulative += hist[len(HISTOGRAM_BUCKETS)]
+            lines.append(f"{prefix}_stage_seconds_bucket{fmt_labels(labels, [('le', '+Inf')])} {cumulative}")
+            lines.append(f"{prefix}_stage_seconds_sum{fmt_labels(labels)} {hist[-1]:.6f}")
+            lines.append(f"{prefix}_stage_seconds_count{fmt_labels(labels)} {cumulative}")
+
+        for name in sorted({name for name, _ in counters}):
+            lines.append(f"# TYPE {prefix}_{name}_total counter")
+            for (counter, labels), value in sorted(counters.items()):
+                if counter == name:
+                    lines.append(f"{prefix}_{name}_total{fmt_labels(labels)} {value}")
+        for name in sorted({name for name, _ in gauges}):
+            lines.append(f"# TYPE {prefix}_{name} gauge")
+            for (gauge, labels), value in sorted(gauges.items()):
+                if gauge == name:
+                    lines.append(f"{prefix}_{name}{fmt_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+tracer = Tracer()
+
+
+class RunTrace:
+    """Spans and counters recorded during one run"""
+
+    def __init__(self, **attrs):
+        self.attrs = attrs
+        self.spans = []
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def add(self, span):
+        with self._lock:
+            self.spans.append(span)
+
+    def add_count(self, name, value):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def breakdown(self):
+        """Total/mean/max seconds per stage, slowest first"""
+        stages = {}
+        with self._lock:
+            spans = list(self.spans)
+        for s in spans:
+            stat = stages.setdefault(s.name, {'stage': s.name, 'calls': 0, 'total_s': 0.0, 'max_s': 0.0})
+            stat['calls'] += 1
+            stat['total_s'] += s.duration
+            stat['max_s'] = max(stat['max_s'], s.duration)
+        for stat in stages.values():
+            stat['mean_s'] = stat['total_s'] / stat['calls']
+        return sorted(stages.values(), key=lambda stat: stat['total_s'], reverse=True)
+
+    def chrome_trace(self):
+        with self._lock:
+            spans = list(self.spans)
+        return chrome_trace_events(spans, self.attrs)
+
+
+@contextmanager
+def run_trace(**attrs):
+    run = RunTrace(**attrs)
+    token = _current_run.set(run)
+    try:
+        yield run
+    finally:
+        _current_run.reset(token)
+
+
+@contextmanager
+def span(name, **attrs):
+    parent = _current_span.get()
+    if parent is not None and 'platform' not in attrs and 'platform' in parent.attrs:
+        attrs['platform'] = parent.attrs['platform']
+    current = Span(name, attrs, parent.name if parent else None)
+    token = _current_span.set(current)
+    started = time.perf_counter()
+    try:
+        yield current
+    except BaseException as e:
+        current.error = type(e).__name__
+        raise
+    finally:
+        current.duration = time.perf_counter() - started
+        _current_span.reset(token)
+        tracer.finish(current)
+        run = _current_run.get()
+        if run is not None:
+            run.add(current)
+
+
+def count(name, value=1, **labels):
+    tracer.count(name, value, **labels)
+    run = _current_run.get()
+    if run is not None:
+        run.add_count(name, value)
+
+
+def gauge(name, value, **labels):
+    tracer.gauge(name, value, **labels)
+
+
+def chrome_trace_events(spans, metadata=None):
+    pid = os.getpid()
+    events = [
+        {
+            'name': s.name, 'ph': 'X', 'ts': int(s.start * 1e6), 'dur': int(s.duration * 1e6),
+            'pid': pid, 'tid': s.thread,
+            'args': {**{k: str(v) for k, v in s.attrs.items()}, **({'error': s.error} if s.error else {})},
+        }
+        for s in spans
+    ]
+    return {'traceEvents': events, 'metadata': metadata or {}}
+
+
+def write_json_trace(path, run=None):
+    data = run.chrome_trace() if run else chrome_trace_events(list(tracer.spans))
+    with open(path, 'w') as f:
+        json.dump(data, f)
+
+
+def prometheus_text():
+    return tracer.prometheus_text()
+
+
+def write_prometheus(path):
+    # Write then rename so a scraper never reads a half-written file
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w') as f:
+        f.write(tracer.prometheus_text())
+    os.replace(tmp, path)
@@ -0,0 +1,168 @@
+"""Scrape worker: pull fetch-and-analyze jobs from the queue and run them.
+
+    python cli.py worker --queue sentiment_jobs.db --store sentiment_results.db
+
+Each job runs the regular path: its platform's fetcher (resumable, with the
+job's backend and time budget), stream_analyzed_posts and the ResultStore. A
+background thread renews the job's lease every heartbeat interval. If the lease
+is lost (the queue requeued the job because heartbeats stopped arriving), the
+fetch is cancelled through its Deadline so two workers don't keep scraping the
+same target. Run one worker process per browser the machine can afford.
+"""
+import os
+import socket
+import logging
+import threading
+
+from progress import ProgressBus, LogSubscriber
+from deadline import Deadline
+from scrapers import FETCHERS, iter_resumable_posts
+from checkpoint import CHECKPOINT_DIR
+from neardup import NearDuplicateIndex
+from sentiment import stream_analyzed_posts, INFERENCE_BATCH_SIZE
+from jobqueue import LEASE_SECONDS, LeaseLost
+from tracing import run_trace, count as count_metric
+
+HEARTBEAT_INTERVAL = 30.0
+POLL_INTERVAL = 5.0
+
+logger = logging.getLogger(__name__)
+
+
+def default_worker_id():
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class Heartbeat:
+    """Renew a job's lease from a background thread until stopped"""
+
+    def __init__(self, broker, job, worker_id, deadline, lease_seconds=LEASE_SECONDS, interval=HEARTBEAT_INTERVAL):
+        self.broker = broker
+        self.job = job
+        self.worker_id = worker_id
+        self.deadline = deadline
+        self.lease_seconds = lease_seconds
+        self.interval = interval
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"heartbeat-{job.id}", daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.broker.heartbeat(self.job.id, self.worker_id, self.lease_seconds)
+            except LeaseLost as e:
+                logger.warning("%s; stopping the fetch", e)
+                self.lost = True
+                self.deadline.cancel("job lease lost")
+                return
+            except Exception as e:
+                # The queue may be briefly unreachable; the lease outlives a few missed beats
+                logger.warning("Heartbeat for job %s failed: %s", self.job.id, e)
+
+
+class Worker:
+    def __init__(self, broker, result_store, pipelines, worker_id=None, lease_seconds=LEASE_SECONDS,
+                 heartbeat_interval=HEARTBEAT_INTERVAL, poll_interval=POLL_INTERVAL, checkpoint_dir=CHECKPOINT_DIR,
+                 batch_size=INFERENCE_BATCH_SIZE, progress_interval=10.0):
+        self.broker = broker
+        self.result_store = result_store
+        self.pipelines = pipelines
+        self.worker_id = worker_id or default_worker_id()
+        self.lease_seconds = lease_seconds
+        self.heartbeat_interval = min(heartbeat_interval, lease_seconds / 3)
+        self.poll_interval = poll_interval
+        self.checkpoint_dir = checkpoint_dir
+        self.batch_size = batch_size
+        self.progress_interval = progress_interval
+        self.stopping = threading.Event()
+        self._dedup = {}
+
+    def stop(self):
+        """Finish the current job, then return from run()"""
+        self.stopping.set()
+
+    def near_duplicate_index(self, threshold):
+        # One index per threshold for the life of the worker, seeded from the store
+        if threshold not in self._dedup:
+            index = NearDuplicateIndex(threshold)
+            index.seed(self.result_store.labeled_signatures())
+            self._dedup[threshold] = index
+        return self._dedup[threshold]
+
+    def execute(self, job, deadline):
+        """Fetch, score and store one job's posts; returns the result reported to the queue"""
+        options = job.options
+        fetch_kwargs = {'deadline': deadline}
+        if options.get('backend', 'dom') != 'dom':
+            fetch_kwargs['backend'] = options['backend']
+        threshold = options.get('near_dup_threshold')
+        dedup = self.near_duplicate_index(threshold) if threshold else None
+        progress = ProgressBus(platform=job.platform)
+        log_progress = LogSubscriber(logger, interval=self.progress_interval)
+        progress.subscribe(log_progress)
+        posts = iter_resumable_posts(FETCHERS[job.platform], job.platform, job.identifier, job.max_posts, progress,
+                                     checkpoint_dir=self.checkpoint_dir, **fetch_kwargs)
+        total = new = 0
+        sentiment_counts = {}
+        try:
+            for batch in stream_analyzed_posts(posts, self.pipelines, batch_size=self.batch_size, dedup=dedup):
+                new += self.result_store.add_batch(batch, job_id=job.id)
+                total += len(batch)
+                for name, count in batch.sentiment_counts().items():
+                    sentiment_counts[name] = sentiment_counts.get(name, 0) + count
+        finally:
+            log_progress.flush()
+        return {'posts': total, 'new_posts': new, 'sentiments': sentiment_counts, 'partial_reason': deadline.reason}
+
+    def run_job(self, job):
+        deadline = Deadline(job.options.get('time_budget'))
+        logger.info("Job %s: %s %s (attempt %d)", job.id, job.platform, job.identifier, job.attempts)
+        with run_trace(platform=job.platform, identifier=job.identifier, job=job.id):
+            with Heartbeat(self.broker, job, self.worker_id, deadline, self.lease_seconds,
+                           self.heartbeat_interval) as heartbeat:
+                try:
+                    result = self.execute(job, deadline)
+                    error = None
+                except Exception as e:
+                    result, error = None, e
+            try:
+                if heartbeat.lost:
+                    # Another worker owns the job now; whatever was stored stays stored
+                    count_metric('jobs_lease_lost', platform=job.platform)
+                elif error is not None:
+                    logger.error("Job %s failed: %s", job.id, error)
+                    self.broker.fail(job.id, self.worker_id, error)
+                    count_metric('jobs_failed', platform=job.platform)
+                else:
+                    self.broker.complete(job.id, self.worker_id, result)
+                    count_metric('jobs_done', platform=job.platform)
+                    logger.info("Job %s done: %d posts (%d new)", job.id, result['posts'], result['new_posts'])
+            except LeaseLost as e:
+                logger.warning("%s; result not recorded", e)
+        return result
+
+    def run(self, max_jobs=None, exit_when_idle=False):
+        """Claim and run jobs until stopped; returns the number of jobs run"""
+        done = 0
+        while not self.stopping.is_set() and (max_jobs is None or done < max_jobs):
+            job = self.broker.claim(self.worker_id, self.lease_seconds)
+            if job is None:
+                if exit_when_idle:
+                    break
+                self.stopping.wait(self.poll_interval)
+                continue
+            if job.platform not in FETCHERS:
+                self.broker.fail(job.id, self.worker_id, f"unknown platform {job.platform!r}", retry=False)
+                continue
+            self.run_job(job)
+            done += 1
+        return done